@@ -0,0 +1,74 @@
+"""Import-time budget check for the application module.
+
+Imports ``ai_messenger_voicemail.app`` in a fresh interpreter with
+``-X importtime`` and fails when the cumulative import time exceeds the
+budget or when one of the lazily loaded SDKs is pulled in at import time.
+
+Usage: uv run python benchmarks/bench_import.py [--budget-ms N] [--runs N] [--top N]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+TARGET_MODULE = "ai_messenger_voicemail.app"
+LAZY_MODULES = ("openai", "twilio", "httpx", "asyncpg", "tiktoken")
+
+
+def _import_profile() -> dict[str, int]:
+    """Returns the cumulative import time in microseconds per imported module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {TARGET_MODULE}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        # Format: "import time: <self us> | <cumulative us> | <indented module>"
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        cumulative[parts[2].strip()] = int(parts[1])
+    return cumulative
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    totals: list[float] = []
+    profile: dict[str, int] = {}
+    for _ in range(args.runs):
+        profile = _import_profile()
+        totals.append(profile[TARGET_MODULE] / 1000)
+
+    median_ms = statistics.median(totals)
+    print(f"{TARGET_MODULE}: median {median_ms:.1f} ms ueber {args.runs} Laeufe (Budget {args.budget_ms:.0f} ms)")
+    print("Groesste Pakete (letzter Lauf):")
+    packages = sorted(
+        ((name, value) for name, value in profile.items() if "." not in name and name != TARGET_MODULE),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    for name, value in packages[: args.top]:
+        print(f"  {name:30s} {value / 1000:8.1f} ms")
+
+    eager = [name for name in LAZY_MODULES if name in profile]
+    failed = False
+    if eager:
+        print(f"FEHLER: beim Import geladen, obwohl lazy erwartet: {', '.join(eager)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"FEHLER: Import-Budget um {median_ms - args.budget_ms:.1f} ms ueberschritten")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
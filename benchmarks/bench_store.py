@@ -0,0 +1,75 @@
+"""Micro-benchmark for SqliteStore: connect-per-call vs. pooled connections.
+
+Usage: uv run python benchmarks/bench_store.py [--iterations N]
+"""
+
+import argparse
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from ai_messenger_voicemail.store import SqliteStore
+
+
+def _call_cycle(store: SqliteStore, call_index: int, messages_per_call: int) -> int:
+    """Replays the store traffic of one incoming call and returns the op count."""
+    ops = 0
+    offset = store.get_telegram_offset()
+    ops += 1
+    now = datetime.now(timezone.utc)
+    for i in range(messages_per_call):
+        update_id = offset + i + 1
+        store.store_message(
+            telegram_update_id=update_id,
+            chat_id=555,
+            sender="bench",
+            timestamp=now,
+            text=f"Nachricht {update_id}",
+        )
+        ops += 1
+    store.set_telegram_offset(offset + messages_per_call)
+    ops += 1
+    unread = store.list_unread_messages(limit=8)
+    ops += 1
+    call_sid = f"bench-{call_index}"
+    store.save_call_context(call_sid, "summary", unread)
+    ops += 1
+    store.mark_messages_read([msg.id for msg in unread])
+    ops += 1
+    store.get_call_context(call_sid)
+    ops += 1
+    store.append_conversation_turn(call_sid, role="caller", text="frage")
+    ops += 1
+    store.cleanup_stale_call_contexts(ttl_minutes=240)
+    ops += 1
+    return ops
+
+
+def run(*, pooled: bool, iterations: int, messages_per_call: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SqliteStore(Path(tmp) / "state.db", pooled=pooled)
+        ops = 0
+        started = time.perf_counter()
+        for index in range(iterations):
+            ops += _call_cycle(store, index, messages_per_call)
+        elapsed = time.perf_counter() - started
+        store.close()
+    return ops / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--messages-per-call", type=int, default=4)
+    args = parser.parse_args()
+
+    before = run(pooled=False, iterations=args.iterations, messages_per_call=args.messages_per_call)
+    after = run(pooled=True, iterations=args.iterations, messages_per_call=args.messages_per_call)
+    print(f"connect-per-call: {before:10.0f} ops/s")
+    print(f"pooled:           {after:10.0f} ops/s")
+    print(f"speedup:          {after / before:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
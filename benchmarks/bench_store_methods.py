@@ -0,0 +1,110 @@
+"""Per-method micro-benchmarks for SqliteStore.
+
+Each method runs against a database preloaded with `--messages` rows, once
+with the pooled per-thread connections the app uses (SQLITE_POOLED_CONNECTIONS,
+default on) and once with a connection per call; the report lists ops/s and
+p50/p99 latency per call.
+
+Usage: uv run python benchmarks/bench_store_methods.py [--iterations N] [--messages N] [--mode pooled|unpooled|both]
+"""
+
+import argparse
+import itertools
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from ai_messenger_voicemail.models import InboundMessage
+from ai_messenger_voicemail.store import SqliteStore
+
+
+def _inbound(update_id: int) -> InboundMessage:
+    return InboundMessage(
+        telegram_update_id=update_id,
+        chat_id=500 + update_id % 5,
+        sender=f"kontakt-{update_id % 5}",
+        timestamp=datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=update_id),
+        text=f"Nachricht {update_id} mit etwas Text, wie er in Chats ueblich ist.",
+    )
+
+
+def measure(operation: Callable[[int], object], iterations: int) -> tuple[float, float, float]:
+    """Returns ops/s and the p50/p99 latency in microseconds."""
+    samples: list[float] = []
+    started = time.perf_counter()
+    for index in range(iterations):
+        call_started = time.perf_counter()
+        operation(index)
+        samples.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+    samples.sort()
+    p50 = samples[len(samples) // 2] * 1_000_000
+    p99 = samples[min(int(len(samples) * 0.99), len(samples) - 1)] * 1_000_000
+    return iterations / elapsed, p50, p99
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--mode", choices=["pooled", "unpooled", "both"], default="both")
+    args = parser.parse_args()
+
+    modes = [True, False] if args.mode == "both" else [args.mode == "pooled"]
+    for pooled in modes:
+        print(f"\nSqliteStore(pooled={pooled})")
+        run(args, pooled=pooled)
+
+
+def run(args: argparse.Namespace, *, pooled: bool) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SqliteStore(Path(tmp) / "state.db", pooled=pooled)
+        store.store_messages([_inbound(update_id) for update_id in range(1, args.messages + 1)])
+        update_ids = itertools.count(args.messages + 1)
+        unread = store.list_unread_messages(limit=8)
+        store.save_call_context("call-read", "Zusammenfassung", unread)
+        for turn in range(6):
+            store.append_conversation_turn("call-read", role="caller" if turn % 2 == 0 else "assistant", text="Frage")
+        store.save_webhook_response("call-read", "followup", "hash", "<Response />")
+        now = time.time()
+
+        benchmarks: list[tuple[str, Callable[[int], object]]] = [
+            (
+                f"store_messages[{args.batch_size}]",
+                lambda _: store.store_messages(
+                    [_inbound(next(update_ids)) for _ in range(args.batch_size)],
+                    telegram_offset=next(update_ids),
+                ),
+            ),
+            ("get_telegram_offset", lambda _: store.get_telegram_offset()),
+            ("list_unread_messages", lambda _: store.list_unread_messages(limit=8)),
+            ("list_unread_chat_ids", lambda _: store.list_unread_chat_ids()),
+            ("list_unread_chat_after", lambda _: store.list_unread_chat_messages_after(501, after_id=0, limit=50)),
+            ("save_call_context", lambda index: store.save_call_context(f"call-{index}", "Zusammenfassung", unread)),
+            ("get_call_context", lambda _: store.get_call_context("call-read")),
+            ("append_conversation_turn", lambda index: store.append_conversation_turn(f"call-{index}", "caller", "Frage")),
+            ("mark_messages_read", lambda index: store.mark_messages_read([unread[index % len(unread)].id])),
+            ("acquire_lease", lambda _: store.acquire_lease("bench", "holder", ttl_seconds=30)),
+            (
+                "save_llm_response",
+                lambda index: store.save_llm_response(f"key-{index}", "Antwort", expires_at=now + 3600, max_entries=512),
+            ),
+            ("get_llm_response", lambda index: store.get_llm_response(f"key-{index}", now=now)),
+            ("save_webhook_response", lambda index: store.save_webhook_response(f"call-{index}", "incoming", "h", "<R/>")),
+            ("get_webhook_response", lambda _: store.get_webhook_response("call-read", "followup", "hash")),
+            ("call_context_retention", lambda _: store.call_context_retention()),
+            ("cleanup_stale_contexts", lambda _: store.cleanup_stale_call_contexts(ttl_minutes=240)),
+        ]
+
+        print(f"{'Methode':28s} {'ops/s':>10s} {'p50 us':>9s} {'p99 us':>9s}")
+        for name, operation in benchmarks:
+            ops, p50, p99 = measure(operation, args.iterations)
+            print(f"{name:28s} {ops:10.0f} {p50:9.1f} {p99:9.1f}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
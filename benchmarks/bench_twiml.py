@@ -0,0 +1,99 @@
+"""Micro-benchmark for TwiML rendering: twilio SDK object tree vs. pre-rendered templates.
+
+Usage: uv run python benchmarks/bench_twiml.py [--iterations N]
+"""
+
+import argparse
+import time
+from collections.abc import Callable
+
+from twilio.twiml.voice_response import Gather, VoiceResponse
+
+from ai_messenger_voicemail.config import Settings
+from ai_messenger_voicemail.services.voice_service import VoiceService
+
+SUMMARY = (
+    "Du hast 3 ungelesene Nachrichten. Anna fragt, ob das Treffen morgen um 10 Uhr stattfindet. "
+    "Tom & Lisa schicken Gruesse aus dem Urlaub. Der Paketdienst meldet eine Zustellung."
+)
+ACTION_URL = "https://voicemail.example.org/twilio/voice/followup"
+
+
+def _sdk_renderers(settings: Settings) -> dict[str, Callable[[], str]]:
+    def say(node: VoiceResponse | Gather, text: str) -> None:
+        node.say(text, language=settings.twilio_language, voice=settings.twilio_voice)
+
+    def gather() -> Gather:
+        return Gather(
+            input="speech",
+            action=ACTION_URL,
+            method="POST",
+            language=settings.twilio_language,
+            speech_timeout="auto",
+            timeout=5,
+        )
+
+    def incoming() -> str:
+        response = VoiceResponse()
+        say(response, "Willkommen. Du hast ungelesene Nachrichten. Ich lese dir jetzt eine Zusammenfassung vor.")
+        response.pause(length=1)
+        say(response, SUMMARY)
+        node = gather()
+        say(node, "Du kannst jetzt Rueckfragen stellen, zum Beispiel: Erzaehl mir mehr ueber Nachricht 2.")
+        response.append(node)
+        say(response, "Ich habe keine Rueckfrage gehoert. Auf Wiederhoeren.")
+        response.hangup()
+        return str(response)
+
+    def followup() -> str:
+        response = VoiceResponse()
+        say(response, SUMMARY)
+        node = gather()
+        say(node, "Wenn du noch etwas wissen willst, stelle jetzt eine weitere Frage. Sage Ende, um aufzulegen.")
+        response.append(node)
+        say(response, "Keine weitere Eingabe erkannt. Auf Wiederhoeren.")
+        response.hangup()
+        return str(response)
+
+    def goodbye() -> str:
+        response = VoiceResponse()
+        say(response, "Alles klar. Auf Wiederhoeren.")
+        response.hangup()
+        return str(response)
+
+    return {"incoming": incoming, "followup": followup, "goodbye": goodbye}
+
+
+def _template_renderers(service: VoiceService) -> dict[str, Callable[[], str]]:
+    return {
+        "incoming": lambda: service.incoming_response(summary=SUMMARY, has_messages=True, action_url=ACTION_URL),
+        "followup": lambda: service.followup_response(answer=SUMMARY, action_url=ACTION_URL),
+        "goodbye": service.goodbye_response,
+    }
+
+
+def run(render: Callable[[], str], iterations: int) -> float:
+    """Returns the CPU time per response in microseconds."""
+    started = time.process_time()
+    for _ in range(iterations):
+        render()
+    return (time.process_time() - started) / iterations * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+
+    settings = Settings(_env_file=None)
+    sdk = _sdk_renderers(settings)
+    templates = _template_renderers(VoiceService(settings))
+    for name in sdk:
+        assert sdk[name]() == templates[name](), f"{name}: Ausgabe weicht ab"
+        before = run(sdk[name], args.iterations)
+        after = run(templates[name], args.iterations)
+        print(f"{name:10s} sdk: {before:8.2f} us  templates: {after:8.2f} us  speedup: {before / after:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
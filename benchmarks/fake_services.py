@@ -0,0 +1,253 @@
+"""Local stand-ins for the Telegram Bot API and the OpenAI Responses API.
+
+Both fakes run as Starlette apps under uvicorn in a background thread and
+accept a `FakeProfile` with latency, error rate and payload size, so load
+tests never touch the real services.
+
+Standalone usage:
+    uv run python benchmarks/fake_services.py --telegram-port 8081 --openai-port 8082 --latency-ms 300
+"""
+
+import argparse
+import asyncio
+import collections
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+_WORDS = (
+    "Hallo", "morgen", "Treffen", "um", "Uhr", "Paket", "angekommen", "bitte", "zurueckrufen",
+    "Termin", "verschoben", "Gruesse", "aus", "Berlin", "Zug", "Verspaetung", "Essen", "heute",
+)
+
+
+@dataclass(slots=True)
+class FakeProfile:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    payload_chars: int = 120
+
+    async def delay(self) -> None:
+        seconds = (self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+    def fails(self) -> bool:
+        return random.random() < self.error_rate
+
+
+@dataclass(slots=True)
+class FakeStats:
+    requests: int = 0
+    errors: int = 0
+    conflicts: int = 0
+    by_path: dict[str, int] = field(default_factory=dict)
+
+    def record(self, path: str, *, error: bool) -> None:
+        self.requests += 1
+        self.errors += int(error)
+        self.by_path[path] = self.by_path.get(path, 0) + 1
+
+
+def _text(chars: int) -> str:
+    words: list[str] = []
+    length = 0
+    while length < chars:
+        word = random.choice(_WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:chars]
+
+
+def telegram_app(
+    profile: FakeProfile,
+    *,
+    messages_per_second: float = 2.0,
+    chat_ids: tuple[int, ...] = (555, 556, 557),
+) -> tuple[Starlette, FakeStats]:
+    """getUpdates over a retained update log, with long-poll semantics.
+
+    Like the real Bot API, updates stay in the log until a request confirms
+    them with a higher `offset`, so a lost response is served again, and a
+    getUpdates arriving while another is running is answered with 409.
+    """
+    stats = FakeStats()
+    started = time.monotonic()
+    log: collections.deque[dict[str, object]] = collections.deque()
+    state = {"generated": 0, "polling": False}
+
+    def generate() -> None:
+        due = int((time.monotonic() - started) * messages_per_second)
+        now = int(time.time())
+        while state["generated"] < due:
+            state["generated"] += 1
+            update_id = state["generated"]
+            chat_id = random.choice(chat_ids)
+            log.append(
+                {
+                    "update_id": update_id,
+                    "message": {
+                        "message_id": update_id,
+                        "date": now,
+                        "chat": {"id": chat_id, "type": "private"},
+                        "from": {"id": chat_id, "first_name": f"Kontakt {chat_id}"},
+                        "text": _text(profile.payload_chars),
+                    },
+                }
+            )
+
+    def pending(offset: int) -> list[dict[str, object]]:
+        generate()
+        while log and int(log[0]["update_id"]) < offset:
+            log.popleft()
+        return list(log)
+
+    async def get_updates(request: Request) -> JSONResponse:
+        body = await request.json()
+        if state["polling"]:
+            stats.conflicts += 1
+            stats.record("getUpdates", error=True)
+            return JSONResponse(
+                {
+                    "ok": False,
+                    "error_code": 409,
+                    "description": "Conflict: terminated by other getUpdates request",
+                },
+                status_code=409,
+            )
+        state["polling"] = True
+        try:
+            await profile.delay()
+            if profile.fails():
+                stats.record("getUpdates", error=True)
+                return JSONResponse({"ok": False, "description": "Too Many Requests"}, status_code=429)
+            stats.record("getUpdates", error=False)
+            offset = int(body.get("offset", 0))
+            deadline = time.monotonic() + float(body.get("timeout", 0))
+            while not pending(offset) and time.monotonic() < deadline:
+                await asyncio.sleep(min(0.1, 1 / messages_per_second))
+            result = pending(offset)[: int(body.get("limit", 100))]
+            return JSONResponse({"ok": True, "result": result})
+        finally:
+            state["polling"] = False
+
+    app = Starlette(routes=[Route("/bot{token}/getUpdates", get_updates, methods=["POST"])])
+    return app, stats
+
+
+def openai_app(profile: FakeProfile) -> tuple[Starlette, FakeStats]:
+    """POST /v1/responses with a minimal but SDK-compatible Response body."""
+    stats = FakeStats()
+
+    async def create_response(request: Request) -> JSONResponse:
+        body = await request.json()
+        await profile.delay()
+        if profile.fails():
+            stats.record("responses", error=True)
+            return JSONResponse(
+                {"error": {"message": "fake upstream error", "type": "server_error", "code": None}},
+                status_code=500,
+            )
+        stats.record("responses", error=False)
+        input_chars = sum(len(str(item.get("content", ""))) for item in body.get("input", []))
+        text = _text(min(profile.payload_chars, int(body.get("max_output_tokens") or 1000) * 4))
+        return JSONResponse(
+            {
+                "id": f"resp_{random.getrandbits(48):x}",
+                "object": "response",
+                "created_at": int(time.time()),
+                "model": body.get("model", "fake"),
+                "status": "completed",
+                "output": [
+                    {
+                        "type": "message",
+                        "id": "msg_fake",
+                        "status": "completed",
+                        "role": "assistant",
+                        "content": [{"type": "output_text", "text": text, "annotations": []}],
+                    }
+                ],
+                "parallel_tool_calls": True,
+                "tool_choice": "auto",
+                "tools": [],
+                "usage": {
+                    "input_tokens": input_chars // 4,
+                    "output_tokens": len(text) // 4,
+                    "total_tokens": (input_chars + len(text)) // 4,
+                    "input_tokens_details": {"cached_tokens": 0},
+                    "output_tokens_details": {"reasoning_tokens": 0},
+                },
+            }
+        )
+
+    app = Starlette(routes=[Route("/v1/responses", create_response, methods=["POST"])])
+    return app, stats
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+class BackgroundServer:
+    """Runs an ASGI app with uvicorn on its own thread and event loop."""
+
+    def __init__(self, app: object, *, port: int | None = None) -> None:
+        self.port = port or free_port()
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="on")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "BackgroundServer":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError(f"Server auf Port {self.port} startet nicht")
+            time.sleep(0.02)
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--telegram-port", type=int, default=8081)
+    parser.add_argument("--openai-port", type=int, default=8082)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--payload-chars", type=int, default=120)
+    parser.add_argument("--messages-per-second", type=float, default=2.0)
+    args = parser.parse_args()
+
+    profile = FakeProfile(args.latency_ms, args.jitter_ms, args.error_rate, args.payload_chars)
+    telegram, _ = telegram_app(profile, messages_per_second=args.messages_per_second)
+    openai, _ = openai_app(profile)
+    with BackgroundServer(telegram, port=args.telegram_port) as t, BackgroundServer(openai, port=args.openai_port) as o:
+        print(f"TELEGRAM_API_BASE_URL={t.url}")
+        print(f"OPENAI_BASE_URL={o.url}/v1")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Load test: simulated Twilio calls against the app with fake Telegram and OpenAI.
+
+Starts the fake services from fake_services.py and the application under
+uvicorn, then plays Twilio's part. Each simulated call posts the incoming
+webhook, follows progressive-response redirects and asks a few follow-up
+questions before hanging up with "Ende". It reports throughput and the
+p50/p95/p99 latency per endpoint.
+
+Usage: uv run python benchmarks/load_test.py [--calls N] [--concurrency N] [--latency-ms MS] ...
+"""
+
+import argparse
+import asyncio
+import re
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import httpx
+
+from ai_messenger_voicemail.app import create_app
+from ai_messenger_voicemail.config import Settings
+from fake_services import BackgroundServer, FakeProfile, free_port, openai_app, telegram_app
+
+FOLLOWUP_QUESTIONS = (
+    "Erzaehl mir mehr ueber Nachricht 1.",
+    "Wer hat mir geschrieben?",
+    "Worum geht es beim Termin morgen?",
+    "Was steht in der neuesten Nachricht?",
+    "Muss ich heute noch jemanden zurueckrufen?",
+)
+_REDIRECT = re.compile(r"<Redirect[^>]*>([^<]+)</Redirect>")
+
+
+def percentile(samples: list[float], value: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * value / 100), len(ordered) - 1)]
+
+
+class LoadDriver:
+    def __init__(self, client: httpx.AsyncClient, *, followups: int) -> None:
+        self._client = client
+        self._followups = followups
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.completed_calls = 0
+
+    async def _post(self, url: str, form: dict[str, str]) -> str | None:
+        endpoint = urlsplit(url).path.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        try:
+            response = await self._client.post(url, data=form)
+        except httpx.HTTPError:
+            self.errors[endpoint] += 1
+            return None
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        if response.status_code != 200:
+            self.errors[endpoint] += 1
+            return None
+        return response.text
+
+    async def call(self, index: int) -> None:
+        form = {"CallSid": f"CA{index:032x}", "From": "+4915100000000", "To": "+4930000000", "CallStatus": "in-progress"}
+        twiml = await self._post("/twilio/voice/incoming", form)
+        while twiml is not None and (redirect := _REDIRECT.search(twiml)) is not None:
+            twiml = await self._post(redirect.group(1).replace("&amp;", "&"), form)
+        if twiml is None:
+            return
+        for turn in range(self._followups):
+            question = FOLLOWUP_QUESTIONS[(index + turn) % len(FOLLOWUP_QUESTIONS)]
+            if await self._post("/twilio/voice/followup", {**form, "SpeechResult": question}) is None:
+                return
+        if await self._post("/twilio/voice/followup", {**form, "SpeechResult": "Ende"}) is not None:
+            self.completed_calls += 1
+
+
+async def drive(base_url: str, *, calls: int, concurrency: int, followups: int) -> tuple[LoadDriver, float]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        driver = LoadDriver(client, followups=followups)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(index: int) -> None:
+            async with semaphore:
+                await driver.call(index)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(index) for index in range(calls)))
+        return driver, time.perf_counter() - started
+
+
+def report(driver: LoadDriver, elapsed: float) -> None:
+    requests = sum(len(samples) for samples in driver.latencies.values())
+    print(f"{driver.completed_calls} Anrufe, {requests} Requests in {elapsed:.2f}s")
+    print(f"Durchsatz: {driver.completed_calls / elapsed:.2f} Anrufe/s, {requests / elapsed:.1f} Requests/s")
+    print(f"{'Endpunkt':10s} {'Anzahl':>7s} {'Fehler':>7s} {'req/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}")
+    for endpoint in sorted(driver.latencies.keys() | driver.errors.keys()):
+        samples = driver.latencies.get(endpoint, [])
+        if not samples:
+            print(f"{endpoint:10s} {0:7d} {driver.errors[endpoint]:7d}")
+            continue
+        p50, p95, p99 = (percentile(samples, value) * 1000 for value in (50, 95, 99))
+        print(
+            f"{endpoint:10s} {len(samples):7d} {driver.errors[endpoint]:7d} {len(samples) / elapsed:8.1f} "
+            f"{p50:8.1f} {p95:8.1f} {p99:8.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--followups", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Latenz der Fake-APIs")
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Anteil fehlerhafter Fake-Antworten (0..1)")
+    parser.add_argument("--payload-chars", type=int, default=160, help="Laenge von Nachrichten und LLM-Antworten")
+    parser.add_argument("--messages-per-second", type=float, default=20.0, help="Neue Telegram-Nachrichten pro Sekunde")
+    parser.add_argument("--warmup-seconds", type=float, default=2.0)
+    parser.add_argument("--progressive", action="store_true", help="TWILIO_PROGRESSIVE_RESPONSE aktivieren")
+    parser.add_argument("--summary-mode", choices=["direct", "incremental"], default="direct")
+    args = parser.parse_args()
+
+    profile = FakeProfile(args.latency_ms, args.jitter_ms, args.error_rate, args.payload_chars)
+    telegram, telegram_stats = telegram_app(profile, messages_per_second=args.messages_per_second)
+    openai, openai_stats = openai_app(profile)
+
+    with (
+        tempfile.TemporaryDirectory() as tmp,
+        BackgroundServer(telegram) as telegram_server,
+        BackgroundServer(openai) as openai_server,
+    ):
+        app_port = free_port()
+        settings = Settings(
+            _env_file=None,
+            log_level="WARNING",
+            base_url=f"http://127.0.0.1:{app_port}",
+            sqlite_path=Path(tmp) / "state.db",
+            openai_api_key="bench",
+            openai_base_url=f"{openai_server.url}/v1",
+            telegram_bot_token="bench",
+            telegram_api_base_url=telegram_server.url,
+            telegram_long_poll_timeout_seconds=5,
+            twilio_validate_signature=False,
+            twilio_progressive_response=args.progressive,
+            summary_mode=args.summary_mode,
+        )
+        with BackgroundServer(create_app(settings), port=app_port) as app_server:
+            time.sleep(args.warmup_seconds)
+            driver, elapsed = asyncio.run(
+                drive(app_server.url, calls=args.calls, concurrency=args.concurrency, followups=args.followups)
+            )
+            report(driver, elapsed)
+            stats = httpx.get(f"{app_server.url}/stats").json()
+
+    print(
+        f"Fake Telegram: {telegram_stats.requests} Requests, {telegram_stats.errors} Fehler, "
+        f"davon {telegram_stats.conflicts} Konflikte (409)"
+    )
+    print(f"Fake OpenAI:   {openai_stats.requests} Requests, {openai_stats.errors} Fehler")
+    print(f"LLM-Tokens:    {stats['llm_tokens']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,331 @@
+import asyncio
+import hmac
 import logging
+import uuid
+from collections.abc import Awaitable, Callable
+from contextlib import asynccontextmanager
+from zoneinfo import ZoneInfo
 
 from fastapi import FastAPI, Request, Response
 from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.datastructures import FormData
 
 from ai_messenger_voicemail.config import Settings, get_settings
+from ai_messenger_voicemail.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from ai_messenger_voicemail.metrics import AppMetrics, instrument_store
+from ai_messenger_voicemail.models import ConversationTurn
+from ai_messenger_voicemail.postgres_store import PostgresStore
 from ai_messenger_voicemail.security import build_public_url, validate_twilio_signature
+from ai_messenger_voicemail.services.call_context_sweeper import CallContextSweeper
+from ai_messenger_voicemail.services.intent_router import IntentRouter
+from ai_messenger_voicemail.services.llm_cache import LLMResponseCache
 from ai_messenger_voicemail.services.llm_service import LLMService
-from ai_messenger_voicemail.services.telegram_service import TelegramService
+from ai_messenger_voicemail.services.summary_service import (
+    IncrementalSummarizer,
+    IncrementalSummary,
+    SummaryPrecomputer,
+)
+from ai_messenger_voicemail.services.telegram_service import (
+    TelegramIngestionWorker,
+    TelegramService,
+    TelegramWebhookIngestor,
+)
 from ai_messenger_voicemail.services.voice_service import VoiceService
-from ai_messenger_voicemail.store import SqliteStore
+from ai_messenger_voicemail.services.webhook_idempotency import UncachedResponse, WebhookIdempotency
+from ai_messenger_voicemail.store import (
+    AsyncSqliteStore,
+    CallContextCache,
+    SqliteStore,
+    StateStore,
+    call_preparation_lease,
+)
 
 logger = logging.getLogger(__name__)
 
+PENDING_CALL_GRACE_SECONDS = 300.0
+CALL_PREPARATION_LEASE_SECONDS = 120.0
+CALL_PREPARATION_POLL_SECONDS = 0.25
+CALL_PREPARATION_FAILED_TEXT = (
+    "Der Abruf der Messenger-Nachrichten ist aktuell nicht verfuegbar. Bitte versuche es spaeter erneut."
+)
+
+
+class CallPreparationError(RuntimeError):
+    """Sync or summary failed; nothing was stored, so a retry may try again."""
+
 
 def create_app(settings: Settings | None = None) -> FastAPI:
     app_settings = settings or get_settings()
     logging.basicConfig(level=app_settings.log_level.upper())
 
-    store = SqliteStore(app_settings.sqlite_path)
-    telegram_service = TelegramService(app_settings, store)
-    llm_service = LLMService(app_settings)
+    metrics = AppMetrics()
+    call_context_cache: CallContextCache | None = None
+    async_store: StateStore
+    if app_settings.store_backend == "postgres":
+        if not app_settings.database_url:
+            raise ValueError("STORE_BACKEND=postgres benoetigt DATABASE_URL.")
+        # No in-process call-context cache: follow-ups of one call may land on
+        # any replica, so every read has to go to the shared database.
+        async_store = PostgresStore(
+            app_settings.database_url,
+            min_pool_size=app_settings.postgres_pool_min_size,
+            max_pool_size=app_settings.postgres_pool_max_size,
+        )
+    else:
+        # Safe with several workers on one state.db: hits are checked against
+        # the stored version before they are served.
+        if app_settings.call_context_cache_enabled:
+            call_context_cache = CallContextCache(
+                max_entries=app_settings.call_context_cache_max_entries,
+                ttl_minutes=app_settings.call_context_ttl_minutes,
+            )
+        store = SqliteStore(
+            app_settings.sqlite_path,
+            pooled=app_settings.sqlite_pooled_connections,
+            busy_timeout_ms=app_settings.sqlite_busy_timeout_ms,
+            cache_size_kib=app_settings.sqlite_cache_size_kib,
+            mmap_size_mb=app_settings.sqlite_mmap_size_mb,
+        )
+        async_store = AsyncSqliteStore(
+            store,
+            max_workers=app_settings.sqlite_executor_workers,
+            call_context_cache=call_context_cache,
+        )
+    async_store = instrument_store(async_store, metrics)
+    call_context_sweeper = CallContextSweeper(
+        async_store,
+        ttl_minutes=app_settings.call_context_ttl_minutes,
+        interval_seconds=app_settings.call_context_sweep_interval_seconds,
+        batch_size=app_settings.call_context_sweep_batch_size,
+    )
+    llm_cache: LLMResponseCache | None = None
+    if app_settings.llm_cache_enabled:
+        llm_cache = LLMResponseCache(
+            max_entries=app_settings.llm_cache_max_entries,
+            ttl_seconds=app_settings.llm_cache_ttl_seconds,
+            store=async_store if app_settings.llm_cache_persistent else None,
+        )
+    llm_service = LLMService(app_settings, cache=llm_cache, metrics=metrics)
+    intent_router = IntentRouter(tz=ZoneInfo(app_settings.local_timezone))
+    summary_precomputer = SummaryPrecomputer(app_settings, async_store, llm_service)
+    incremental_mode = app_settings.summary_mode == "incremental"
+    if incremental_mode and app_settings.store_backend == "postgres":
+        # The summarizer serialises partial updates and mark-as-read with a
+        # process-local lock only; see "Grenzen bei mehreren Replikas".
+        logger.warning(
+            "SUMMARY_MODE=incremental ist nur mit einer Replika sicher; bei mehreren Replikas SUMMARY_MODE=direct nutzen."
+        )
+    incremental_summarizer = IncrementalSummarizer(app_settings, async_store, llm_service)
+    on_ingested = None
+    if incremental_mode:
+        on_ingested = incremental_summarizer.schedule
+    elif app_settings.summary_precompute_enabled:
+        on_ingested = summary_precomputer.schedule
+    telegram_service = TelegramService(app_settings, async_store, on_ingested=on_ingested, metrics=metrics)
     voice_service = VoiceService(app_settings)
+    webhook_idempotency = WebhookIdempotency(async_store) if app_settings.webhook_idempotency_enabled else None
+    webhook_mode = app_settings.telegram_ingestion_mode == "webhook"
+    webhook_ingestor = TelegramWebhookIngestor(
+        async_store,
+        max_batch_size=app_settings.telegram_webhook_max_batch_size,
+        on_ingested=on_ingested,
+        metrics=metrics,
+    )
+    pending_calls: dict[str, asyncio.Task[tuple[str, bool]]] = {}
+    metrics.track_calls_in_preparation(lambda: sum(not task.done() for task in pending_calls.values()))
+    telegram_worker: TelegramIngestionWorker | None = None
+    if not webhook_mode and app_settings.telegram_background_polling and app_settings.telegram_bot_token:
+        telegram_worker = TelegramIngestionWorker(
+            telegram_service,
+            poll_timeout_seconds=app_settings.telegram_long_poll_timeout_seconds,
+        )
 
-    app = FastAPI(title="AI Messenger Voicemail", version="0.2.0")
+    @asynccontextmanager
+    async def lifespan(_: FastAPI):
+        if on_ingested is not None:
+            on_ingested()
+        if telegram_worker is not None:
+            telegram_worker.start()
+        call_context_sweeper.start()
+        yield
+        await call_context_sweeper.stop()
+        if telegram_worker is not None:
+            await telegram_worker.stop()
+        await telegram_service.aclose()
+        await summary_precomputer.stop()
+        await incremental_summarizer.stop()
+        await async_store.aclose()
+
+    app = FastAPI(title="AI Messenger Voicemail", version="0.2.0", lifespan=lifespan)
 
     @app.get("/healthz")
     def healthz() -> JSONResponse:
         return JSONResponse({"status": "ok"})
 
     @app.get("/readyz")
-    def readyz() -> JSONResponse:
+    async def readyz() -> JSONResponse:
         try:
-            store.ping()
+            await async_store.ping()
         except Exception as exc:  # noqa: BLE001
             logger.exception("Readiness fehlgeschlagen")
             return JSONResponse({"status": "error", "reason": str(exc)}, status_code=503)
         return JSONResponse({"status": "ready"})
 
+    @app.get("/stats")
+    async def stats() -> JSONResponse:
+        return JSONResponse(
+            {
+                "telegram_http": telegram_service.pool_stats(),
+                "telegram_poller_lease": telegram_service.lease_stats(),
+                "summary_precompute": summary_precomputer.stats(),
+                "llm_cache": llm_cache.stats() if llm_cache is not None else None,
+                "llm": llm_service.resilience_stats(),
+                "llm_tokens": llm_service.token_stats(),
+                "followup_intents": intent_router.stats(),
+                "call_context_cache": call_context_cache.stats() if call_context_cache is not None else None,
+                "call_context_retention": await call_context_sweeper.stats(),
+                "webhook_idempotency": webhook_idempotency.stats() if webhook_idempotency is not None else None,
+            }
+        )
+
+    @app.get("/metrics")
+    def prometheus_metrics() -> Response:
+        return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
     @app.post("/telegram/sync")
     async def telegram_sync() -> JSONResponse:
         inserted = await telegram_service.sync_updates()
         unread_count = len(
-            store.list_unread_messages(
+            await async_store.list_unread_messages(
                 limit=100,
                 allowed_chat_id=app_settings.telegram_allowed_chat_id,
             )
         )
         return JSONResponse({"inserted": inserted, "unread": unread_count})
 
+    @app.post("/telegram/webhook")
+    async def telegram_webhook(request: Request) -> Response:
+        if not webhook_mode:
+            return Response(status_code=404)
+
+        secret = app_settings.telegram_webhook_secret
+        received = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not secret or not hmac.compare_digest(received.encode(), secret.encode()):
+            logger.warning("Telegram Webhook mit ungueltigem Secret-Token abgelehnt.")
+            return Response(status_code=403)
+
+        try:
+            body = await request.json()
+        except ValueError:
+            return JSONResponse({"status": "error", "reason": "invalid json"}, status_code=400)
+        updates = body if isinstance(body, list) else [body]
+        stored = await webhook_ingestor.submit([update for update in updates if isinstance(update, dict)])
+        return JSONResponse({"stored": stored})
+
+    async def prepare_call(call_sid: str) -> tuple[str, bool]:
+        """Syncs, summarizes and stores the call context; returns (summary, has_messages).
+
+        Raises `CallPreparationError` when sync or summary fail.
+        """
+        try:
+            # Webhook pushes and the background worker keep the store current;
+            # only poll inline when neither is active or the worker is stale.
+            if not webhook_mode and (
+                telegram_worker is None
+                or not telegram_worker.is_fresh(app_settings.telegram_ingestion_max_staleness_seconds)
+            ):
+                with metrics.stage_duration.time("telegram_sync"):
+                    await telegram_service.sync_updates()
+            incremental: IncrementalSummary | None = None
+            if incremental_mode:
+                with metrics.stage_duration.time("summary"):
+                    incremental = await incremental_summarizer.summarize_for_call()
+            unread_messages = await async_store.list_unread_messages(
+                limit=app_settings.max_messages_per_call,
+                allowed_chat_id=app_settings.telegram_allowed_chat_id,
+            )
+            if incremental is not None:
+                summary = incremental.summary
+            else:
+                with metrics.stage_duration.time("summary"):
+                    summary = await summary_precomputer.get_summary(unread_messages)
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("Abruf oder Zusammenfassung fehlgeschlagen")
+            raise CallPreparationError(call_sid) from exc
+
+        await async_store.save_call_context(call_sid, summary, unread_messages)
+        if incremental is not None:
+            await incremental_summarizer.mark_covered_read(incremental)
+        else:
+            await async_store.mark_messages_read([msg.id for msg in unread_messages])
+            if unread_messages and app_settings.summary_precompute_enabled:
+                # The older unread remainder is the next caller's set.
+                summary_precomputer.schedule()
+        return summary, bool(unread_messages)
+
+    async def claim_or_await_call(call_sid: str) -> tuple[str, bool]:
+        """Prepares the call unless another process claimed it; then waits for its stored context.
+
+        The claim is a lease in the shared store, so a redirect or retry landing
+        on another replica never runs a second preparation that could overwrite
+        the context after the first one marked the messages read. The holder is
+        unique per attempt: a store renews a live lease for its own holder, so a
+        shared process id would let a second attempt here win the claim too.
+        """
+        lease = call_preparation_lease(call_sid)
+        holder = uuid.uuid4().hex
+        while True:
+            context = await async_store.get_call_context(call_sid)
+            if context is not None:
+                return context.summary, bool(context.messages)
+            if await async_store.acquire_lease(lease, holder, ttl_seconds=CALL_PREPARATION_LEASE_SECONDS):
+                break
+            await asyncio.sleep(CALL_PREPARATION_POLL_SECONDS)
+
+        # The previous holder may have stored the context just before its claim expired.
+        context = await async_store.get_call_context(call_sid)
+        if context is not None:
+            return context.summary, bool(context.messages)
+        try:
+            return await prepare_call(call_sid)
+        except CallPreparationError:
+            # Let the next attempt, here or on another replica, retry.
+            await async_store.release_lease(lease, holder)
+            raise
+
+    def start_prepare_call(call_sid: str) -> asyncio.Task[tuple[str, bool]]:
+        task = pending_calls.get(call_sid)
+        if task is None:
+            task = asyncio.create_task(claim_or_await_call(call_sid), name=f"prepare-call-{call_sid}")
+            pending_calls[call_sid] = task
+            task.add_done_callback(lambda done: forget_prepared_call(call_sid, done))
+        return task
+
+    def forget_prepared_call(call_sid: str, task: asyncio.Task[tuple[str, bool]]) -> None:
+        if task.cancelled() or task.exception() is not None:
+            # Failed (and logged): the next poll or Twilio retry starts a fresh attempt.
+            if pending_calls.get(call_sid) is task:
+                del pending_calls[call_sid]
+            return
+        # Drop results nobody collected (caller hung up) after a grace period.
+        asyncio.get_running_loop().call_later(PENDING_CALL_GRACE_SECONDS, pending_calls.pop, call_sid, None)
+
+    async def idempotent_twiml(
+        call_sid: str,
+        endpoint: str,
+        form: FormData,
+        render: Callable[[], Awaitable[str]],
+    ) -> Response:
+        with metrics.track_webhook(endpoint):
+            if webhook_idempotency is None:
+                try:
+                    twiml = await render()
+                except UncachedResponse as exc:
+                    twiml = exc.twiml
+            else:
+                twiml = await webhook_idempotency.run(call_sid, endpoint, form.multi_items(), render)
+        return PlainTextResponse(content=twiml, media_type="application/xml")
+
     @app.post("/twilio/voice/incoming")
     async def twilio_voice_incoming(request: Request) -> Response:
         form = await request.form()
@@ -56,49 +334,111 @@ def create_app(settings: Settings | None = None) -> FastAPI:
             return Response(status_code=403)
 
         call_sid = str(form.get("CallSid", "unknown-call"))
+        return await idempotent_twiml(call_sid, "incoming", form, lambda: incoming_twiml(request, call_sid))
+
+    async def incoming_twiml(request: Request, call_sid: str) -> str:
         followup_url = build_public_url(request, app_settings, "/twilio/voice/followup")
 
-        store.cleanup_stale_call_contexts(ttl_minutes=app_settings.call_context_ttl_minutes)
-        existing_context = store.get_call_context(call_sid)
+        existing_context = await async_store.get_call_context(call_sid)
         if existing_context is not None:
             logger.info("Wiederholter Incoming-Webhook fuer CallSid=%s erkannt. Nutze bestehenden Kontext.", call_sid)
-            twiml = voice_service.incoming_response(
+            return voice_service.incoming_response(
                 summary=existing_context.summary,
                 has_messages=bool(existing_context.messages),
                 action_url=followup_url,
             )
-            return PlainTextResponse(content=twiml, media_type="application/xml")
 
-        try:
-            await telegram_service.sync_updates()
-            unread_messages = store.list_unread_messages(
-                limit=app_settings.max_messages_per_call,
-                allowed_chat_id=app_settings.telegram_allowed_chat_id,
-            )
-            summary = await llm_service.summarize_messages(unread_messages)
-        except Exception:  # noqa: BLE001
-            logger.exception("Abruf oder Zusammenfassung fehlgeschlagen")
-            summary = (
-                "Der Abruf der Messenger-Nachrichten ist aktuell nicht verfuegbar. "
-                "Bitte versuche es spaeter erneut."
+        if app_settings.twilio_progressive_response:
+            start_prepare_call(call_sid)
+            return voice_service.progressive_greeting_response(
+                redirect_url=summary_poll_url(request, attempt=1),
+                pause_seconds=app_settings.twilio_progressive_pause_seconds,
             )
-            twiml = voice_service.incoming_response(
+
+        try:
+            # Shared task: concurrent duplicates in this process wait for one
+            # preparation, and a hung-up request does not cancel it.
+            summary, has_messages = await asyncio.shield(start_prepare_call(call_sid))
+        except CallPreparationError:
+            # Twilio retries this webhook; the apology must not be replayed to them.
+            raise UncachedResponse(
+                voice_service.incoming_response(
+                    summary=CALL_PREPARATION_FAILED_TEXT,
+                    has_messages=False,
+                    action_url=followup_url,
+                )
+            ) from None
+        with metrics.stage_duration.time("twiml_render"):
+            return voice_service.incoming_response(
                 summary=summary,
-                has_messages=False,
+                has_messages=has_messages,
                 action_url=followup_url,
             )
-            return PlainTextResponse(content=twiml, media_type="application/xml")
 
-        store.save_call_context(call_sid, summary, unread_messages)
-        store.mark_messages_read([msg.id for msg in unread_messages])
+    def summary_poll_url(request: Request, *, attempt: int) -> str:
+        base = build_public_url(request, app_settings, "/twilio/voice/summary")
+        return f"{base}?attempt={attempt}"
 
-        twiml = voice_service.incoming_response(
-            summary=summary,
-            has_messages=bool(unread_messages),
-            action_url=followup_url,
-        )
+    @app.post("/twilio/voice/summary")
+    async def twilio_voice_summary(request: Request) -> Response:
+        form = await request.form()
+        if not validate_twilio_signature(request, form, app_settings):
+            logger.warning("Twilio-Signaturpruefung fehlgeschlagen (summary).")
+            return Response(status_code=403)
+
+        call_sid = str(form.get("CallSid", "unknown-call"))
+        with metrics.track_webhook("summary"):
+            twiml = await summary_twiml(request, call_sid)
         return PlainTextResponse(content=twiml, media_type="application/xml")
 
+    async def summary_twiml(request: Request, call_sid: str) -> str:
+        followup_url = build_public_url(request, app_settings, "/twilio/voice/followup")
+        try:
+            attempt = max(int(request.query_params.get("attempt", "1")), 1)
+        except ValueError:
+            attempt = 1
+
+        task = pending_calls.get(call_sid)
+        if task is None:
+            # Another replica may have prepared the call or still be preparing
+            # it, or this one restarted. The started task only prepares the call
+            # if nobody else holds its claim; otherwise it waits for the stored context.
+            existing_context = await async_store.get_call_context(call_sid)
+            if existing_context is not None:
+                return voice_service.incoming_response(
+                    summary=existing_context.summary,
+                    has_messages=bool(existing_context.messages),
+                    action_url=followup_url,
+                    greet=False,
+                )
+            task = start_prepare_call(call_sid)
+
+        if attempt >= app_settings.twilio_progressive_max_redirects:
+            await asyncio.shield(task)
+        else:
+            # Hold the request briefly: a summary finishing within the pause is
+            # returned right away instead of after another redirect round-trip.
+            await asyncio.wait({task}, timeout=app_settings.twilio_progressive_pause_seconds)
+
+        if not task.done():
+            return voice_service.wait_response(
+                redirect_url=summary_poll_url(request, attempt=attempt + 1),
+                pause_seconds=app_settings.twilio_progressive_pause_seconds,
+            )
+
+        pending_calls.pop(call_sid, None)
+        try:
+            summary, has_messages = task.result()
+        except CallPreparationError:
+            summary, has_messages = CALL_PREPARATION_FAILED_TEXT, False
+        with metrics.stage_duration.time("twiml_render"):
+            return voice_service.incoming_response(
+                summary=summary,
+                has_messages=has_messages,
+                action_url=followup_url,
+                greet=False,
+            )
+
     @app.post("/twilio/voice/followup")
     async def twilio_voice_followup(request: Request) -> Response:
         form = await request.form()
@@ -108,54 +448,58 @@ def create_app(settings: Settings | None = None) -> FastAPI:
 
         call_sid = str(form.get("CallSid", "unknown-call"))
         speech_result = str(form.get("SpeechResult", "")).strip()
+        return await idempotent_twiml(
+            call_sid,
+            "followup",
+            form,
+            lambda: followup_twiml(request, call_sid, speech_result),
+        )
+
+    async def followup_twiml(request: Request, call_sid: str, speech_result: str) -> str:
         followup_url = build_public_url(request, app_settings, "/twilio/voice/followup")
 
         if not speech_result:
-            twiml = voice_service.followup_response(
+            return voice_service.followup_response(
                 answer="Ich habe dich nicht verstanden. Bitte formuliere die Frage noch einmal.",
                 action_url=followup_url,
             )
-            return PlainTextResponse(content=twiml, media_type="application/xml")
 
         if voice_service.should_end(speech_result):
-            return PlainTextResponse(
-                content=voice_service.goodbye_response(),
-                media_type="application/xml",
-            )
+            return voice_service.goodbye_response()
 
-        context = store.get_call_context(call_sid)
+        context = await async_store.get_call_context(call_sid)
         if context is None:
-            twiml = voice_service.followup_response(
+            return voice_service.followup_response(
                 answer="Fuer diesen Anruf liegt kein Kontext vor. Starte bitte einen neuen Anruf.",
                 action_url=followup_url,
             )
-            return PlainTextResponse(content=twiml, media_type="application/xml")
 
         if len(context.conversation) >= app_settings.max_followup_turns * 2:
-            return PlainTextResponse(
-                content=voice_service.goodbye_response(
-                    text="Wir haben die maximale Anzahl an Rueckfragen erreicht. Auf Wiederhoeren."
-                ),
-                media_type="application/xml",
+            return voice_service.goodbye_response(
+                text="Wir haben die maximale Anzahl an Rueckfragen erreicht. Auf Wiederhoeren."
             )
 
-        updated_conversation = store.append_conversation_turn(call_sid, role="caller", text=speech_result)
+        await async_store.append_conversation_turn(call_sid, role="caller", text=speech_result)
+        updated_conversation = [*context.conversation, ConversationTurn(role="caller", text=speech_result)]
 
-        answer = await llm_service.answer_followup(
-            question=speech_result,
-            messages=context.messages,
-            summary=context.summary,
-            conversation=updated_conversation,
-        )
-        store.append_conversation_turn(call_sid, role="assistant", text=answer)
+        local = None
+        if app_settings.followup_local_intents_enabled and context.messages:
+            local = intent_router.route(speech_result, context.messages, context.summary)
+        if local is not None:
+            answer = local.answer
+        else:
+            answer = await llm_service.answer_followup(
+                question=speech_result,
+                messages=context.messages,
+                summary=context.summary,
+                conversation=updated_conversation,
+            )
+        await async_store.append_conversation_turn(call_sid, role="assistant", text=answer)
 
-        twiml = voice_service.followup_response(
-            answer=answer,
-            action_url=followup_url,
-        )
-        return PlainTextResponse(content=twiml, media_type="application/xml")
+        with metrics.stage_duration.time("twiml_render"):
+            return voice_service.followup_response(
+                answer=answer,
+                action_url=followup_url,
+            )
 
     return app
-
-
-app = create_app()
@@ -1,5 +1,6 @@
 from functools import lru_cache
 from pathlib import Path
+from typing import Literal
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -14,25 +15,76 @@ class Settings(BaseSettings):
 
     app_env: str = "dev"
     log_level: str = "INFO"
+    local_timezone: str = "Europe/Berlin"
     base_url: str | None = None
+    store_backend: Literal["sqlite", "postgres"] = "sqlite"
+    database_url: str | None = None
+    postgres_pool_min_size: int = Field(default=1, ge=1, le=100)
+    postgres_pool_max_size: int = Field(default=10, ge=1, le=100)
     sqlite_path: Path = Path("data/state.db")
+    sqlite_pooled_connections: bool = True
+    sqlite_busy_timeout_ms: int = Field(default=5000, ge=0, le=60000)
+    sqlite_cache_size_kib: int = Field(default=8192, ge=256)
+    sqlite_mmap_size_mb: int = Field(default=64, ge=0)
+    sqlite_executor_workers: int = Field(default=4, ge=1, le=32)
     request_timeout_seconds: float = Field(default=10.0, ge=1.0, le=60.0)
 
     openai_api_key: str | None = None
     openai_model: str = "gpt-4.1-mini"
+    openai_base_url: str | None = None
+    llm_cache_enabled: bool = True
+    llm_cache_ttl_seconds: int = Field(default=3600, ge=1)
+    llm_cache_max_entries: int = Field(default=512, ge=1)
+    llm_cache_persistent: bool = False
+    llm_summary_budget_seconds: float = Field(default=8.0, ge=0.5, le=60.0)
+    llm_followup_budget_seconds: float = Field(default=5.0, ge=0.5, le=60.0)
+    llm_hedge_enabled: bool = False
+    llm_hedge_percentile: float = Field(default=95.0, ge=50.0, le=99.9)
+    llm_hedge_min_samples: int = Field(default=20, ge=1)
+    llm_breaker_failure_threshold: int = Field(default=5, ge=1)
+    llm_breaker_reset_seconds: float = Field(default=30.0, ge=1.0)
+    prompt_max_tokens_per_message: int = Field(default=250, ge=16)
+    prompt_max_total_tokens: int = Field(default=3000, ge=256)
 
     telegram_bot_token: str | None = None
+    telegram_api_base_url: str = "https://api.telegram.org"
     telegram_poll_limit: int = Field(default=50, ge=1, le=100)
+    telegram_sync_max_pages: int = Field(default=10, ge=1, le=1000)
     telegram_allowed_chat_id: int | None = None
+    telegram_ingestion_mode: Literal["polling", "webhook"] = "polling"
+    telegram_webhook_secret: str | None = None
+    telegram_webhook_max_batch_size: int = Field(default=100, ge=1, le=1000)
+    telegram_background_polling: bool = True
+    telegram_long_poll_timeout_seconds: int = Field(default=25, ge=0, le=50)
+    telegram_ingestion_max_staleness_seconds: float = Field(default=60.0, ge=1.0)
+    telegram_http2: bool = False
+    telegram_max_connections: int = Field(default=10, ge=1, le=100)
+    telegram_max_keepalive_connections: int = Field(default=5, ge=0, le=100)
+    telegram_keepalive_expiry_seconds: float = Field(default=60.0, ge=0.0)
+    telegram_connect_timeout_seconds: float = Field(default=5.0, ge=0.5, le=60.0)
 
     twilio_auth_token: str | None = None
     twilio_validate_signature: bool = False
     twilio_voice: str = "Polly.Vicki"
     twilio_language: str = "de-DE"
+    twilio_progressive_response: bool = False
+    twilio_progressive_pause_seconds: int = Field(default=2, ge=1, le=10)
+    twilio_progressive_max_redirects: int = Field(default=8, ge=1, le=30)
 
     max_messages_per_call: int = Field(default=8, ge=1, le=50)
+    summary_precompute_enabled: bool = True
+    summary_mode: Literal["direct", "incremental"] = "direct"
+    summary_chunk_size: int = Field(default=20, ge=2, le=200)
+    summary_max_concurrency: int = Field(default=4, ge=1, le=32)
+    summary_merge_fan_in: int = Field(default=8, ge=2, le=64)
     max_followup_turns: int = Field(default=6, ge=1, le=20)
+    followup_local_intents_enabled: bool = True
+    webhook_idempotency_enabled: bool = True
     call_context_ttl_minutes: int = Field(default=240, ge=5, le=1440)
+    call_context_sweep_interval_seconds: float = Field(default=60.0, ge=1.0)
+    call_context_sweep_batch_size: int = Field(default=500, ge=1, le=10000)
+    call_context_cache_enabled: bool = True
+    call_context_cache_max_entries: int = Field(default=256, ge=1)
 
 
 @lru_cache(maxsize=1)
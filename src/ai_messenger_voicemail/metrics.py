@@ -0,0 +1,290 @@
+"""Minimal Prometheus metrics without a client library dependency.
+
+Counters, gauges and histograms keep plain floats in dicts keyed by label
+values, so recording costs a dict lookup and an addition on the event loop;
+formatting happens only when /metrics is scraped.
+"""
+
+import inspect
+import time
+from bisect import bisect_left
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from typing import Any, cast
+
+from ai_messenger_voicemail.store import StateStore
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    """Gauge set by the application or, with `function`, read at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        *,
+        function: Callable[[], float] | None = None,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._function = function
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) - amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> list[str]:
+        if self._function is not None:
+            return [f"{self.name} {_format_value(self._function())}"]
+        return [
+            f"{self.name}{_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        *,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (last one is +Inf), sum]
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = ([0] * (len(self._buckets) + 1), [0.0])
+        series[0][bisect_left(self._buckets, value)] += 1
+        series[1][0] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return 0 if series is None else sum(series[0])
+
+    def samples(self) -> list[str]:
+        lines: list[str] = []
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip((*self._buckets, float("inf")), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: list[_Metric] = []
+
+    def register[M: _Metric](self, metric: M) -> M:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+class AppMetrics:
+    """All metrics the application exposes on /metrics."""
+
+    def __init__(self) -> None:
+        self.registry = MetricsRegistry()
+        register = self.registry.register
+        self.webhook_duration = register(
+            Histogram("voicemail_webhook_duration_seconds", "Bearbeitungszeit der Twilio-Webhooks.", ("endpoint",))
+        )
+        self.webhooks_in_progress = register(
+            Gauge("voicemail_webhooks_in_progress", "Aktuell bearbeitete Twilio-Webhooks.", ("endpoint",))
+        )
+        self.stage_duration = register(
+            Histogram(
+                "voicemail_stage_duration_seconds",
+                "Dauer der Verarbeitungsschritte eines Anrufs (telegram_sync, summary, twiml_render).",
+                ("stage",),
+            )
+        )
+        self.store_duration = register(
+            Histogram(
+                "voicemail_store_operation_duration_seconds",
+                "Dauer der State-Store-Operationen.",
+                ("operation",),
+            )
+        )
+        self.store_errors = register(
+            Counter("voicemail_store_errors_total", "Fehlgeschlagene State-Store-Operationen.", ("operation",))
+        )
+        self.llm_duration = register(
+            Histogram(
+                "voicemail_llm_request_duration_seconds",
+                "Dauer der LLM-Anfragen an OpenAI (ohne Cache-Treffer).",
+                ("outcome",),
+            )
+        )
+        self.llm_prompt_tokens = register(
+            Histogram(
+                "voicemail_llm_prompt_tokens",
+                "Geschaetzte Prompt-Tokens je LLM-Anfrage.",
+                buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384),
+            )
+        )
+        self.llm_tokens = register(Counter("voicemail_llm_tokens_total", "Von OpenAI gemeldete Tokens.", ("type",)))
+        self.llm_fallbacks = register(
+            Counter("voicemail_llm_fallbacks_total", "Regelbasierte Antworten statt LLM.", ("kind",))
+        )
+        self.messages_ingested = register(
+            Counter(
+                "voicemail_telegram_messages_ingested_total",
+                "Neu gespeicherte Telegram-Nachrichten.",
+                ("source",),
+            )
+        )
+
+    def track_calls_in_preparation(self, function: Callable[[], float]) -> None:
+        self.registry.register(
+            Gauge(
+                "voicemail_calls_in_preparation",
+                "Anrufe, deren Zusammenfassung gerade vorbereitet wird.",
+                function=function,
+            )
+        )
+
+    @contextmanager
+    def track_webhook(self, endpoint: str) -> Iterator[None]:
+        self.webhooks_in_progress.inc(endpoint)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.webhook_duration.observe(time.perf_counter() - started, endpoint)
+            self.webhooks_in_progress.dec(endpoint)
+
+    def render(self) -> str:
+        return self.registry.render()
+
+
+class InstrumentedStore:
+    """Wraps any StateStore and records duration and errors per operation.
+
+    Coroutine methods are wrapped on first access and cached on the instance,
+    so later calls skip __getattr__ entirely.
+    """
+
+    def __init__(self, store: StateStore, metrics: AppMetrics) -> None:
+        self._store = store
+        self._metrics = metrics
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._store, name)
+        if name.startswith("_") or not inspect.iscoroutinefunction(attribute):
+            return attribute
+        wrapped = self._wrap(name, attribute)
+        setattr(self, name, wrapped)
+        return wrapped
+
+    def _wrap(self, name: str, method: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        duration = self._metrics.store_duration
+        errors = self._metrics.store_errors
+
+        async def instrumented(*args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            except Exception:
+                errors.inc(name)
+                raise
+            finally:
+                duration.observe(time.perf_counter() - started, name)
+
+        return instrumented
+
+
+def instrument_store(store: StateStore, metrics: AppMetrics) -> StateStore:
+    return cast(StateStore, InstrumentedStore(store, metrics))
@@ -32,6 +32,23 @@ class TelegramMessage:
         )
 
 
+@dataclass(slots=True)
+class InboundMessage:
+    telegram_update_id: int
+    chat_id: int
+    sender: str
+    timestamp: datetime
+    text: str
+
+
+@dataclass(slots=True)
+class ChatSummary:
+    chat_id: int
+    summary: str
+    last_message_id: int
+    message_count: int
+
+
 @dataclass(slots=True)
 class ConversationTurn:
     role: str
@@ -0,0 +1,604 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from ai_messenger_voicemail.models import (
+    CallContext,
+    ChatSummary,
+    ConversationTurn,
+    InboundMessage,
+    TelegramMessage,
+)
+from ai_messenger_voicemail.store import (
+    CALL_PREPARATION_LEASE_PREFIX,
+    TELEGRAM_POLLER_LEASE,
+    LeaseLostError,
+    _message_from_row,
+    _to_epoch,
+)
+
+# Arbitrary constant key for pg_advisory_xact_lock, serialises schema setup
+# when several replicas start at once.
+_SCHEMA_LOCK_KEY = 724_163_001
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id BIGSERIAL PRIMARY KEY,
+    telegram_update_id BIGINT NOT NULL UNIQUE,
+    chat_id BIGINT NOT NULL,
+    sender TEXT NOT NULL,
+    ts BIGINT NOT NULL,
+    text TEXT NOT NULL,
+    is_read BOOLEAN NOT NULL DEFAULT FALSE
+);
+CREATE INDEX IF NOT EXISTS idx_messages_unread_ts ON messages(ts DESC, id DESC) WHERE NOT is_read;
+-- Serves the chat-filtered ORDER BY ts DESC, id DESC LIMIT query without a
+-- sort; replaces an earlier (chat_id, id) index that could not.
+DROP INDEX IF EXISTS idx_messages_unread_chat_ts;
+CREATE INDEX IF NOT EXISTS idx_messages_unread_chat_recent ON messages(chat_id, ts DESC, id DESC) WHERE NOT is_read;
+CREATE TABLE IF NOT EXISTS precomputed_summaries (
+    cache_key TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    created_at BIGINT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS llm_response_cache (
+    cache_key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    expires_at DOUBLE PRECISION NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_response_cache_expires ON llm_response_cache(expires_at);
+CREATE TABLE IF NOT EXISTS chat_summaries (
+    chat_id BIGINT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    last_message_id BIGINT NOT NULL,
+    message_count INTEGER NOT NULL,
+    updated_at BIGINT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS call_contexts (
+    call_sid TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    created_at BIGINT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_call_contexts_created_at ON call_contexts(created_at);
+CREATE TABLE IF NOT EXISTS call_context_messages (
+    call_sid TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    message_id BIGINT NOT NULL,
+    PRIMARY KEY (call_sid, position)
+);
+CREATE TABLE IF NOT EXISTS conversation_turns (
+    id BIGSERIAL PRIMARY KEY,
+    call_sid TEXT NOT NULL,
+    role TEXT NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_conversation_turns_call ON conversation_turns(call_sid, id);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at DOUBLE PRECISION NOT NULL,
+    fencing_token BIGINT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS webhook_responses (
+    call_sid TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    request_hash TEXT NOT NULL,
+    twiml TEXT NOT NULL,
+    created_at BIGINT NOT NULL,
+    PRIMARY KEY (call_sid, endpoint, request_hash)
+);
+CREATE INDEX IF NOT EXISTS idx_webhook_responses_created_at ON webhook_responses(created_at);
+INSERT INTO state(key, value) VALUES ('telegram_offset', '0') ON CONFLICT (key) DO NOTHING;
+"""
+
+_MESSAGE_COLUMNS = "id, telegram_update_id, chat_id, sender, ts, text"
+
+# Same monotonic-offset rule as the SQLite store.
+_ADVANCE_OFFSET_SQL = (
+    "INSERT INTO state(key, value) VALUES ('telegram_offset', $1) "
+    "ON CONFLICT (key) DO UPDATE SET value = "
+    "GREATEST(state.value::bigint, EXCLUDED.value::bigint)::text"
+)
+
+
+class PostgresStore:
+    """asyncpg-backed StateStore with the same schema as the SQLite store.
+
+    The connection pool is created lazily on first use, together with the
+    schema, so the store can be built inside the synchronous app factory.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        *,
+        min_pool_size: int = 1,
+        max_pool_size: int = 10,
+        server_settings: dict[str, str] | None = None,
+    ) -> None:
+        self._dsn = dsn
+        self._min_pool_size = min_pool_size
+        self._max_pool_size = max_pool_size
+        self._server_settings = server_settings
+        self._pool: Any | None = None
+        self._pool_lock = asyncio.Lock()
+
+    async def _get_pool(self) -> Any:
+        if self._pool is not None:
+            return self._pool
+        async with self._pool_lock:
+            if self._pool is None:
+                try:
+                    import asyncpg
+                except ImportError as exc:
+                    raise RuntimeError(
+                        "STORE_BACKEND=postgres benoetigt das Paket 'asyncpg' (Extra 'postgres')."
+                    ) from exc
+                pool = await asyncpg.create_pool(
+                    self._dsn,
+                    min_size=self._min_pool_size,
+                    max_size=self._max_pool_size,
+                    server_settings=self._server_settings,
+                )
+                async with pool.acquire() as conn, conn.transaction():
+                    await conn.execute("SELECT pg_advisory_xact_lock($1)", _SCHEMA_LOCK_KEY)
+                    await conn.execute(_SCHEMA_SQL)
+                self._pool = pool
+        return self._pool
+
+    async def aclose(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def ping(self) -> None:
+        pool = await self._get_pool()
+        await pool.fetchval("SELECT 1")
+
+    async def get_telegram_offset(self) -> int:
+        pool = await self._get_pool()
+        value = await pool.fetchval("SELECT value FROM state WHERE key = 'telegram_offset'")
+        return 0 if value is None else int(value)
+
+    async def set_telegram_offset(self, offset: int) -> None:
+        pool = await self._get_pool()
+        await pool.execute(_ADVANCE_OFFSET_SQL, str(offset))
+
+    async def acquire_lease(self, name: str, holder: str, *, ttl_seconds: float) -> int | None:
+        now = time.time()
+        pool = await self._get_pool()
+        # One upsert: renew our own live lease (same token) or take over an
+        # expired one (token + 1); a live foreign lease leaves the row untouched.
+        return await pool.fetchval(
+            """
+            INSERT INTO leases(name, holder, expires_at, fencing_token) VALUES ($1, $2, $3, 1)
+            ON CONFLICT (name) DO UPDATE SET
+              holder = EXCLUDED.holder,
+              expires_at = EXCLUDED.expires_at,
+              fencing_token = CASE
+                WHEN leases.holder = EXCLUDED.holder AND leases.expires_at > $4 THEN leases.fencing_token
+                ELSE leases.fencing_token + 1
+              END
+            WHERE leases.holder = EXCLUDED.holder OR leases.expires_at <= $4
+            RETURNING fencing_token
+            """,
+            name,
+            holder,
+            now + ttl_seconds,
+            now,
+        )
+
+    async def release_lease(self, name: str, holder: str) -> None:
+        pool = await self._get_pool()
+        await pool.execute("UPDATE leases SET expires_at = 0 WHERE name = $1 AND holder = $2", name, holder)
+
+    async def store_message(
+        self,
+        *,
+        telegram_update_id: int,
+        chat_id: int,
+        sender: str,
+        timestamp: datetime,
+        text: str,
+    ) -> bool:
+        pool = await self._get_pool()
+        inserted = await pool.fetchval(
+            """
+            INSERT INTO messages(telegram_update_id, chat_id, sender, ts, text)
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (telegram_update_id) DO NOTHING
+            RETURNING id
+            """,
+            telegram_update_id,
+            chat_id,
+            sender,
+            _to_epoch(timestamp),
+            text,
+        )
+        return inserted is not None
+
+    async def store_messages(
+        self,
+        messages: list[InboundMessage],
+        *,
+        telegram_offset: int | None = None,
+        fencing_token: int | None = None,
+    ) -> int:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn, conn.transaction():
+            if fencing_token is not None:
+                # FOR SHARE blocks a concurrent takeover until this batch commits.
+                current = await conn.fetchval(
+                    "SELECT fencing_token FROM leases WHERE name = $1 FOR SHARE",
+                    TELEGRAM_POLLER_LEASE,
+                )
+                if current != fencing_token:
+                    raise LeaseLostError("Telegram-Poller-Lease wurde von einem anderen Prozess uebernommen")
+            rows = await conn.fetch(
+                """
+                INSERT INTO messages(telegram_update_id, chat_id, sender, ts, text)
+                SELECT * FROM unnest($1::bigint[], $2::bigint[], $3::text[], $4::bigint[], $5::text[])
+                ON CONFLICT (telegram_update_id) DO NOTHING
+                RETURNING id
+                """,
+                [msg.telegram_update_id for msg in messages],
+                [msg.chat_id for msg in messages],
+                [msg.sender for msg in messages],
+                [_to_epoch(msg.timestamp) for msg in messages],
+                [msg.text for msg in messages],
+            )
+            if telegram_offset is not None:
+                await conn.execute(_ADVANCE_OFFSET_SQL, str(telegram_offset))
+        return len(rows)
+
+    async def list_unread_messages(
+        self,
+        *,
+        limit: int,
+        allowed_chat_id: int | None = None,
+    ) -> list[TelegramMessage]:
+        pool = await self._get_pool()
+        if allowed_chat_id is None:
+            rows = await pool.fetch(
+                f"SELECT {_MESSAGE_COLUMNS} FROM messages WHERE NOT is_read ORDER BY ts DESC, id DESC LIMIT $1",
+                limit,
+            )
+        else:
+            rows = await pool.fetch(
+                f"SELECT {_MESSAGE_COLUMNS} FROM messages WHERE NOT is_read AND chat_id = $1 "
+                "ORDER BY ts DESC, id DESC LIMIT $2",
+                allowed_chat_id,
+                limit,
+            )
+        return [_message_from_row(row) for row in rows]
+
+    async def mark_messages_read(self, ids: list[int]) -> None:
+        if not ids:
+            return
+        pool = await self._get_pool()
+        await pool.execute("UPDATE messages SET is_read = TRUE WHERE id = ANY($1::bigint[])", ids)
+
+    async def list_unread_chat_ids(self, *, allowed_chat_id: int | None = None) -> list[int]:
+        pool = await self._get_pool()
+        if allowed_chat_id is None:
+            rows = await pool.fetch("SELECT DISTINCT chat_id FROM messages WHERE NOT is_read")
+        else:
+            rows = await pool.fetch(
+                "SELECT DISTINCT chat_id FROM messages WHERE NOT is_read AND chat_id = $1",
+                allowed_chat_id,
+            )
+        return [int(row["chat_id"]) for row in rows]
+
+    async def list_unread_chat_messages_after(
+        self,
+        chat_id: int,
+        *,
+        after_id: int,
+        limit: int,
+    ) -> list[TelegramMessage]:
+        pool = await self._get_pool()
+        rows = await pool.fetch(
+            f"""
+            SELECT {_MESSAGE_COLUMNS}
+            FROM messages
+            WHERE NOT is_read AND chat_id = $1 AND id > $2
+            ORDER BY id
+            LIMIT $3
+            """,
+            chat_id,
+            after_id,
+            limit,
+        )
+        return [_message_from_row(row) for row in rows]
+
+    async def mark_chat_messages_read(self, chat_id: int, *, up_to_id: int) -> None:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn, conn.transaction():
+            await conn.execute(
+                "UPDATE messages SET is_read = TRUE WHERE NOT is_read AND chat_id = $1 AND id <= $2",
+                chat_id,
+                up_to_id,
+            )
+            await conn.execute("DELETE FROM chat_summaries WHERE chat_id = $1", chat_id)
+
+    async def get_chat_summaries(self, chat_ids: list[int]) -> dict[int, ChatSummary]:
+        if not chat_ids:
+            return {}
+        pool = await self._get_pool()
+        rows = await pool.fetch(
+            """
+            SELECT chat_id, summary, last_message_id, message_count
+            FROM chat_summaries
+            WHERE chat_id = ANY($1::bigint[])
+            """,
+            chat_ids,
+        )
+        return {
+            int(row["chat_id"]): ChatSummary(
+                chat_id=int(row["chat_id"]),
+                summary=str(row["summary"]),
+                last_message_id=int(row["last_message_id"]),
+                message_count=int(row["message_count"]),
+            )
+            for row in rows
+        }
+
+    async def save_chat_summary(self, chat_summary: ChatSummary) -> None:
+        pool = await self._get_pool()
+        await pool.execute(
+            """
+            INSERT INTO chat_summaries(chat_id, summary, last_message_id, message_count, updated_at)
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (chat_id) DO UPDATE SET
+              summary = EXCLUDED.summary,
+              last_message_id = EXCLUDED.last_message_id,
+              message_count = EXCLUDED.message_count,
+              updated_at = EXCLUDED.updated_at
+            WHERE EXCLUDED.last_message_id >= chat_summaries.last_message_id
+            """,
+            chat_summary.chat_id,
+            chat_summary.summary,
+            chat_summary.last_message_id,
+            chat_summary.message_count,
+            int(time.time()),
+        )
+
+    async def get_precomputed_summary(self, cache_key: str) -> str | None:
+        pool = await self._get_pool()
+        return await pool.fetchval("SELECT summary FROM precomputed_summaries WHERE cache_key = $1", cache_key)
+
+    async def save_precomputed_summary(self, cache_key: str, summary: str, *, keep: int = 16) -> None:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn, conn.transaction():
+            await conn.execute(
+                """
+                INSERT INTO precomputed_summaries(cache_key, summary, created_at) VALUES ($1, $2, $3)
+                ON CONFLICT (cache_key) DO UPDATE SET
+                  summary = EXCLUDED.summary,
+                  created_at = EXCLUDED.created_at
+                """,
+                cache_key,
+                summary,
+                int(time.time()),
+            )
+            await conn.execute(
+                """
+                DELETE FROM precomputed_summaries WHERE cache_key NOT IN (
+                    SELECT cache_key FROM precomputed_summaries ORDER BY created_at DESC LIMIT $1
+                )
+                """,
+                keep,
+            )
+
+    async def get_llm_response(self, cache_key: str, *, now: float) -> tuple[str, float] | None:
+        pool = await self._get_pool()
+        row = await pool.fetchrow(
+            "SELECT response, expires_at FROM llm_response_cache WHERE cache_key = $1 AND expires_at > $2",
+            cache_key,
+            now,
+        )
+        return None if row is None else (str(row["response"]), float(row["expires_at"]))
+
+    async def save_llm_response(
+        self,
+        cache_key: str,
+        response: str,
+        *,
+        expires_at: float,
+        max_entries: int,
+    ) -> None:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn, conn.transaction():
+            await conn.execute(
+                """
+                INSERT INTO llm_response_cache(cache_key, response, expires_at) VALUES ($1, $2, $3)
+                ON CONFLICT (cache_key) DO UPDATE SET
+                  response = EXCLUDED.response,
+                  expires_at = EXCLUDED.expires_at
+                """,
+                cache_key,
+                response,
+                expires_at,
+            )
+            await conn.execute("DELETE FROM llm_response_cache WHERE expires_at <= $1", time.time())
+            await conn.execute(
+                """
+                DELETE FROM llm_response_cache WHERE cache_key IN (
+                    SELECT cache_key FROM llm_response_cache ORDER BY expires_at DESC OFFSET $1
+                )
+                """,
+                max_entries,
+            )
+
+    async def save_call_context(
+        self,
+        call_sid: str,
+        summary: str,
+        messages: list[TelegramMessage],
+    ) -> CallContext:
+        created_at = datetime.now(timezone.utc).replace(microsecond=0)
+        pool = await self._get_pool()
+        async with pool.acquire() as conn, conn.transaction():
+            await conn.execute(
+                """
+                INSERT INTO call_contexts(call_sid, summary, created_at) VALUES ($1, $2, $3)
+                ON CONFLICT (call_sid) DO UPDATE SET
+                  summary = EXCLUDED.summary,
+                  created_at = EXCLUDED.created_at
+                """,
+                call_sid,
+                summary,
+                _to_epoch(created_at),
+            )
+            await conn.execute("DELETE FROM call_context_messages WHERE call_sid = $1", call_sid)
+            await conn.execute("DELETE FROM conversation_turns WHERE call_sid = $1", call_sid)
+            await conn.executemany(
+                "INSERT INTO call_context_messages(call_sid, position, message_id) VALUES ($1, $2, $3)",
+                [(call_sid, position, msg.id) for position, msg in enumerate(messages)],
+            )
+        return CallContext(
+            call_sid=call_sid,
+            summary=summary,
+            messages=list(messages),
+            conversation=[],
+            created_at=created_at,
+        )
+
+    async def get_call_context(self, call_sid: str) -> CallContext | None:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn, conn.transaction(readonly=True):
+            row = await conn.fetchrow("SELECT summary, created_at FROM call_contexts WHERE call_sid = $1", call_sid)
+            if row is None:
+                return None
+            message_rows = await conn.fetch(
+                """
+                SELECT m.id, m.telegram_update_id, m.chat_id, m.sender, m.ts, m.text
+                FROM call_context_messages AS l
+                JOIN messages AS m ON m.id = l.message_id
+                WHERE l.call_sid = $1
+                ORDER BY l.position
+                """,
+                call_sid,
+            )
+            turn_rows = await conn.fetch(
+                "SELECT role, text FROM conversation_turns WHERE call_sid = $1 ORDER BY id",
+                call_sid,
+            )
+        return CallContext(
+            call_sid=call_sid,
+            summary=str(row["summary"]),
+            messages=[_message_from_row(message_row) for message_row in message_rows],
+            conversation=[
+                ConversationTurn(role=str(turn_row["role"]), text=str(turn_row["text"]))
+                for turn_row in turn_rows
+            ],
+            created_at=datetime.fromtimestamp(int(row["created_at"]), tz=timezone.utc),
+        )
+
+    async def append_conversation_turn(self, call_sid: str, role: str, text: str) -> bool:
+        pool = await self._get_pool()
+        inserted = await pool.fetchval(
+            """
+            INSERT INTO conversation_turns(call_sid, role, text)
+            SELECT $1, $2, $3 WHERE EXISTS (SELECT 1 FROM call_contexts WHERE call_sid = $1)
+            RETURNING id
+            """,
+            call_sid,
+            role,
+            text,
+        )
+        return inserted is not None
+
+    async def cleanup_stale_call_contexts(self, *, ttl_minutes: int, batch_size: int = 500) -> int:
+        cutoff = _to_epoch(datetime.now(timezone.utc) - timedelta(minutes=ttl_minutes))
+        pool = await self._get_pool()
+        removed = 0
+        while True:
+            # SKIP LOCKED lets sweepers on several replicas work through disjoint batches.
+            rows = await pool.fetch(
+                """
+                WITH stale AS (
+                    SELECT call_sid FROM call_contexts
+                    WHERE created_at < $1
+                    ORDER BY created_at
+                    LIMIT $2
+                    FOR UPDATE SKIP LOCKED
+                ), dropped_messages AS (
+                    DELETE FROM call_context_messages WHERE call_sid IN (SELECT call_sid FROM stale)
+                ), dropped_turns AS (
+                    DELETE FROM conversation_turns WHERE call_sid IN (SELECT call_sid FROM stale)
+                )
+                DELETE FROM call_contexts WHERE call_sid IN (SELECT call_sid FROM stale)
+                RETURNING call_sid
+                """,
+                cutoff,
+                batch_size,
+            )
+            removed += len(rows)
+            if len(rows) < batch_size:
+                break
+        # Replayable webhook responses and preparation claims live exactly as
+        # long as a call context.
+        await pool.execute(
+            "DELETE FROM leases WHERE name LIKE $1 AND expires_at < $2",
+            f"{CALL_PREPARATION_LEASE_PREFIX}%",
+            float(cutoff),
+        )
+        while True:
+            status = await pool.execute(
+                """
+                DELETE FROM webhook_responses WHERE ctid IN (
+                    SELECT ctid FROM webhook_responses WHERE created_at < $1 LIMIT $2
+                )
+                """,
+                cutoff,
+                batch_size,
+            )
+            if int(status.split()[-1]) < batch_size:
+                return removed
+
+    async def call_context_retention(self) -> tuple[int, datetime | None]:
+        pool = await self._get_pool()
+        row = await pool.fetchrow("SELECT COUNT(*) AS total, MIN(created_at) AS oldest FROM call_contexts")
+        oldest = datetime.fromtimestamp(int(row["oldest"]), tz=timezone.utc) if row["oldest"] is not None else None
+        return int(row["total"]), oldest
+
+    async def get_webhook_response(self, call_sid: str, endpoint: str, request_hash: str) -> str | None:
+        pool = await self._get_pool()
+        return await pool.fetchval(
+            "SELECT twiml FROM webhook_responses WHERE call_sid = $1 AND endpoint = $2 AND request_hash = $3",
+            call_sid,
+            endpoint,
+            request_hash,
+        )
+
+    async def save_webhook_response(self, call_sid: str, endpoint: str, request_hash: str, twiml: str) -> str:
+        pool = await self._get_pool()
+        # First writer wins, so duplicates handled on different replicas
+        # still replay one and the same response.
+        stored = await pool.fetchval(
+            """
+            WITH inserted AS (
+                INSERT INTO webhook_responses(call_sid, endpoint, request_hash, twiml, created_at)
+                VALUES ($1, $2, $3, $4, $5)
+                ON CONFLICT (call_sid, endpoint, request_hash) DO NOTHING
+                RETURNING twiml
+            )
+            SELECT twiml FROM inserted
+            UNION ALL
+            SELECT twiml FROM webhook_responses WHERE call_sid = $1 AND endpoint = $2 AND request_hash = $3
+            LIMIT 1
+            """,
+            call_sid,
+            endpoint,
+            request_hash,
+            twiml,
+            int(time.time()),
+        )
+        # None: a concurrent insert committed after this statement's snapshot.
+        return twiml if stored is None else str(stored)
@@ -1,6 +1,5 @@
 from fastapi import Request
 from starlette.datastructures import FormData
-from twilio.request_validator import RequestValidator
 
 from ai_messenger_voicemail.config import Settings
 
@@ -36,6 +35,8 @@ def validate_twilio_signature(request: Request, form: FormData, settings: Settin
     if not signature:
         return False
 
+    from twilio.request_validator import RequestValidator
+
     validator = RequestValidator(settings.twilio_auth_token)
     target_url = build_public_url(request, settings)
     params: dict[str, str] = {}
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from ai_messenger_voicemail.store import StateStore
+
+logger = logging.getLogger(__name__)
+
+
+class CallContextSweeper:
+    """Expires stale call contexts periodically instead of on the request path."""
+
+    def __init__(
+        self,
+        store: StateStore,
+        *,
+        ttl_minutes: int,
+        interval_seconds: float,
+        batch_size: int,
+    ) -> None:
+        self._store = store
+        self._ttl_minutes = ttl_minutes
+        self._interval_seconds = interval_seconds
+        self._batch_size = batch_size
+        self._task: asyncio.Task[None] | None = None
+        self._sweeps = 0
+        self._removed_total = 0
+        self._last_removed = 0
+        self._last_sweep_at: datetime | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="call-context-sweeper")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def sweep(self) -> int:
+        removed = await self._store.cleanup_stale_call_contexts(
+            ttl_minutes=self._ttl_minutes,
+            batch_size=self._batch_size,
+        )
+        self._sweeps += 1
+        self._removed_total += removed
+        self._last_removed = removed
+        self._last_sweep_at = datetime.now(timezone.utc)
+        if removed:
+            logger.info("%s abgelaufene Call-Kontexte entfernt.", removed)
+        return removed
+
+    async def stats(self) -> dict[str, object]:
+        retained, oldest = await self._store.call_context_retention()
+        oldest_age = (datetime.now(timezone.utc) - oldest).total_seconds() if oldest is not None else None
+        return {
+            "sweeps": self._sweeps,
+            "removed_total": self._removed_total,
+            "last_removed": self._last_removed,
+            "last_sweep_at": self._last_sweep_at.isoformat() if self._last_sweep_at else None,
+            "retained_contexts": retained,
+            "oldest_context_age_seconds": oldest_age,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except Exception:  # noqa: BLE001
+                logger.exception("Bereinigung der Call-Kontexte fehlgeschlagen.")
+            await asyncio.sleep(self._interval_seconds)
@@ -0,0 +1,215 @@
+import re
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone, tzinfo
+from zoneinfo import ZoneInfo
+
+from ai_messenger_voicemail.models import TelegramMessage
+
+_UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+_NUMBER_WORDS = {
+    "eins": 1,
+    "erste": 1,
+    "zwei": 2,
+    "zweite": 2,
+    "drei": 3,
+    "dritte": 3,
+    "vier": 4,
+    "vierte": 4,
+    "fuenf": 5,
+    "fuenfte": 5,
+    "sechs": 6,
+    "sechste": 6,
+    "sieben": 7,
+    "siebte": 7,
+    "acht": 8,
+    "achte": 8,
+    "neun": 9,
+    "neunte": 9,
+    "zehn": 10,
+    "zehnte": 10,
+}
+# Message numbers have one or two digits; longer runs ("Nummer 0171") are
+# phone numbers or codes, not references to a message.
+_NUMBER = r"([1-9]\d?(?!\d)|" + "|".join(_NUMBER_WORDS) + r")"
+_MESSAGE_NUMBER_PATTERNS = (
+    re.compile(r"(?:nachricht|nummer)\s*(?:nr\.?\s*)?\b" + _NUMBER + r"\b"),
+    re.compile(r"\b" + _NUMBER + r"(?:\.|n|te|ten)?\s+nachricht\b"),
+)
+# "die letzten drei Nachrichten": a count, not a message number.
+_MESSAGE_COUNT_PATTERN = re.compile(r"\b" + _NUMBER + r"\s+(?:(?!uhr\b)\w+\s+)?nachrichten\b")
+# Requests that need reasoning over the messages always go to the LLM
+# ("zusammenfassen", not "die Zusammenfassung" itself).
+_OPEN_ENDED_PATTERN = re.compile(r"zusammenfass(?!ung)|\b(?:warum|wieso|weshalb)\b")
+_REPEAT_PATTERNS = (
+    re.compile(r"\bwiederhol"),
+    re.compile(r"^(?:bitte\s+)?(?:(?:die\s+)?zusammenfassung\s+)?noch\s*(?:ein)?mal(?:\s+bitte)?\W*$"),
+)
+_SENDER_CUES = ("geschrieben", "schreibt", "schrieb", "gesagt", "sagt", "geschickt", "von ", "wollte")
+_SENDER_QUESTION = re.compile(r"\bwas\b|nachricht")
+_MESSAGE_CUES = ("nachricht", "geschrieben", "geschickt", "kam", "gekommen", "eingegangen")
+_NEWEST_KEYWORDS = ("neueste", "letzte", "juengste", "aktuellste")
+_OLDEST_KEYWORDS = ("aelteste", "frueheste")
+_HOUR_PATTERN = re.compile(r"\b(?:um|gegen|ab|seit)\s+(\d{1,2})(?:[:.](\d{2}))?\s*uhr")
+# Callers mean local wall-clock time by "heute" or "ab 14 Uhr".
+DEFAULT_TIMEZONE = ZoneInfo("Europe/Berlin")
+
+
+@dataclass(slots=True)
+class IntentMatch:
+    intent: str
+    answer: str
+
+
+def _normalize(text: str) -> str:
+    return text.lower().translate(_UMLAUTS)
+
+
+def _local(msg: TelegramMessage, tz: tzinfo) -> datetime:
+    return msg.timestamp.astimezone(tz)
+
+
+def _describe(index: int, msg: TelegramMessage, tz: tzinfo) -> str:
+    timestamp = _local(msg, tz).strftime("%d.%m.%Y %H:%M")
+    return f"Nachricht {index} von {msg.sender} um {timestamp}: {msg.text}"
+
+
+def _describe_all(matches: list[tuple[int, TelegramMessage]], tz: tzinfo) -> str:
+    lines = (_describe(index, msg, tz) for index, msg in matches)
+    return " ".join(line if line.endswith((".", "!", "?")) else f"{line}." for line in lines)
+
+
+def _message_number(question: str, messages: list[TelegramMessage], tz: tzinfo) -> IntentMatch | None:
+    for pattern in _MESSAGE_NUMBER_PATTERNS:
+        match = pattern.search(question)
+        if match is None:
+            continue
+        token = match.group(1)
+        number = int(token) if token.isdigit() else _NUMBER_WORDS[token]
+        if 1 <= number <= len(messages):
+            return IntentMatch("message_number", _describe(number, messages[number - 1], tz))
+        return IntentMatch(
+            "message_number",
+            f"Ich finde Nachricht {number} nicht. Es liegen nur {len(messages)} Nachrichten vor.",
+        )
+    return None
+
+
+def _repeat(question: str, summary: str) -> IntentMatch | None:
+    if any(pattern.search(question) for pattern in _REPEAT_PATTERNS):
+        return IntentMatch("repeat", f"Ich wiederhole die Zusammenfassung: {summary}")
+    return None
+
+
+def _sender_lookup(question: str, messages: list[TelegramMessage], tz: tzinfo) -> IntentMatch | None:
+    # Only "what did X write" questions; asking for a detail ("Welche Nummer
+    # hat Bob geschickt?") needs the LLM.
+    if not any(cue in question for cue in _SENDER_CUES) or not _SENDER_QUESTION.search(question):
+        return None
+    for sender in dict.fromkeys(msg.sender for msg in messages):
+        if re.search(rf"\b{re.escape(_normalize(sender))}\b", question):
+            matches = [(index, msg) for index, msg in enumerate(messages, start=1) if msg.sender == sender]
+            return IntentMatch("sender", _describe_all(matches, tz))
+    return None
+
+
+def _time_lookup(
+    question: str,
+    messages: list[TelegramMessage],
+    now: datetime,
+    tz: tzinfo,
+) -> IntentMatch | None:
+    if not any(cue in question for cue in _MESSAGE_CUES):
+        return None
+    indexed = list(enumerate(messages, start=1))
+    # Newest/oldest answer with a single message, so only for the singular.
+    singular = re.search(r"\bnachricht\b", question) is not None or "nachrichten" not in question
+    if singular and any(keyword in question for keyword in _NEWEST_KEYWORDS):
+        index, msg = max(indexed, key=lambda item: item[1].timestamp)
+        return IntentMatch("time", _describe(index, msg, tz))
+    if singular and any(keyword in question for keyword in _OLDEST_KEYWORDS):
+        index, msg = min(indexed, key=lambda item: item[1].timestamp)
+        return IntentMatch("time", _describe(index, msg, tz))
+
+    today = now.astimezone(tz).date()
+    if "gestern" in question:
+        day, label = today - timedelta(days=1), "gestern"
+    elif "heute" in question:
+        day, label = today, "heute"
+    else:
+        day, label = None, None
+    hour = _HOUR_PATTERN.search(question)
+    if day is None and hour is None:
+        return None
+
+    matches = [(index, msg) for index, msg in indexed if day is None or _local(msg, tz).date() == day]
+    if hour is not None:
+        start = int(hour.group(1)) * 60 + int(hour.group(2) or 0)
+        label = f"{label} ab {hour.group(1)} Uhr" if label else f"ab {hour.group(1)} Uhr"
+        matches = [
+            (index, msg) for index, msg in matches if _local(msg, tz).hour * 60 + _local(msg, tz).minute >= start
+        ]
+    if not matches:
+        return IntentMatch("time", f"Fuer {label} liegen keine Nachrichten vor.")
+    return IntentMatch("time", _describe_all(matches, tz))
+
+
+def resolve_intent(
+    question: str,
+    messages: list[TelegramMessage],
+    summary: str,
+    *,
+    now: datetime | None = None,
+    tz: tzinfo = DEFAULT_TIMEZONE,
+) -> IntentMatch | None:
+    """Answers simple follow-ups deterministically; `None` means open-ended.
+
+    Days, hours and the times read out are in `tz`, the caller's local time.
+
+    Anything ambiguous is escalated: a wrong local answer costs the caller more
+    than an LLM round-trip. Sender and time lookups run before the repeat
+    intent, so "Was hat Anna nochmal geschrieben?" is about Anna.
+    """
+    normalized = _normalize(question)
+    if _OPEN_ENDED_PATTERN.search(normalized) or _MESSAGE_COUNT_PATTERN.search(normalized):
+        return None
+    return (
+        _message_number(normalized, messages, tz)
+        or _sender_lookup(normalized, messages, tz)
+        or _time_lookup(normalized, messages, now or datetime.now(timezone.utc), tz)
+        or _repeat(normalized, summary)
+    )
+
+
+class IntentRouter:
+    """Local first stage for follow-up questions with hit-rate bookkeeping."""
+
+    def __init__(self, *, tz: tzinfo = DEFAULT_TIMEZONE) -> None:
+        self._tz = tz
+        self._hits: Counter[str] = Counter()
+        self._escalations = 0
+
+    def route(
+        self,
+        question: str,
+        messages: list[TelegramMessage],
+        summary: str,
+        *,
+        now: datetime | None = None,
+    ) -> IntentMatch | None:
+        match = resolve_intent(question, messages, summary, now=now, tz=self._tz)
+        if match is None:
+            self._escalations += 1
+        else:
+            self._hits[match.intent] += 1
+        return match
+
+    def stats(self) -> dict[str, object]:
+        hits = sum(self._hits.values())
+        total = hits + self._escalations
+        return {
+            "hits": dict(self._hits),
+            "escalated": self._escalations,
+            "hit_rate": hits / total if total else None,
+        }
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+from ai_messenger_voicemail.store import StateStore
+
+
+class LLMResponseCache:
+    """Two-tier cache for LLM responses keyed by a hash of the full request.
+
+    The in-memory tier is an LRU bounded by `max_entries`; the optional SQLite
+    tier survives restarts and is shared by all workers on the same file.
+    Both tiers expire entries after `ttl_seconds`.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int,
+        ttl_seconds: float,
+        store: StateStore | None = None,
+    ) -> None:
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._store = store
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._memory_hits = 0
+        self._store_hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def make_key(*, model: str, system_prompt: str, user_content: str, max_output_tokens: int) -> str:
+        payload = json.dumps(
+            [model, system_prompt, user_content, max_output_tokens],
+            ensure_ascii=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> str | None:
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self._memory_hits += 1
+                return value
+            del self._entries[key]
+
+        if self._store is not None:
+            stored = await self._store.get_llm_response(key, now=now)
+            if stored is not None:
+                value, expires_at = stored
+                self._remember(key, value, expires_at)
+                self._store_hits += 1
+                return value
+
+        self._misses += 1
+        return None
+
+    async def set(self, key: str, value: str) -> None:
+        expires_at = time.time() + self._ttl_seconds
+        self._remember(key, value, expires_at)
+        if self._store is not None:
+            await self._store.save_llm_response(
+                key,
+                value,
+                expires_at=expires_at,
+                max_entries=self._max_entries,
+            )
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "memory_hits": self._memory_hits,
+            "store_hits": self._store_hits,
+            "misses": self._misses,
+        }
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
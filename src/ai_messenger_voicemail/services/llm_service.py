@@ -1,62 +1,284 @@
+import asyncio
 import json
 import logging
-import re
-
-from openai import AsyncOpenAI
+import time
+from typing import Any
 
 from ai_messenger_voicemail.config import Settings
+from ai_messenger_voicemail.metrics import AppMetrics
 from ai_messenger_voicemail.models import ConversationTurn, TelegramMessage
+from ai_messenger_voicemail.services.llm_cache import LLMResponseCache
+from ai_messenger_voicemail.services.intent_router import resolve_intent
+from ai_messenger_voicemail.services.prompt_builder import PromptBuilder
+from ai_messenger_voicemail.services.resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, hedged
 
 logger = logging.getLogger(__name__)
 
+SUMMARY_SYSTEM_PROMPT = (
+    "Du bist ein deutschsprachiger Assistent fuer Telefonzusammenfassungen. "
+    "Fasse Messenger-Nachrichten kompakt und gut vorlesbar zusammen. "
+    "Format je Zeile: Nachricht N: Absender -> Zeitpunkt -> Zusammenfassung. "
+    "Verdichte Dopplungen und priorisiere wichtige Inhalte."
+)
+
+CHUNK_SYSTEM_PROMPT = (
+    "Du verdichtest Messenger-Nachrichten eines Chats zu einer kurzen Teilzusammenfassung auf Deutsch. "
+    "Nenne Absender und wichtige Inhalte, ohne Nachrichten zu nummerieren. "
+    "Bestehende Teilzusammenfassungen werden mit neuen Inhalten zu einer Teilzusammenfassung vereint."
+)
+
+MERGE_SYSTEM_PROMPT = (
+    "Du bist ein deutschsprachiger Assistent fuer Telefonzusammenfassungen. "
+    "Fuehre die Teilzusammenfassungen zu einer kompakten, gut vorlesbaren Zusammenfassung zusammen. "
+    "Verdichte Dopplungen und priorisiere wichtige Inhalte."
+)
+
+FOLLOWUP_SYSTEM_PROMPT = (
+    "Du bist ein sprachbasierter Messenger-Assistent auf Deutsch. "
+    "Antworte kurz, praezise und auf die konkrete Rueckfrage. "
+    "Wenn der Nutzer auf Nachrichtsnummern verweist, nutze genau diese Inhalte."
+)
+
+
+def _log_failure(message: str, exc: BaseException) -> None:
+    # Expected degradations (budget exceeded, breaker open) need no stack trace.
+    if isinstance(exc, (TimeoutError, CircuitOpenError)):
+        logger.warning("%s (%s)", message, type(exc).__name__)
+    else:
+        logger.exception(message)
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised instead of falling back when the caller asked for LLM output only."""
+
 
 class LLMService:
-    def __init__(self, settings: Settings) -> None:
+    def __init__(
+        self,
+        settings: Settings,
+        cache: LLMResponseCache | None = None,
+        *,
+        metrics: AppMetrics | None = None,
+    ) -> None:
         self._settings = settings
-        self._client = AsyncOpenAI(api_key=settings.openai_api_key) if settings.openai_api_key else None
+        self._metrics = metrics
+        # Created on first use: importing the OpenAI SDK is expensive and not
+        # needed by processes that never reach the LLM.
+        self._client: Any | None = None
+        self._cache = cache
+        self._breaker = CircuitBreaker(
+            failure_threshold=settings.llm_breaker_failure_threshold,
+            reset_timeout_seconds=settings.llm_breaker_reset_seconds,
+        )
+        self._latency = LatencyTracker()
+        self._timeouts = 0
+        self._hedges = 0
+        self._prompt_builder = PromptBuilder(settings)
+        self._requests = 0
+        self._prompt_tokens = 0
+        self._input_tokens = 0
+        self._output_tokens = 0
+        self._truncated_messages = 0
+        self._omitted_messages = 0
+
+    @property
+    def available(self) -> bool:
+        return self._client is not None or bool(self._settings.openai_api_key)
+
+    def _openai_client(self) -> Any:
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(
+                api_key=self._settings.openai_api_key,
+                base_url=self._settings.openai_base_url or None,
+            )
+        return self._client
+
+    def resilience_stats(self) -> dict[str, object]:
+        return {
+            "breaker": self._breaker.snapshot(),
+            "latency_p50_seconds": self._latency.percentile(50),
+            "latency_p95_seconds": self._latency.percentile(95),
+            "timeouts": self._timeouts,
+            "hedged_requests": self._hedges,
+        }
+
+    def token_stats(self) -> dict[str, int]:
+        return {
+            "requests": self._requests,
+            "estimated_prompt_tokens": self._prompt_tokens,
+            "input_tokens": self._input_tokens,
+            "output_tokens": self._output_tokens,
+            "truncated_messages": self._truncated_messages,
+            "omitted_messages": self._omitted_messages,
+        }
+
+    def _hedge_delay(self, budget_seconds: float) -> float | None:
+        if not self._settings.llm_hedge_enabled or len(self._latency) < self._settings.llm_hedge_min_samples:
+            return None
+        delay = self._latency.percentile(self._settings.llm_hedge_percentile)
+        if delay is None or delay >= budget_seconds:
+            return None
+        return delay
+
+    async def _complete(
+        self,
+        *,
+        system_prompt: str,
+        user_content: str,
+        max_output_tokens: int,
+        budget_seconds: float,
+    ) -> str:
+        if not self.available:
+            raise LLMUnavailableError("OPENAI_API_KEY fehlt")
+        cache_key = None
+        if self._cache is not None:
+            cache_key = LLMResponseCache.make_key(
+                model=self._settings.openai_model,
+                system_prompt=system_prompt,
+                user_content=user_content,
+                max_output_tokens=max_output_tokens,
+            )
+            cached = await self._cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        client = self._openai_client()
+        prompt_tokens = self._prompt_builder.count(system_prompt) + self._prompt_builder.count(user_content)
+
+        # Nothing that can raise may sit between allow() and the try below:
+        # a half-open probe must always be settled.
+        if not self._breaker.allow():
+            raise CircuitOpenError("LLM-Circuit-Breaker ist offen")
+        if self._metrics is not None:
+            self._metrics.llm_prompt_tokens.observe(prompt_tokens)
+
+        async def request() -> str:
+            response = await client.responses.create(
+                model=self._settings.openai_model,
+                input=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_content},
+                ],
+                max_output_tokens=max_output_tokens,
+            )
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                self._input_tokens += usage.input_tokens
+                self._output_tokens += usage.output_tokens
+                if self._metrics is not None:
+                    self._metrics.llm_tokens.inc("input", amount=usage.input_tokens)
+                    self._metrics.llm_tokens.inc("output", amount=usage.output_tokens)
+            return response.output_text.strip()
 
-    async def summarize_messages(self, messages: list[TelegramMessage]) -> str:
+        started = time.monotonic()
+        try:
+            answer, hedge_issued = await asyncio.wait_for(
+                hedged(request, hedge_after=self._hedge_delay(budget_seconds)),
+                timeout=budget_seconds,
+            )
+        except TimeoutError:
+            self._timeouts += 1
+            self._breaker.record_failure()
+            self._observe_request("timeout", started)
+            raise
+        except Exception:
+            self._breaker.record_failure()
+            self._observe_request("error", started)
+            raise
+        except asyncio.CancelledError:
+            self._breaker.record_cancelled()
+            self._observe_request("cancelled", started)
+            raise
+        self._breaker.record_success()
+        elapsed = time.monotonic() - started
+        self._observe_request("ok", started)
+        self._latency.observe(elapsed)
+        self._requests += 1
+        self._prompt_tokens += prompt_tokens
+        logger.info("LLM-Anfrage: ca. %s Prompt-Tokens, %.2fs.", prompt_tokens, elapsed)
+        if hedge_issued:
+            self._hedges += 1
+
+        if answer and cache_key is not None:
+            await self._cache.set(cache_key, answer)
+        return answer
+
+    async def summarize_messages(
+        self,
+        messages: list[TelegramMessage],
+        *,
+        allow_fallback: bool = True,
+    ) -> str:
         if not messages:
             return "Aktuell liegen keine ungelesenen Nachrichten vor."
 
-        if self._client is None:
+        if not self.available:
+            if not allow_fallback:
+                raise LLMUnavailableError("OPENAI_API_KEY fehlt")
             logger.warning("OPENAI_API_KEY fehlt. Nutze regelbasierte Fallback-Zusammenfassung.")
             return self._fallback_summary(messages)
 
-        prompt_lines = [msg.as_prompt_line(idx) for idx, msg in enumerate(messages, start=1)]
-        prompt = "\n".join(prompt_lines)
+        prompt = self._message_block(messages)
 
         try:
-            response = await self._client.responses.create(
-                model=self._settings.openai_model,
-                input=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "Du bist ein deutschsprachiger Assistent fuer Telefonzusammenfassungen. "
-                            "Fasse Messenger-Nachrichten kompakt und gut vorlesbar zusammen. "
-                            "Format je Zeile: Nachricht N: Absender -> Zeitpunkt -> Zusammenfassung. "
-                            "Verdichte Dopplungen und priorisiere wichtige Inhalte."
-                        ),
-                    },
-                    {
-                        "role": "user",
-                        "content": (
-                            "Fasse diese ungelesenen Nachrichten fuer einen Sprachanruf zusammen:\n"
-                            f"{prompt}"
-                        ),
-                    },
-                ],
+            answer = await self._complete(
+                system_prompt=SUMMARY_SYSTEM_PROMPT,
+                user_content=(
+                    "Fasse diese ungelesenen Nachrichten fuer einen Sprachanruf zusammen:\n"
+                    f"{prompt}"
+                ),
                 max_output_tokens=450,
+                budget_seconds=self._settings.llm_summary_budget_seconds,
             )
-            answer = response.output_text.strip()
             if answer:
                 return answer
-        except Exception:  # noqa: BLE001
-            logger.exception("LLM-Zusammenfassung fehlgeschlagen. Nutze Fallback.")
+        except Exception as exc:  # noqa: BLE001
+            if not allow_fallback:
+                raise LLMUnavailableError("LLM-Zusammenfassung fehlgeschlagen") from exc
+            _log_failure("LLM-Zusammenfassung fehlgeschlagen. Nutze Fallback.", exc)
 
+        if not allow_fallback:
+            raise LLMUnavailableError("LLM-Zusammenfassung war leer")
         return self._fallback_summary(messages)
 
+    async def summarize_chunk(self, messages: list[TelegramMessage]) -> str:
+        """Map step: condenses one chunk of a chat into a partial summary."""
+        if self.available:
+            lines = self._message_block(messages)
+            try:
+                answer = await self._complete(
+                    system_prompt=CHUNK_SYSTEM_PROMPT,
+                    user_content=f"Nachrichten:\n{lines}",
+                    max_output_tokens=200,
+                    budget_seconds=self._settings.llm_summary_budget_seconds,
+                )
+                if answer:
+                    return answer
+            except Exception as exc:  # noqa: BLE001
+                _log_failure("LLM-Teilzusammenfassung fehlgeschlagen. Nutze Fallback.", exc)
+        return self._fallback_chunk_summary(messages)
+
+    async def merge_summaries(self, partials: list[str], *, final: bool = False) -> str:
+        """Reduce step: merges partial summaries into one."""
+        if len(partials) == 1:
+            return partials[0]
+        if self.available:
+            blocks = "\n".join(f"- {partial}" for partial in partials)
+            try:
+                answer = await self._complete(
+                    system_prompt=MERGE_SYSTEM_PROMPT if final else CHUNK_SYSTEM_PROMPT,
+                    user_content=f"Teilzusammenfassungen:\n{blocks}",
+                    max_output_tokens=450 if final else 200,
+                    budget_seconds=self._settings.llm_summary_budget_seconds,
+                )
+                if answer:
+                    return answer
+            except Exception as exc:  # noqa: BLE001
+                _log_failure("LLM-Zusammenfuehrung fehlgeschlagen. Nutze Fallback.", exc)
+        return " ".join(partials)
+
     async def answer_followup(
         self,
         question: str,
@@ -67,48 +289,56 @@ class LLMService:
         if not messages:
             return "Es sind aktuell keine Nachrichten im Kontext dieses Anrufs vorhanden."
 
-        if self._client is None:
+        if not self.available:
             return self._fallback_followup(question, messages, summary)
 
-        history = "\n".join(f"{item.role}: {item.text}" for item in conversation[-8:])
-        messages_block = "\n".join(msg.as_prompt_line(idx) for idx, msg in enumerate(messages, start=1))
+        history = self._prompt_builder.history_block(conversation)
+        messages_block = self._message_block(messages)
 
         try:
-            response = await self._client.responses.create(
-                model=self._settings.openai_model,
-                input=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "Du bist ein sprachbasierter Messenger-Assistent auf Deutsch. "
-                            "Antworte kurz, praezise und auf die konkrete Rueckfrage. "
-                            "Wenn der Nutzer auf Nachrichtsnummern verweist, nutze genau diese Inhalte."
-                        ),
-                    },
+            answer = await self._complete(
+                system_prompt=FOLLOWUP_SYSTEM_PROMPT,
+                user_content=json.dumps(
                     {
-                        "role": "user",
-                        "content": json.dumps(
-                            {
-                                "question": question,
-                                "summary": summary,
-                                "messages": messages_block,
-                                "history": history,
-                            },
-                            ensure_ascii=True,
-                        ),
+                        "question": question,
+                        "summary": summary,
+                        "messages": messages_block,
+                        "history": history,
                     },
-                ],
+                    ensure_ascii=True,
+                ),
                 max_output_tokens=350,
+                budget_seconds=self._settings.llm_followup_budget_seconds,
             )
-            answer = response.output_text.strip()
             if answer:
                 return answer
-        except Exception:  # noqa: BLE001
-            logger.exception("LLM-Antwort fuer Rueckfrage fehlgeschlagen. Nutze Fallback.")
+        except Exception as exc:  # noqa: BLE001
+            _log_failure("LLM-Antwort fuer Rueckfrage fehlgeschlagen. Nutze Fallback.", exc)
 
         return self._fallback_followup(question, messages, summary)
 
+    def _message_block(self, messages: list[TelegramMessage]) -> str:
+        block = self._prompt_builder.message_block(messages)
+        self._truncated_messages += block.truncated_messages
+        self._omitted_messages += block.omitted_messages
+        if block.omitted_messages:
+            logger.info(
+                "Prompt-Budget erreicht: %s Nachrichten ausgelassen, %s gekuerzt.",
+                block.omitted_messages,
+                block.truncated_messages,
+            )
+        return block.text
+
+    def _observe_request(self, outcome: str, started: float) -> None:
+        if self._metrics is not None:
+            self._metrics.llm_duration.observe(time.monotonic() - started, outcome)
+
+    def _count_fallback(self, kind: str) -> None:
+        if self._metrics is not None:
+            self._metrics.llm_fallbacks.inc(kind)
+
     def _fallback_summary(self, messages: list[TelegramMessage]) -> str:
+        self._count_fallback("summary")
         lines: list[str] = []
         for index, msg in enumerate(messages, start=1):
             timestamp = msg.timestamp.strftime("%d.%m.%Y %H:%M")
@@ -118,17 +348,18 @@ class LLMService:
             lines.append(f"Nachricht {index}: {msg.sender} -> {timestamp} -> {preview}.")
         return " ".join(lines)
 
-    def _fallback_followup(self, question: str, messages: list[TelegramMessage], summary: str) -> str:
-        match = re.search(r"(?:nachricht|nummer)\s*(\d+)", question.lower())
-        if match:
-            idx = int(match.group(1)) - 1
-            if 0 <= idx < len(messages):
-                msg = messages[idx]
-                timestamp = msg.timestamp.strftime("%d.%m.%Y %H:%M")
-                return f"Nachricht {idx + 1} von {msg.sender} um {timestamp}: {msg.text}"
-            return f"Ich finde Nachricht {idx + 1} nicht. Es liegen nur {len(messages)} Nachrichten vor."
-
-        if any(keyword in question.lower() for keyword in ["wiederhol", "zusammenfass", "nochmal"]):
-            return f"Ich wiederhole die Zusammenfassung: {summary}"
+    def _fallback_chunk_summary(self, messages: list[TelegramMessage]) -> str:
+        self._count_fallback("chunk_summary")
+        senders = ", ".join(dict.fromkeys(msg.sender for msg in messages))
+        newest = messages[-1].text.replace("\n", " ")
+        if len(newest) > 120:
+            newest = f"{newest[:117]}..."
+        noun = "Nachricht" if len(messages) == 1 else "Nachrichten"
+        return f"{len(messages)} {noun} von {senders}. Zuletzt: {newest}."
 
+    def _fallback_followup(self, question: str, messages: list[TelegramMessage], summary: str) -> str:
+        self._count_fallback("followup")
+        match = resolve_intent(question, messages, summary)
+        if match is not None:
+            return match.answer
         return "Ich kann dazu nur auf Basis der vorhandenen Nachrichten antworten. Bitte nenne eine Nachrichtsnummer."
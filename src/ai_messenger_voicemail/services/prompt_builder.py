@@ -0,0 +1,102 @@
+import math
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Any
+
+from ai_messenger_voicemail.config import Settings
+from ai_messenger_voicemail.models import ConversationTurn, TelegramMessage
+
+# Rough chars-per-token ratio used when tiktoken is not installed.
+_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str) -> Any | None:
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: str) -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / _CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+
+@lru_cache(maxsize=4096)
+def count_message_tokens(text: str, model: str) -> int:
+    # Only per-message texts are cached: the same messages recur in the
+    # summary, the precompute and every follow-up of a call, while assembled
+    # prompts are unique and would only fill the cache.
+    return count_tokens(text, model)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str) -> str:
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    encoding = _encoding(model)
+    if encoding is None:
+        return f"{text[: max_tokens * _CHARS_PER_TOKEN].rstrip()}..."
+    return f"{encoding.decode(encoding.encode(text)[:max_tokens]).rstrip()}..."
+
+
+@dataclass(slots=True)
+class PromptBlock:
+    text: str
+    tokens: int
+    truncated_messages: int = 0
+    omitted_messages: int = 0
+
+
+class PromptBuilder:
+    """Builds message blocks that respect per-message and total token budgets.
+
+    Long messages are shortened to `prompt_max_tokens_per_message`; once the
+    block reaches `prompt_max_total_tokens` the remaining (oldest) messages are
+    omitted and replaced by a single note. Message numbers stay stable, so
+    follow-ups like "Nachricht 2" still refer to the same message.
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self._settings = settings
+
+    def count(self, text: str) -> int:
+        return count_tokens(text, self._settings.openai_model)
+
+    def message_block(self, messages: list[TelegramMessage]) -> PromptBlock:
+        model = self._settings.openai_model
+        per_message = self._settings.prompt_max_tokens_per_message
+        budget = self._settings.prompt_max_total_tokens
+        lines: list[str] = []
+        tokens = 0
+        truncated = 0
+        for index, msg in enumerate(messages, start=1):
+            text = msg.text
+            if count_message_tokens(text, model) > per_message:
+                text = truncate_to_tokens(text, per_message, model)
+            line = replace(msg, text=text).as_prompt_line(index)
+            line_tokens = count_message_tokens(line, model)
+            if lines and tokens + line_tokens > budget:
+                omitted = len(messages) - index + 1
+                lines.append(f"(+{omitted} weitere Nachrichten aus Platzgruenden ausgelassen)")
+                return PromptBlock("\n".join(lines), tokens, truncated, omitted)
+            if text != msg.text:
+                truncated += 1
+            lines.append(line)
+            tokens += line_tokens
+        return PromptBlock("\n".join(lines), tokens, truncated, 0)
+
+    def history_block(self, conversation: list[ConversationTurn], *, max_turns: int = 8) -> str:
+        model = self._settings.openai_model
+        per_message = self._settings.prompt_max_tokens_per_message
+        return "\n".join(
+            f"{item.role}: {truncate_to_tokens(item.text, per_message, model)}"
+            for item in conversation[-max_turns:]
+        )
+
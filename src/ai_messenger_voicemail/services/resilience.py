@@ -0,0 +1,119 @@
+import asyncio
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised while the breaker short-circuits calls to an unhealthy upstream."""
+
+
+class CircuitBreaker:
+    """Classic closed -> open -> half-open breaker.
+
+    After `failure_threshold` consecutive failures calls are rejected for
+    `reset_timeout_seconds`; then a single probe is let through and its outcome
+    decides whether the breaker closes again or re-opens.
+    """
+
+    def __init__(self, *, failure_threshold: int, reset_timeout_seconds: float) -> None:
+        self._failure_threshold = failure_threshold
+        self._reset_timeout_seconds = reset_timeout_seconds
+        self._consecutive_failures = 0
+        self._opened_at: float | None = None
+        self._probe_in_flight = False
+        self._rejected = 0
+        self._times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self._reset_timeout_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self._rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    def record_cancelled(self) -> None:
+        # A cancelled call says nothing about the upstream: free the probe slot
+        # so the next call probes instead of the breaker staying half-open forever.
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._consecutive_failures += 1
+        if self._probe_in_flight or self._consecutive_failures >= self._failure_threshold:
+            if self._opened_at is None or self._probe_in_flight:
+                self._times_opened += 1
+            self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def snapshot(self) -> dict[str, str | int]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._consecutive_failures,
+            "times_opened": self._times_opened,
+            "rejected": self._rejected,
+        }
+
+
+class LatencyTracker:
+    """Rolling window of observed latencies for percentile-based hedging."""
+
+    def __init__(self, *, window: int = 200) -> None:
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, percentile: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(int(len(ordered) * percentile / 100), len(ordered) - 1)
+        return ordered[index]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+async def hedged[T](factory: Callable[[], Awaitable[T]], *, hedge_after: float | None) -> tuple[T, bool]:
+    """Runs `factory`; if it is still pending after `hedge_after` seconds a second
+    identical attempt is started and the first successful result wins.
+
+    Returns the result and whether a hedge request was issued.
+    """
+    tasks = [asyncio.ensure_future(factory())]
+    try:
+        if hedge_after is not None:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done:
+                tasks.append(asyncio.ensure_future(factory()))
+
+        pending = set(tasks)
+        error: BaseException | None = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), len(tasks) > 1
+                error = task.exception()
+        assert error is not None
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
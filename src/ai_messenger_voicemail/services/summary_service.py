@@ -0,0 +1,222 @@
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+
+from ai_messenger_voicemail.config import Settings
+from ai_messenger_voicemail.models import ChatSummary, TelegramMessage
+from ai_messenger_voicemail.services.llm_service import LLMService, LLMUnavailableError
+from ai_messenger_voicemail.store import StateStore
+
+logger = logging.getLogger(__name__)
+
+
+def summary_cache_key(
+    messages: list[TelegramMessage],
+    *,
+    allowed_chat_id: int | None,
+    model: str,
+) -> str:
+    ids = ",".join(str(msg.id) for msg in sorted(messages, key=lambda msg: msg.id))
+    raw = f"{model}|{allowed_chat_id}|{ids}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SummaryPrecomputer:
+    """Keeps a summary of the current unread set ready before the next call.
+
+    `schedule()` is called whenever new messages are ingested; refreshes are
+    coalesced so a burst of updates triggers at most one extra LLM round.
+    """
+
+    def __init__(self, settings: Settings, store: StateStore, llm_service: LLMService) -> None:
+        self._settings = settings
+        self._store = store
+        self._llm_service = llm_service
+        self._task: asyncio.Task[None] | None = None
+        self._dirty = False
+        self._hits = 0
+        self._misses = 0
+        self._refreshes = 0
+
+    def schedule(self) -> None:
+        self._dirty = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop(), name="summary-precompute")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def get_summary(self, messages: list[TelegramMessage]) -> str:
+        cached = await self._store.get_precomputed_summary(self._cache_key(messages))
+        if cached is not None:
+            self._hits += 1
+            return cached
+        self._misses += 1
+        return await self._llm_service.summarize_messages(messages)
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self._hits, "misses": self._misses, "refreshes": self._refreshes}
+
+    def _cache_key(self, messages: list[TelegramMessage]) -> str:
+        return summary_cache_key(
+            messages,
+            allowed_chat_id=self._settings.telegram_allowed_chat_id,
+            model=self._settings.openai_model,
+        )
+
+    async def _refresh_loop(self) -> None:
+        while self._dirty:
+            self._dirty = False
+            try:
+                await self._refresh()
+            except Exception:  # noqa: BLE001
+                logger.exception("Vorberechnung der Zusammenfassung fehlgeschlagen.")
+
+    async def _refresh(self) -> None:
+        messages = await self._store.list_unread_messages(
+            limit=self._settings.max_messages_per_call,
+            allowed_chat_id=self._settings.telegram_allowed_chat_id,
+        )
+        if not messages:
+            return
+        cache_key = self._cache_key(messages)
+        if await self._store.get_precomputed_summary(cache_key) is not None:
+            return
+        try:
+            # Fallback output is only a stopgap and must not be cached as if it
+            # were the real summary.
+            summary = await self._llm_service.summarize_messages(messages, allow_fallback=False)
+        except LLMUnavailableError:
+            logger.warning("LLM nicht verfuegbar. Zusammenfassung wird beim Anruf erstellt.")
+            return
+        await self._store.save_precomputed_summary(cache_key, summary)
+        self._refreshes += 1
+
+
+@dataclass(slots=True)
+class IncrementalSummary:
+    summary: str
+    # chat_id -> id of the newest message covered by the summary
+    covered: dict[int, int]
+    message_count: int
+
+
+class IncrementalSummarizer:
+    """Maintains rolling per-chat partial summaries and merges them per call.
+
+    New unread messages are summarized in chunks (map, bounded concurrency) and
+    folded into the chat's stored partial summary (reduce). At call time only the
+    small per-chat partials are merged, so the final prompt stays flat however
+    large the unread backlog grows.
+    """
+
+    def __init__(self, settings: Settings, store: StateStore, llm_service: LLMService) -> None:
+        self._settings = settings
+        self._store = store
+        self._llm_service = llm_service
+        self._lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(settings.summary_max_concurrency)
+        self._task: asyncio.Task[None] | None = None
+        self._dirty = False
+
+    def schedule(self) -> None:
+        self._dirty = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._update_loop(), name="incremental-summary")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def summarize_for_call(self) -> IncrementalSummary:
+        async with self._lock:
+            partials = await self._update_partials()
+        if not partials:
+            return IncrementalSummary(
+                summary="Aktuell liegen keine ungelesenen Nachrichten vor.",
+                covered={},
+                message_count=0,
+            )
+        ordered = sorted(partials.values(), key=lambda item: item.last_message_id)
+        summary = await self._reduce([item.summary for item in ordered], final=True)
+        return IncrementalSummary(
+            summary=summary,
+            covered={item.chat_id: item.last_message_id for item in ordered},
+            message_count=sum(item.message_count for item in ordered),
+        )
+
+    async def mark_covered_read(self, result: IncrementalSummary) -> None:
+        async with self._lock:
+            for chat_id, last_message_id in result.covered.items():
+                await self._store.mark_chat_messages_read(chat_id, up_to_id=last_message_id)
+
+    async def _update_loop(self) -> None:
+        while self._dirty:
+            self._dirty = False
+            try:
+                async with self._lock:
+                    await self._update_partials()
+            except Exception:  # noqa: BLE001
+                logger.exception("Inkrementelle Zusammenfassung fehlgeschlagen.")
+
+    async def _update_partials(self) -> dict[int, ChatSummary]:
+        chat_ids = await self._store.list_unread_chat_ids(
+            allowed_chat_id=self._settings.telegram_allowed_chat_id,
+        )
+        existing = await self._store.get_chat_summaries(chat_ids)
+        updated = await asyncio.gather(
+            *(self._update_chat(chat_id, existing.get(chat_id)) for chat_id in chat_ids)
+        )
+        return {item.chat_id: item for item in updated if item is not None}
+
+    async def _update_chat(self, chat_id: int, current: ChatSummary | None) -> ChatSummary | None:
+        chunk_size = self._settings.summary_chunk_size
+        while True:
+            after_id = current.last_message_id if current is not None else 0
+            batch = await self._store.list_unread_chat_messages_after(
+                chat_id,
+                after_id=after_id,
+                limit=chunk_size * self._settings.summary_max_concurrency,
+            )
+            if not batch:
+                return current
+
+            chunks = [batch[start : start + chunk_size] for start in range(0, len(batch), chunk_size)]
+            chunk_summaries = await asyncio.gather(*(self._summarize_chunk(chunk) for chunk in chunks))
+            pieces = ([current.summary] if current is not None else []) + list(chunk_summaries)
+            current = ChatSummary(
+                chat_id=chat_id,
+                summary=await self._reduce(pieces),
+                last_message_id=batch[-1].id,
+                message_count=(current.message_count if current is not None else 0) + len(batch),
+            )
+            await self._store.save_chat_summary(current)
+
+    async def _summarize_chunk(self, chunk: list[TelegramMessage]) -> str:
+        async with self._semaphore:
+            return await self._llm_service.summarize_chunk(chunk)
+
+    async def _reduce(self, pieces: list[str], *, final: bool = False) -> str:
+        fan_in = self._settings.summary_merge_fan_in
+        while len(pieces) > fan_in:
+            groups = [pieces[start : start + fan_in] for start in range(0, len(pieces), fan_in)]
+            pieces = list(await asyncio.gather(*(self._merge(group) for group in groups)))
+        return await self._merge(pieces, final=final)
+
+    async def _merge(self, pieces: list[str], *, final: bool = False) -> str:
+        async with self._semaphore:
+            return await self._llm_service.merge_summaries(pieces, final=final)
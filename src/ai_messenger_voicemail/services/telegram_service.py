@@ -1,99 +1,419 @@
+from dataclasses import dataclass
 from datetime import datetime, timezone
+import asyncio
+import importlib.util
 import logging
-
-import httpx
+import time
+import uuid
+from collections.abc import Callable
+from typing import TYPE_CHECKING
 
 from ai_messenger_voicemail.config import Settings
-from ai_messenger_voicemail.store import SqliteStore
+from ai_messenger_voicemail.metrics import AppMetrics
+from ai_messenger_voicemail.models import InboundMessage
+from ai_messenger_voicemail.store import TELEGRAM_POLLER_LEASE, LeaseLostError, StateStore
+
+if TYPE_CHECKING:
+    import httpx
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass(slots=True)
+class HttpPoolStats:
+    requests: int = 0
+    connections_opened: int = 0
+
+    def to_dict(self) -> dict[str, float | int]:
+        reused = max(self.requests - self.connections_opened, 0)
+        return {
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "reused_requests": reused,
+            "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0,
+        }
+
+
 class TelegramService:
-    def __init__(self, settings: Settings, store: SqliteStore) -> None:
+    def __init__(
+        self,
+        settings: Settings,
+        store: StateStore,
+        *,
+        on_ingested: Callable[[], None] | None = None,
+        metrics: AppMetrics | None = None,
+    ) -> None:
         self._settings = settings
         self._store = store
+        self._on_ingested = on_ingested
+        self._metrics = metrics
+        self._client: "httpx.AsyncClient | None" = None
+        self._pool_stats = HttpPoolStats()
+        self._holder_id = uuid.uuid4().hex
+        self._fencing_token: int | None = None
+        self._inflight: asyncio.Task[int | None] | None = None
+        self._waiting_in_long_poll = False
+        self._last_page_at: float | None = None
+
+    def _http_client(self) -> "httpx.AsyncClient":
+        # Created lazily inside the running loop and shared by every sync, so
+        # consecutive calls reuse the keep-alive connection to api.telegram.org.
+        # httpx is imported here as well, keeping it out of application startup.
+        if self._client is None:
+            import httpx
+
+            http2 = self._settings.telegram_http2
+            if http2 and importlib.util.find_spec("h2") is None:
+                logger.warning("TELEGRAM_HTTP2 aktiv, aber Paket 'h2' fehlt. Nutze HTTP/1.1.")
+                http2 = False
+            self._client = httpx.AsyncClient(
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=self._settings.telegram_max_connections,
+                    max_keepalive_connections=self._settings.telegram_max_keepalive_connections,
+                    keepalive_expiry=self._settings.telegram_keepalive_expiry_seconds,
+                ),
+                timeout=httpx.Timeout(
+                    self._settings.request_timeout_seconds,
+                    connect=self._settings.telegram_connect_timeout_seconds,
+                ),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        # Shielded syncs outlive the worker that started them; stop them before
+        # they report new messages to services that are shutting down.
+        if self._inflight is not None and not self._inflight.done():
+            self._inflight.cancel()
+            await asyncio.gather(self._inflight, return_exceptions=True)
+        self._inflight = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._fencing_token is not None:
+            # Hand the poller lease over right away instead of after its TTL.
+            await self._store.release_lease(TELEGRAM_POLLER_LEASE, self._holder_id)
+            self._fencing_token = None
+
+    def pool_stats(self) -> dict[str, float | int]:
+        return self._pool_stats.to_dict()
+
+    @property
+    def last_page_at(self) -> float | None:
+        """Monotonic time the last getUpdates page was stored or came back empty."""
+        return self._last_page_at
+
+    def lease_stats(self) -> dict[str, object]:
+        return {"is_leader": self._fencing_token is not None, "fencing_token": self._fencing_token}
+
+    async def _trace(self, event_name: str, _: dict) -> None:
+        if event_name.endswith("connect_tcp.complete"):
+            self._pool_stats.connections_opened += 1
+
+    async def sync_updates(self, *, poll_timeout: int = 0) -> int:
+        return await self.try_sync_updates(poll_timeout=poll_timeout) or 0
 
-    async def sync_updates(self) -> int:
+    async def try_sync_updates(self, *, poll_timeout: int = 0) -> int | None:
+        """Runs a sync, joining the one already in flight in this process.
+
+        At most one getUpdates request per process is outstanding, whatever
+        the poll timeout: Telegram answers concurrent requests with 409.
+        Returns None when another process holds the poller lease; its results
+        land in the shared store, so callers can read from there directly.
+        """
+        task = self._inflight
+        if task is None or task.done():
+            task = asyncio.create_task(self._guarded_sync(poll_timeout))
+            self._inflight = task
+        elif poll_timeout == 0 and self._waiting_in_long_poll:
+            # Telegram answers a pending long poll as soon as an update arrives,
+            # so while it is still waiting there is nothing new to fetch.
+            return 0
+        # shield: a cancelled joiner must not cancel the sync other callers share.
+        return await asyncio.shield(task)
+
+    async def _guarded_sync(self, poll_timeout: int) -> int | None:
         token = self._settings.telegram_bot_token
         if not token:
             logger.warning("TELEGRAM_BOT_TOKEN ist nicht gesetzt. Telegram Sync wird uebersprungen.")
             return 0
+        if self._settings.telegram_ingestion_mode == "webhook":
+            logger.info("Telegram Webhook-Modus aktiv. getUpdates-Sync wird uebersprungen.")
+            return 0
+
+        # The lease is kept between syncs, so the polling process stays leader
+        # and the others only take over once it stops renewing.
+        lease_ttl = self._lease_ttl_seconds(poll_timeout)
+        fencing_token = await self._store.acquire_lease(
+            TELEGRAM_POLLER_LEASE,
+            self._holder_id,
+            ttl_seconds=lease_ttl,
+        )
+        if fencing_token is None:
+            self._fencing_token = None
+            logger.debug("Telegram-Poller-Lease gehoert einem anderen Prozess.")
+            return None
+        if fencing_token != self._fencing_token:
+            logger.info("Telegram-Poller-Lease uebernommen (Fencing-Token %s).", fencing_token)
+            self._fencing_token = fencing_token
+        try:
+            return await self._sync_updates(token, poll_timeout, fencing_token, lease_ttl)
+        except LeaseLostError:
+            logger.warning("Telegram-Poller-Lease verloren. Sync abgebrochen.")
+            self._fencing_token = None
+            return None
 
-        base_url = f"https://api.telegram.org/bot{token}"
-        current_offset = self._store.get_telegram_offset()
+    def _lease_ttl_seconds(self, poll_timeout: int) -> float:
+        return 2 * (self._settings.request_timeout_seconds + poll_timeout) + 5
+
+    async def _sync_updates(self, token: str, poll_timeout: int, fencing_token: int, lease_ttl: float) -> int:
+        import httpx
+
+        base_url = f"{self._settings.telegram_api_base_url.rstrip('/')}/bot{token}"
+        current_offset = await self._store.get_telegram_offset()
         max_update_id = current_offset
         total_inserted = 0
 
+        client = self._http_client()
         try:
-            async with httpx.AsyncClient(timeout=self._settings.request_timeout_seconds) as client:
-                while True:
-                    payload = {
-                        "offset": current_offset + 1,
-                        "limit": self._settings.telegram_poll_limit,
-                        "timeout": 0,
-                        "allowed_updates": ["message"],
-                    }
-                    response = await client.post(f"{base_url}/getUpdates", json=payload)
-                    response.raise_for_status()
-                    body = response.json()
-
-                    if not body.get("ok"):
-                        description = body.get("description", "Unknown Telegram error")
-                        raise RuntimeError(f"Telegram API Fehler: {description}")
-
-                    updates = body.get("result", [])
-                    if not updates:
-                        break
-
-                    for update in updates:
-                        update_id = int(update.get("update_id", 0))
-                        if update_id <= 0:
-                            continue
-
-                        max_update_id = max(max_update_id, update_id)
-                        current_offset = max_update_id
-
-                        message = update.get("message")
-                        if not isinstance(message, dict):
-                            continue
-                        if "text" not in message:
-                            continue
-
-                        chat = message.get("chat", {})
-                        chat_id = int(chat.get("id", 0))
-                        text = str(message.get("text", "")).strip()
-                        if chat_id == 0 or not text:
-                            continue
-
-                        sender_data = message.get("from", {})
-                        sender = (
-                            sender_data.get("username")
-                            or " ".join(
-                                part
-                                for part in [
-                                    sender_data.get("first_name", ""),
-                                    sender_data.get("last_name", ""),
-                                ]
-                                if part
-                            )
-                            or "Unbekannt"
-                        )
-
-                        timestamp_unix = int(message.get("date", 0))
-                        timestamp = datetime.fromtimestamp(timestamp_unix, tz=timezone.utc)
-
-                        inserted = self._store.store_message(
-                            telegram_update_id=update_id,
-                            chat_id=chat_id,
-                            sender=str(sender),
-                            timestamp=timestamp,
-                            text=text,
-                        )
-                        if inserted:
-                            total_inserted += 1
+            # Capped so a sync under steady inflow still returns; the worker
+            # simply starts the next one and picks up where this one stopped.
+            for _ in range(self._settings.telegram_sync_max_pages):
+                payload = {
+                    "offset": current_offset + 1,
+                    "limit": self._settings.telegram_poll_limit,
+                    "timeout": poll_timeout,
+                    "allowed_updates": ["message"],
+                }
+                self._waiting_in_long_poll = poll_timeout > 0
+                try:
+                    response = await client.post(
+                        f"{base_url}/getUpdates",
+                        json=payload,
+                        timeout=httpx.Timeout(
+                            self._settings.request_timeout_seconds + poll_timeout,
+                            connect=self._settings.telegram_connect_timeout_seconds,
+                        ),
+                        extensions={"trace": self._trace},
+                    )
+                finally:
+                    self._waiting_in_long_poll = False
+                self._pool_stats.requests += 1
+                response.raise_for_status()
+                body = response.json()
+
+                if not body.get("ok"):
+                    description = body.get("description", "Unknown Telegram error")
+                    raise RuntimeError(f"Telegram API Fehler: {description}")
+
+                updates = body.get("result", [])
+                if not updates:
+                    self._last_page_at = time.monotonic()
+                    break
+
+                batch: list[InboundMessage] = []
+                for update in updates:
+                    update_id = int(update.get("update_id", 0))
+                    if update_id <= 0:
+                        continue
+                    max_update_id = max(max_update_id, update_id)
+                    message = parse_update(update)
+                    if message is not None:
+                        batch.append(message)
+
+                # One transaction per page: messages and offset commit together,
+                # so a crash can neither lose nor re-deliver a stored page.
+                total_inserted += await self._store.store_messages(
+                    batch,
+                    telegram_offset=max_update_id,
+                    fencing_token=fencing_token,
+                )
+                current_offset = max_update_id
+                renewed = await self._store.acquire_lease(
+                    TELEGRAM_POLLER_LEASE,
+                    self._holder_id,
+                    ttl_seconds=lease_ttl,
+                )
+                if renewed != fencing_token:
+                    raise LeaseLostError("Telegram-Poller-Lease konnte nicht verlaengert werden")
+                self._last_page_at = time.monotonic()
+                # Only the first request waits for new updates; further pages drain the backlog.
+                poll_timeout = 0
         except httpx.HTTPError as exc:
             raise RuntimeError(f"Telegram API nicht erreichbar: {exc}") from exc
+        finally:
+            if total_inserted and self._metrics is not None:
+                self._metrics.messages_ingested.inc("poll", amount=total_inserted)
+            if total_inserted and self._on_ingested is not None:
+                self._on_ingested()
 
-        self._store.set_telegram_offset(max_update_id)
         return total_inserted
+
+
+class TelegramIngestionWorker:
+    """Long-polls getUpdates in the background so calls only read the store."""
+
+    def __init__(
+        self,
+        service: TelegramService,
+        *,
+        poll_timeout_seconds: int,
+        max_retry_delay_seconds: float = 30.0,
+        lock_retry_seconds: float = 1.0,
+        idle_poll_seconds: float = 1.0,
+    ) -> None:
+        self._service = service
+        self._lock_retry_seconds = lock_retry_seconds
+        self._idle_poll_seconds = idle_poll_seconds
+        self._poll_timeout_seconds = poll_timeout_seconds
+        self._max_retry_delay_seconds = max_retry_delay_seconds
+        self._task: asyncio.Task[None] | None = None
+        self._last_success: float | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="telegram-ingestion")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def is_fresh(self, max_staleness_seconds: float) -> bool:
+        if self._task is None:
+            return False
+        # Every stored page counts: under steady inflow a sync keeps paging and
+        # only returns at the page cap, yet the store is current all along.
+        progress = [at for at in (self._last_success, self._service.last_page_at) if at is not None]
+        if not progress:
+            return False
+        return time.monotonic() - max(progress) <= max_staleness_seconds
+
+    async def _run(self) -> None:
+        retry_delay = 1.0
+        while True:
+            try:
+                inserted = await self._service.try_sync_updates(poll_timeout=self._poll_timeout_seconds)
+            except Exception:  # noqa: BLE001
+                logger.exception("Telegram Hintergrund-Sync fehlgeschlagen. Neuer Versuch in %.0fs.", retry_delay)
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, self._max_retry_delay_seconds)
+                continue
+
+            self._last_success = time.monotonic()
+            retry_delay = 1.0
+            if inserted is None:
+                # Another process is polling into the shared store; check back shortly.
+                await asyncio.sleep(self._lock_retry_seconds)
+            elif inserted:
+                logger.info("Telegram Hintergrund-Sync: %s neue Nachrichten.", inserted)
+            elif self._poll_timeout_seconds == 0:
+                # Short polling returns at once when nothing is new; without a
+                # pause the loop would hammer getUpdates and the lease row.
+                await asyncio.sleep(self._idle_poll_seconds)
+
+
+class TelegramWebhookIngestor:
+    """Writes pushed webhook updates to the store with group commit.
+
+    Updates arriving while a write is in progress are queued and flushed
+    together in the next transaction, so concurrent deliveries share one
+    commit. Each caller returns only after its update is durable.
+    """
+
+    def __init__(
+        self,
+        store: StateStore,
+        *,
+        max_batch_size: int,
+        on_ingested: Callable[[], None] | None = None,
+        metrics: AppMetrics | None = None,
+    ) -> None:
+        self._store = store
+        self._max_batch_size = max_batch_size
+        self._on_ingested = on_ingested
+        self._metrics = metrics
+        self._pending: list[tuple[InboundMessage, asyncio.Future[None]]] = []
+        self._flush_task: asyncio.Task[None] | None = None
+
+    async def submit(self, updates: list[dict]) -> int:
+        messages = [message for message in map(parse_update, updates) if message is not None]
+        if not messages:
+            return 0
+
+        loop = asyncio.get_running_loop()
+        futures: list[asyncio.Future[None]] = []
+        for message in messages:
+            future: asyncio.Future[None] = loop.create_future()
+            self._pending.append((message, future))
+            futures.append(future)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush(), name="telegram-webhook-flush")
+
+        await asyncio.gather(*futures)
+        return len(messages)
+
+    async def _flush(self) -> None:
+        while self._pending:
+            batch = self._pending[: self._max_batch_size]
+            del self._pending[: self._max_batch_size]
+            try:
+                inserted = await self._store.store_messages([message for message, _ in batch])
+            except Exception as exc:  # noqa: BLE001
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            if inserted and self._metrics is not None:
+                self._metrics.messages_ingested.inc("webhook", amount=inserted)
+            if inserted and self._on_ingested is not None:
+                self._on_ingested()
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+
+def parse_update(update: dict) -> InboundMessage | None:
+    update_id = int(update.get("update_id", 0))
+    if update_id <= 0:
+        return None
+
+    message = update.get("message")
+    if not isinstance(message, dict):
+        return None
+    if "text" not in message:
+        return None
+
+    chat = message.get("chat", {})
+    chat_id = int(chat.get("id", 0))
+    text = str(message.get("text", "")).strip()
+    if chat_id == 0 or not text:
+        return None
+
+    sender_data = message.get("from", {})
+    sender = (
+        sender_data.get("username")
+        or " ".join(
+            part
+            for part in [
+                sender_data.get("first_name", ""),
+                sender_data.get("last_name", ""),
+            ]
+            if part
+        )
+        or "Unbekannt"
+    )
+
+    timestamp_unix = int(message.get("date", 0))
+    return InboundMessage(
+        telegram_update_id=update_id,
+        chat_id=chat_id,
+        sender=str(sender),
+        timestamp=datetime.fromtimestamp(timestamp_unix, tz=timezone.utc),
+        text=text,
+    )
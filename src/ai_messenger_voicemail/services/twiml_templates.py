@@ -0,0 +1,73 @@
+"""String templates producing the same TwiML bytes as the twilio SDK.
+
+The SDK builds an ElementTree per response and serializes it; here the
+constant parts are rendered once per ``Settings`` and only the dynamic text
+is escaped and spliced in. Escaping and empty-element handling mirror
+``xml.etree.ElementTree`` so both paths stay byte-for-byte identical.
+"""
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>'
+HANGUP = "<Hangup />"
+
+
+def escape_text(text: str) -> str:
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+
+def escape_attribute(value: str) -> str:
+    value = escape_text(value)
+    if '"' in value:
+        value = value.replace('"', "&quot;")
+    if "\r" in value:
+        value = value.replace("\r", "&#13;")
+    if "\n" in value:
+        value = value.replace("\n", "&#10;")
+    if "\t" in value:
+        value = value.replace("\t", "&#09;")
+    return value
+
+
+def element(tag: str, text: str = "", **attributes: str | int) -> str:
+    """Renders one element; attributes are sorted like the SDK does."""
+    rendered = "".join(f' {name}="{escape_attribute(str(attributes[name]))}"' for name in sorted(attributes))
+    if not text:
+        return f"<{tag}{rendered} />"
+    return f"<{tag}{rendered}>{escape_text(text)}</{tag}>"
+
+
+def document(*parts: str) -> str:
+    return f"{XML_DECLARATION}<Response>{''.join(parts)}</Response>"
+
+
+class SayTemplate:
+    """<Say> with the voice attributes rendered once."""
+
+    def __init__(self, *, language: str, voice: str) -> None:
+        attributes = f'language="{escape_attribute(language)}" voice="{escape_attribute(voice)}"'
+        self._open = f"<Say {attributes}>"
+        self._empty = f"<Say {attributes} />"
+
+    def render(self, text: str) -> str:
+        if not text:
+            return self._empty
+        return f"{self._open}{escape_text(text)}</Say>"
+
+
+class GatherTemplate:
+    """Speech <Gather> whose only dynamic part is the action URL."""
+
+    def __init__(self, *, language: str, prompt: str) -> None:
+        # "action" sorts first, so everything after its value is constant.
+        self._suffix = (
+            f'" input="speech" language="{escape_attribute(language)}" method="POST"'
+            f' speechTimeout="auto" timeout="5">{prompt}</Gather>'
+        )
+
+    def render(self, action_url: str) -> str:
+        return f'<Gather action="{escape_attribute(action_url)}{self._suffix}'
@@ -1,99 +1,80 @@
-from twilio.twiml.voice_response import Gather, VoiceResponse
-
 from ai_messenger_voicemail.config import Settings
+from ai_messenger_voicemail.services.twiml_templates import (
+    HANGUP,
+    GatherTemplate,
+    SayTemplate,
+    document,
+    element,
+)
 
 
 class VoiceService:
     def __init__(self, settings: Settings) -> None:
         self._settings = settings
+        # Everything except summary/answer text and URLs is constant per
+        # Settings, so those fragments are rendered once instead of per call.
+        self._say = SayTemplate(language=settings.twilio_language, voice=settings.twilio_voice)
+        self._greeting = (
+            self._say.render(
+                "Willkommen. Du hast ungelesene Nachrichten. Ich lese dir jetzt eine Zusammenfassung vor."
+            )
+            + element("Pause", length=1)
+        )
+        self._incoming_gather = GatherTemplate(
+            language=settings.twilio_language,
+            prompt=self._say.render(
+                "Du kannst jetzt Rueckfragen stellen, zum Beispiel: Erzaehl mir mehr ueber Nachricht 2."
+            ),
+        )
+        self._incoming_no_input = self._say.render("Ich habe keine Rueckfrage gehoert. Auf Wiederhoeren.") + HANGUP
+        self._farewell = self._say.render("Auf Wiederhoeren.") + HANGUP
+        self._followup_gather = GatherTemplate(
+            language=settings.twilio_language,
+            prompt=self._say.render(
+                "Wenn du noch etwas wissen willst, stelle jetzt eine weitere Frage. "
+                "Sage Ende, um aufzulegen."
+            ),
+        )
+        self._followup_no_input = self._say.render("Keine weitere Eingabe erkannt. Auf Wiederhoeren.") + HANGUP
+        self._progressive_greeting = self._say.render("Willkommen. Ich rufe deine Nachrichten ab. Einen Moment bitte.")
 
     def should_end(self, text: str) -> bool:
         value = text.lower().strip()
         keywords = ["ende", "beenden", "stop", "tschuss", "auf wiederhoeren"]
         return any(keyword in value for keyword in keywords)
 
-    def incoming_response(self, *, summary: str, has_messages: bool, action_url: str) -> str:
-        response = VoiceResponse()
+    def incoming_response(
+        self,
+        *,
+        summary: str,
+        has_messages: bool,
+        action_url: str,
+        greet: bool = True,
+    ) -> str:
         if has_messages:
-            response.say(
-                "Willkommen. Du hast ungelesene Nachrichten. Ich lese dir jetzt eine Zusammenfassung vor.",
-                language=self._settings.twilio_language,
-                voice=self._settings.twilio_voice,
-            )
-            response.pause(length=1)
-            response.say(
-                summary,
-                language=self._settings.twilio_language,
-                voice=self._settings.twilio_voice,
+            return document(
+                self._greeting if greet else "",
+                self._say.render(summary),
+                self._incoming_gather.render(action_url),
+                self._incoming_no_input,
             )
+        return document(self._say.render(summary), self._farewell)
 
-            gather = self._followup_gather(action_url)
-            gather.say(
-                "Du kannst jetzt Rueckfragen stellen, zum Beispiel: Erzaehl mir mehr ueber Nachricht 2.",
-                language=self._settings.twilio_language,
-                voice=self._settings.twilio_voice,
-            )
-            response.append(gather)
-            response.say(
-                "Ich habe keine Rueckfrage gehoert. Auf Wiederhoeren.",
-                language=self._settings.twilio_language,
-                voice=self._settings.twilio_voice,
-            )
-            response.hangup()
-            return str(response)
+    def progressive_greeting_response(self, *, redirect_url: str, pause_seconds: int) -> str:
+        return document(self._progressive_greeting, self._wait(redirect_url, pause_seconds))
 
-        response.say(
-            summary,
-            language=self._settings.twilio_language,
-            voice=self._settings.twilio_voice,
-        )
-        response.say(
-            "Auf Wiederhoeren.",
-            language=self._settings.twilio_language,
-            voice=self._settings.twilio_voice,
-        )
-        response.hangup()
-        return str(response)
+    def wait_response(self, *, redirect_url: str, pause_seconds: int) -> str:
+        return document(self._wait(redirect_url, pause_seconds))
 
     def followup_response(self, *, answer: str, action_url: str) -> str:
-        response = VoiceResponse()
-        response.say(
-            answer,
-            language=self._settings.twilio_language,
-            voice=self._settings.twilio_voice,
-        )
-        gather = self._followup_gather(action_url)
-        gather.say(
-            "Wenn du noch etwas wissen willst, stelle jetzt eine weitere Frage. "
-            "Sage Ende, um aufzulegen.",
-            language=self._settings.twilio_language,
-            voice=self._settings.twilio_voice,
+        return document(
+            self._say.render(answer),
+            self._followup_gather.render(action_url),
+            self._followup_no_input,
         )
-        response.append(gather)
-        response.say(
-            "Keine weitere Eingabe erkannt. Auf Wiederhoeren.",
-            language=self._settings.twilio_language,
-            voice=self._settings.twilio_voice,
-        )
-        response.hangup()
-        return str(response)
 
     def goodbye_response(self, text: str = "Alles klar. Auf Wiederhoeren.") -> str:
-        response = VoiceResponse()
-        response.say(
-            text,
-            language=self._settings.twilio_language,
-            voice=self._settings.twilio_voice,
-        )
-        response.hangup()
-        return str(response)
+        return document(self._say.render(text), HANGUP)
 
-    def _followup_gather(self, action_url: str) -> Gather:
-        return Gather(
-            input="speech",
-            action=action_url,
-            method="POST",
-            language=self._settings.twilio_language,
-            speech_timeout="auto",
-            timeout=5,
-        )
+    def _wait(self, redirect_url: str, pause_seconds: int) -> str:
+        return element("Pause", length=pause_seconds) + element("Redirect", redirect_url, method="POST")
@@ -0,0 +1,98 @@
+import asyncio
+import hashlib
+import json
+import logging
+from collections.abc import Awaitable, Callable, Iterable
+
+from ai_messenger_voicemail.store import StateStore
+
+logger = logging.getLogger(__name__)
+
+
+class UncachedResponse(Exception):
+    """Raised by a render to answer with `twiml` without storing it for retries."""
+
+    def __init__(self, twiml: str) -> None:
+        super().__init__("Antwort wird nicht gespeichert")
+        self.twiml = twiml
+
+
+class WebhookIdempotency:
+    """Replays the stored TwiML when Twilio retries a webhook.
+
+    Requests are keyed by CallSid, endpoint and a hash of the form parameters
+    Twilio signs. The first request computes and persists the response;
+    duplicates arriving while it runs wait for that same computation, later
+    ones read it from the store, so a retry never re-runs the LLM or appends
+    conversation turns twice. A render raising `UncachedResponse` (a transient
+    failure) answers without storing, so the next retry computes again.
+    """
+
+    def __init__(self, store: StateStore) -> None:
+        self._store = store
+        self._inflight: dict[tuple[str, str, str], asyncio.Task[str]] = {}
+        self._computed = 0
+        self._joined = 0
+        self._replayed = 0
+        self._uncached = 0
+
+    @staticmethod
+    def make_key(form_items: Iterable[tuple[str, object]]) -> str:
+        payload = json.dumps(
+            sorted((str(key), str(value)) for key, value in form_items),
+            ensure_ascii=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def run(
+        self,
+        call_sid: str,
+        endpoint: str,
+        form_items: Iterable[tuple[str, object]],
+        compute: Callable[[], Awaitable[str]],
+    ) -> str:
+        key = (call_sid, endpoint, self.make_key(form_items))
+        task = self._inflight.get(key)
+        if task is not None:
+            self._joined += 1
+            logger.info("Doppelter %s-Webhook fuer CallSid=%s wartet auf laufende Antwort.", endpoint, call_sid)
+            return await asyncio.shield(task)
+
+        stored = await self._store.get_webhook_response(*key)
+        if stored is not None:
+            self._replayed += 1
+            logger.info("Wiederholter %s-Webhook fuer CallSid=%s. Sende gespeicherte Antwort.", endpoint, call_sid)
+            return stored
+
+        # Re-check: a duplicate may have started computing during the store read.
+        task = self._inflight.get(key)
+        if task is not None:
+            self._joined += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.create_task(self._compute(key, compute), name=f"webhook-{endpoint}-{call_sid}")
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: Twilio hanging up on one request must not abort the response
+        # its retry is waiting for.
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: tuple[str, str, str], compute: Callable[[], Awaitable[str]]) -> str:
+        try:
+            twiml = await compute()
+        except UncachedResponse as exc:
+            self._uncached += 1
+            logger.info("%s-Antwort fuer CallSid=%s wird nicht gespeichert.", key[1], key[0])
+            return exc.twiml
+        self._computed += 1
+        return await self._store.save_webhook_response(*key, twiml)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "computed": self._computed,
+            "joined": self._joined,
+            "replayed": self._replayed,
+            "uncached": self._uncached,
+            "inflight": len(self._inflight),
+        }
@@ -1,27 +1,356 @@
+import asyncio
 import json
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+from dataclasses import replace
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from typing import Protocol
 
-from ai_messenger_voicemail.models import CallContext, ConversationTurn, TelegramMessage
+from ai_messenger_voicemail.models import (
+    CallContext,
+    ChatSummary,
+    ConversationTurn,
+    InboundMessage,
+    TelegramMessage,
+)
+
+
+TELEGRAM_POLLER_LEASE = "telegram_poller"
+CALL_PREPARATION_LEASE_PREFIX = "prepare-call:"
+
+# The offset only ever moves forward, so a slower concurrent writer holding an
+# older value can never rewind it.
+_ADVANCE_OFFSET_SQL = (
+    "INSERT INTO state(key, value) VALUES ('telegram_offset', ?) "
+    "ON CONFLICT(key) DO UPDATE SET value = "
+    "CAST(MAX(CAST(value AS INTEGER), CAST(excluded.value AS INTEGER)) AS TEXT)"
+)
+
+
+class LeaseLostError(RuntimeError):
+    """Raised when a write is fenced off because a newer lease holder exists."""
+
+
+def call_preparation_lease(call_sid: str) -> str:
+    """Lease name claiming the preparation of one call across replicas."""
+    return f"{CALL_PREPARATION_LEASE_PREFIX}{call_sid}"
+
+
+def _to_epoch(timestamp: datetime) -> int:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return int(timestamp.timestamp())
+
+
+def _message_from_row(row: sqlite3.Row) -> TelegramMessage:
+    return TelegramMessage(
+        id=int(row["id"]),
+        telegram_update_id=int(row["telegram_update_id"]),
+        chat_id=int(row["chat_id"]),
+        sender=str(row["sender"]),
+        timestamp=datetime.fromtimestamp(int(row["ts"]), tz=timezone.utc),
+        text=str(row["text"]),
+    )
+
+
+def _migrate_integer_message_timestamps(conn: sqlite3.Connection) -> None:
+    """Rebuilds `messages` with integer epoch timestamps and unread indexes."""
+    conn.execute(
+        """
+        CREATE TABLE messages_v1 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            telegram_update_id INTEGER NOT NULL UNIQUE,
+            chat_id INTEGER NOT NULL,
+            sender TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            is_read INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    rows = conn.execute(
+        "SELECT id, telegram_update_id, chat_id, sender, ts, text, is_read FROM messages"
+    )
+    conn.executemany(
+        """
+        INSERT INTO messages_v1(id, telegram_update_id, chat_id, sender, ts, text, is_read)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            (
+                row["id"],
+                row["telegram_update_id"],
+                row["chat_id"],
+                row["sender"],
+                _to_epoch(datetime.fromisoformat(str(row["ts"]))),
+                row["text"],
+                row["is_read"],
+            )
+            for row in rows
+        ),
+    )
+    conn.execute("DROP TABLE messages")
+    conn.execute("ALTER TABLE messages_v1 RENAME TO messages")
+    conn.execute(
+        "CREATE INDEX idx_messages_unread_ts ON messages(ts) WHERE is_read = 0"
+    )
+    conn.execute(
+        "CREATE INDEX idx_messages_unread_chat_ts ON messages(chat_id, ts) WHERE is_read = 0"
+    )
+
+
+def _create_precomputed_summaries(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE precomputed_summaries (
+            cache_key TEXT PRIMARY KEY,
+            summary TEXT NOT NULL,
+            created_at INTEGER NOT NULL
+        )
+        """
+    )
+
+
+def _create_llm_response_cache(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE llm_response_cache (
+            cache_key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX idx_llm_response_cache_expires ON llm_response_cache(expires_at)")
+
+
+def _create_chat_summaries(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE chat_summaries (
+            chat_id INTEGER PRIMARY KEY,
+            summary TEXT NOT NULL,
+            last_message_id INTEGER NOT NULL,
+            message_count INTEGER NOT NULL,
+            updated_at INTEGER NOT NULL
+        )
+        """
+    )
+
+
+def _normalize_call_contexts(conn: sqlite3.Connection) -> None:
+    """Moves call messages and conversation turns out of the JSON blobs.
+
+    Messages are linked by id instead of being copied per call, and turns become
+    append-only rows, so adding a turn no longer rewrites the whole context.
+    """
+    conn.execute(
+        """
+        CREATE TABLE call_contexts_v5 (
+            call_sid TEXT PRIMARY KEY,
+            summary TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE call_context_messages (
+            call_sid TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            PRIMARY KEY (call_sid, position)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE conversation_turns (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            call_sid TEXT NOT NULL,
+            role TEXT NOT NULL,
+            text TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX idx_conversation_turns_call ON conversation_turns(call_sid, id)")
+
+    rows = conn.execute(
+        "SELECT call_sid, summary, messages_json, conversation_json, created_at FROM call_contexts"
+    ).fetchall()
+    for row in rows:
+        call_sid = row["call_sid"]
+        conn.execute(
+            "INSERT INTO call_contexts_v5(call_sid, summary, created_at) VALUES (?, ?, ?)",
+            (call_sid, row["summary"], row["created_at"]),
+        )
+        conn.executemany(
+            "INSERT INTO call_context_messages(call_sid, position, message_id) VALUES (?, ?, ?)",
+            (
+                (call_sid, position, int(item["id"]))
+                for position, item in enumerate(json.loads(str(row["messages_json"])))
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO conversation_turns(call_sid, role, text) VALUES (?, ?, ?)",
+            (
+                (call_sid, str(item["role"]), str(item["text"]))
+                for item in json.loads(str(row["conversation_json"]))
+            ),
+        )
+    conn.execute("DROP TABLE call_contexts")
+    conn.execute("ALTER TABLE call_contexts_v5 RENAME TO call_contexts")
+
+
+def _index_call_context_created_at(conn: sqlite3.Connection) -> None:
+    """Switches call_contexts.created_at to epoch seconds and indexes it for expiry."""
+    conn.execute(
+        """
+        CREATE TABLE call_contexts_v6 (
+            call_sid TEXT PRIMARY KEY,
+            summary TEXT NOT NULL,
+            created_at INTEGER NOT NULL
+        )
+        """
+    )
+    conn.executemany(
+        "INSERT INTO call_contexts_v6(call_sid, summary, created_at) VALUES (?, ?, ?)",
+        (
+            (row["call_sid"], row["summary"], _to_epoch(datetime.fromisoformat(str(row["created_at"]))))
+            for row in conn.execute("SELECT call_sid, summary, created_at FROM call_contexts").fetchall()
+        ),
+    )
+    conn.execute("DROP TABLE call_contexts")
+    conn.execute("ALTER TABLE call_contexts_v6 RENAME TO call_contexts")
+    conn.execute("CREATE INDEX idx_call_contexts_created_at ON call_contexts(created_at)")
+
+
+def _create_leases(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            fencing_token INTEGER NOT NULL
+        )
+        """
+    )
+    conn.execute("DELETE FROM state WHERE key = 'telegram_sync_lock'")
+
+
+def _create_webhook_responses(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE webhook_responses (
+            call_sid TEXT NOT NULL,
+            endpoint TEXT NOT NULL,
+            request_hash TEXT NOT NULL,
+            twiml TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            PRIMARY KEY (call_sid, endpoint, request_hash)
+        )
+        """
+    )
+    conn.execute("CREATE INDEX idx_webhook_responses_created_at ON webhook_responses(created_at)")
+
+
+# (schema version, migration) pairs, applied in order on top of the baseline
+# tables created in SqliteStore._init_db. The version is kept in PRAGMA user_version.
+_MIGRATIONS: list[tuple[int, Callable[[sqlite3.Connection], None]]] = [
+    (1, _migrate_integer_message_timestamps),
+    (2, _create_precomputed_summaries),
+    (3, _create_llm_response_cache),
+    (4, _create_chat_summaries),
+    (5, _normalize_call_contexts),
+    (6, _index_call_context_created_at),
+    (7, _create_leases),
+    (8, _create_webhook_responses),
+]
 
 
 class SqliteStore:
-    def __init__(self, db_path: Path) -> None:
+    def __init__(
+        self,
+        db_path: Path,
+        *,
+        pooled: bool = False,
+        busy_timeout_ms: int = 5000,
+        cache_size_kib: int = 8192,
+        mmap_size_mb: int = 64,
+        cached_statements: int = 256,
+    ) -> None:
         self._db_path = db_path
+        self._pooled = pooled
+        self._busy_timeout_ms = busy_timeout_ms
+        self._cache_size_kib = cache_size_kib
+        self._mmap_size_mb = mmap_size_mb
+        self._cached_statements = cached_statements
+        self._local = threading.local()
+        self._pool: list[sqlite3.Connection] = []
+        self._pool_lock = threading.Lock()
         self._db_path.parent.mkdir(parents=True, exist_ok=True)
         self._init_db()
 
     @contextmanager
     def _conn(self):
-        conn = sqlite3.connect(self._db_path)
-        conn.row_factory = sqlite3.Row
+        if not self._pooled:
+            conn = sqlite3.connect(self._db_path)
+            conn.row_factory = sqlite3.Row
+            try:
+                yield conn
+                conn.commit()
+            finally:
+                conn.close()
+            return
+
+        conn = self._thread_connection()
         try:
             yield conn
             conn.commit()
-        finally:
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def _thread_connection(self) -> sqlite3.Connection:
+        # One long-lived connection per thread: sqlite3 connections must not be
+        # shared across threads, and keeping them open preserves the page cache
+        # and the per-connection prepared statement cache between calls.
+        conn: sqlite3.Connection | None = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+
+        conn = sqlite3.connect(
+            self._db_path,
+            timeout=self._busy_timeout_ms / 1000,
+            cached_statements=self._cached_statements,
+            # Only the owning thread uses the connection; close() may run elsewhere.
+            check_same_thread=False,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self._busy_timeout_ms)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self._cache_size_kib)}")
+        conn.execute(f"PRAGMA mmap_size={int(self._mmap_size_mb) * 1024 * 1024}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        self._local.conn = conn
+        with self._pool_lock:
+            self._pool.append(conn)
+        return conn
+
+    def close(self) -> None:
+        with self._pool_lock:
+            connections, self._pool = self._pool, []
+        for conn in connections:
             conn.close()
+        self._local = threading.local()
 
     def _init_db(self) -> None:
         with self._conn() as conn:
@@ -60,6 +389,19 @@ class SqliteStore:
             conn.execute(
                 "INSERT OR IGNORE INTO state(key, value) VALUES ('telegram_offset', '0')"
             )
+        self._migrate()
+
+    def _migrate(self) -> None:
+        with self._conn() as conn:
+            # IMMEDIATE takes the write lock up front, so concurrent workers
+            # starting against the same file apply each migration only once.
+            conn.execute("BEGIN IMMEDIATE")
+            version = int(conn.execute("PRAGMA user_version").fetchone()[0])
+            for target_version, migration in _MIGRATIONS:
+                if version < target_version:
+                    migration(conn)
+                    version = target_version
+            conn.execute(f"PRAGMA user_version = {version}")
 
     def ping(self) -> None:
         with self._conn() as conn:
@@ -75,11 +417,49 @@ class SqliteStore:
             return int(row["value"])
 
     def set_telegram_offset(self, offset: int) -> None:
+        with self._conn() as conn:
+            conn.execute(_ADVANCE_OFFSET_SQL, (str(offset),))
+
+    def acquire_lease(self, name: str, holder: str, *, ttl_seconds: float) -> int | None:
+        """Takes, renews or (after expiry) takes over a named lease.
+
+        Returns the fencing token, or None while another holder's lease is live.
+        The token stays the same on renewal and grows with every new acquisition,
+        so writes guarded by an older token can be rejected.
+        """
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT holder, expires_at, fencing_token FROM leases WHERE name = ?",
+                (name,),
+            ).fetchone()
+            if row is None:
+                token = 1
+            elif float(row["expires_at"]) > now:
+                if row["holder"] != holder:
+                    return None
+                token = int(row["fencing_token"])
+            else:
+                token = int(row["fencing_token"]) + 1
+            conn.execute(
+                """
+                INSERT INTO leases(name, holder, expires_at, fencing_token) VALUES (?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                  holder = excluded.holder,
+                  expires_at = excluded.expires_at,
+                  fencing_token = excluded.fencing_token
+                """,
+                (name, holder, now + ttl_seconds, token),
+            )
+            return token
+
+    def release_lease(self, name: str, holder: str) -> None:
+        # Only expires the row: the token must keep growing across holders.
         with self._conn() as conn:
             conn.execute(
-                "INSERT INTO state(key, value) VALUES ('telegram_offset', ?) "
-                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
-                (str(offset),),
+                "UPDATE leases SET expires_at = 0 WHERE name = ? AND holder = ?",
+                (name, holder),
             )
 
     def store_message(
@@ -102,12 +482,56 @@ class SqliteStore:
                     telegram_update_id,
                     chat_id,
                     sender,
-                    timestamp.isoformat(),
+                    _to_epoch(timestamp),
                     text,
                 ),
             )
             return cursor.rowcount > 0
 
+    def store_messages(
+        self,
+        messages: list[InboundMessage],
+        *,
+        telegram_offset: int | None = None,
+        fencing_token: int | None = None,
+    ) -> int:
+        """Inserts a batch and optionally advances the offset in one transaction.
+
+        With a `fencing_token` the whole batch is rejected (LeaseLostError) unless
+        the token still belongs to the current Telegram poller lease.
+        """
+        with self._conn() as conn:
+            if fencing_token is not None:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    "SELECT fencing_token FROM leases WHERE name = ?",
+                    (TELEGRAM_POLLER_LEASE,),
+                ).fetchone()
+                if row is None or int(row["fencing_token"]) != fencing_token:
+                    raise LeaseLostError("Telegram-Poller-Lease wurde von einem anderen Prozess uebernommen")
+            before = conn.total_changes
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO messages(
+                    telegram_update_id, chat_id, sender, ts, text
+                ) VALUES (?, ?, ?, ?, ?)
+                """,
+                [
+                    (
+                        msg.telegram_update_id,
+                        msg.chat_id,
+                        msg.sender,
+                        _to_epoch(msg.timestamp),
+                        msg.text,
+                    )
+                    for msg in messages
+                ],
+            )
+            inserted = conn.total_changes - before
+            if telegram_offset is not None:
+                conn.execute(_ADVANCE_OFFSET_SQL, (str(telegram_offset),))
+        return inserted
+
     def list_unread_messages(
         self,
         *,
@@ -122,25 +546,45 @@ class SqliteStore:
         if allowed_chat_id is not None:
             query += " AND chat_id = ?"
             params.append(allowed_chat_id)
-        query += " ORDER BY ts DESC LIMIT ?"
+        # Served by the partial unread indexes: an index range scan in ts order
+        # that stops after `limit` rows, independent of the table size.
+        query += " ORDER BY ts DESC, id DESC LIMIT ?"
         params.append(limit)
 
         with self._conn() as conn:
             rows = conn.execute(query, params).fetchall()
 
-        result: list[TelegramMessage] = []
-        for row in rows:
-            result.append(
-                TelegramMessage(
-                    id=int(row["id"]),
-                    telegram_update_id=int(row["telegram_update_id"]),
-                    chat_id=int(row["chat_id"]),
-                    sender=str(row["sender"]),
-                    timestamp=datetime.fromisoformat(str(row["ts"])),
-                    text=str(row["text"]),
-                )
-            )
-        return result
+        return [_message_from_row(row) for row in rows]
+
+    def list_unread_chat_ids(self, *, allowed_chat_id: int | None = None) -> list[int]:
+        query = "SELECT DISTINCT chat_id FROM messages WHERE is_read = 0"
+        params: list[object] = []
+        if allowed_chat_id is not None:
+            query += " AND chat_id = ?"
+            params.append(allowed_chat_id)
+        with self._conn() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [int(row["chat_id"]) for row in rows]
+
+    def list_unread_chat_messages_after(
+        self,
+        chat_id: int,
+        *,
+        after_id: int,
+        limit: int,
+    ) -> list[TelegramMessage]:
+        with self._conn() as conn:
+            rows = conn.execute(
+                """
+                SELECT id, telegram_update_id, chat_id, sender, ts, text
+                FROM messages
+                WHERE is_read = 0 AND chat_id = ? AND id > ?
+                ORDER BY id
+                LIMIT ?
+                """,
+                (chat_id, after_id, limit),
+            ).fetchall()
+        return [_message_from_row(row) for row in rows]
 
     def mark_messages_read(self, ids: list[int]) -> None:
         if not ids:
@@ -152,86 +596,647 @@ class SqliteStore:
                 ids,
             )
 
+    def mark_chat_messages_read(self, chat_id: int, *, up_to_id: int) -> None:
+        """Marks a chat read up to a message id and drops its rolling summary."""
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE messages SET is_read = 1 WHERE is_read = 0 AND chat_id = ? AND id <= ?",
+                (chat_id, up_to_id),
+            )
+            conn.execute("DELETE FROM chat_summaries WHERE chat_id = ?", (chat_id,))
+
+    def get_chat_summaries(self, chat_ids: list[int]) -> dict[int, ChatSummary]:
+        if not chat_ids:
+            return {}
+        placeholders = ",".join("?" for _ in chat_ids)
+        with self._conn() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT chat_id, summary, last_message_id, message_count
+                FROM chat_summaries
+                WHERE chat_id IN ({placeholders})
+                """,
+                chat_ids,
+            ).fetchall()
+        return {
+            int(row["chat_id"]): ChatSummary(
+                chat_id=int(row["chat_id"]),
+                summary=str(row["summary"]),
+                last_message_id=int(row["last_message_id"]),
+                message_count=int(row["message_count"]),
+            )
+            for row in rows
+        }
+
+    def save_chat_summary(self, chat_summary: ChatSummary) -> None:
+        with self._conn() as conn:
+            # Never replace a rolling summary with one that covers fewer messages.
+            conn.execute(
+                """
+                INSERT INTO chat_summaries(chat_id, summary, last_message_id, message_count, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(chat_id) DO UPDATE SET
+                  summary = excluded.summary,
+                  last_message_id = excluded.last_message_id,
+                  message_count = excluded.message_count,
+                  updated_at = excluded.updated_at
+                WHERE excluded.last_message_id >= chat_summaries.last_message_id
+                """,
+                (
+                    chat_summary.chat_id,
+                    chat_summary.summary,
+                    chat_summary.last_message_id,
+                    chat_summary.message_count,
+                    int(time.time()),
+                ),
+            )
+
+    def get_precomputed_summary(self, cache_key: str) -> str | None:
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT summary FROM precomputed_summaries WHERE cache_key = ?",
+                (cache_key,),
+            ).fetchone()
+        return None if row is None else str(row["summary"])
+
+    def save_precomputed_summary(self, cache_key: str, summary: str, *, keep: int = 16) -> None:
+        with self._conn() as conn:
+            conn.execute(
+                """
+                INSERT INTO precomputed_summaries(cache_key, summary, created_at) VALUES (?, ?, ?)
+                ON CONFLICT(cache_key) DO UPDATE SET
+                  summary = excluded.summary,
+                  created_at = excluded.created_at
+                """,
+                (cache_key, summary, int(time.time())),
+            )
+            conn.execute(
+                """
+                DELETE FROM precomputed_summaries WHERE cache_key NOT IN (
+                    SELECT cache_key FROM precomputed_summaries ORDER BY created_at DESC LIMIT ?
+                )
+                """,
+                (keep,),
+            )
+
+    def get_llm_response(self, cache_key: str, *, now: float) -> tuple[str, float] | None:
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT response, expires_at FROM llm_response_cache WHERE cache_key = ? AND expires_at > ?",
+                (cache_key, now),
+            ).fetchone()
+        return None if row is None else (str(row["response"]), float(row["expires_at"]))
+
+    def save_llm_response(self, cache_key: str, response: str, *, expires_at: float, max_entries: int) -> None:
+        with self._conn() as conn:
+            conn.execute(
+                """
+                INSERT INTO llm_response_cache(cache_key, response, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(cache_key) DO UPDATE SET
+                  response = excluded.response,
+                  expires_at = excluded.expires_at
+                """,
+                (cache_key, response, expires_at),
+            )
+            conn.execute("DELETE FROM llm_response_cache WHERE expires_at <= ?", (time.time(),))
+            # Entries share one TTL, so the earliest expiry is also the least recently written.
+            conn.execute(
+                """
+                DELETE FROM llm_response_cache WHERE cache_key IN (
+                    SELECT cache_key FROM llm_response_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (max_entries,),
+            )
+
     def save_call_context(
         self,
         call_sid: str,
         summary: str,
         messages: list[TelegramMessage],
-    ) -> None:
-        created_at = datetime.now(timezone.utc).isoformat()
+    ) -> CallContext:
+        created_at = datetime.now(timezone.utc).replace(microsecond=0)
         with self._conn() as conn:
             conn.execute(
                 """
-                INSERT INTO call_contexts(call_sid, summary, messages_json, conversation_json, created_at)
-                VALUES (?, ?, ?, ?, ?)
+                INSERT INTO call_contexts(call_sid, summary, created_at)
+                VALUES (?, ?, ?)
                 ON CONFLICT(call_sid) DO UPDATE SET
                   summary = excluded.summary,
-                  messages_json = excluded.messages_json,
-                  conversation_json = excluded.conversation_json,
                   created_at = excluded.created_at
                 """,
-                (
-                    call_sid,
-                    summary,
-                    json.dumps([m.to_dict() for m in messages], ensure_ascii=True),
-                    json.dumps([], ensure_ascii=True),
-                    created_at,
-                ),
+                (call_sid, summary, _to_epoch(created_at)),
             )
+            conn.execute("DELETE FROM call_context_messages WHERE call_sid = ?", (call_sid,))
+            conn.execute("DELETE FROM conversation_turns WHERE call_sid = ?", (call_sid,))
+            conn.executemany(
+                "INSERT INTO call_context_messages(call_sid, position, message_id) VALUES (?, ?, ?)",
+                ((call_sid, position, msg.id) for position, msg in enumerate(messages)),
+            )
+        return CallContext(
+            call_sid=call_sid,
+            summary=summary,
+            messages=list(messages),
+            conversation=[],
+            created_at=created_at,
+        )
 
     def get_call_context(self, call_sid: str) -> CallContext | None:
         with self._conn() as conn:
             row = conn.execute(
+                "SELECT summary, created_at FROM call_contexts WHERE call_sid = ?",
+                (call_sid,),
+            ).fetchone()
+            if row is None:
+                return None
+            message_rows = conn.execute(
                 """
-                SELECT summary, messages_json, conversation_json, created_at
-                FROM call_contexts
-                WHERE call_sid = ?
+                SELECT m.id, m.telegram_update_id, m.chat_id, m.sender, m.ts, m.text
+                FROM call_context_messages AS l
+                JOIN messages AS m ON m.id = l.message_id
+                WHERE l.call_sid = ?
+                ORDER BY l.position
                 """,
                 (call_sid,),
-            ).fetchone()
-
-        if row is None:
-            return None
-
-        messages_raw = json.loads(str(row["messages_json"]))
-        conversation_raw = json.loads(str(row["conversation_json"]))
+            ).fetchall()
+            turn_rows = conn.execute(
+                "SELECT role, text FROM conversation_turns WHERE call_sid = ? ORDER BY id",
+                (call_sid,),
+            ).fetchall()
 
         return CallContext(
             call_sid=call_sid,
             summary=str(row["summary"]),
-            messages=[TelegramMessage.from_dict(item) for item in messages_raw],
+            messages=[_message_from_row(message_row) for message_row in message_rows],
             conversation=[
-                ConversationTurn(role=str(item["role"]), text=str(item["text"]))
-                for item in conversation_raw
+                ConversationTurn(role=str(turn_row["role"]), text=str(turn_row["text"]))
+                for turn_row in turn_rows
             ],
-            created_at=datetime.fromisoformat(str(row["created_at"])),
+            created_at=datetime.fromtimestamp(int(row["created_at"]), tz=timezone.utc),
         )
 
-    def append_conversation_turn(self, call_sid: str, role: str, text: str) -> list[ConversationTurn]:
+    def call_context_version(self, call_sid: str) -> tuple[datetime, int] | None:
+        """(`created_at`, number of turns) of the stored context; see `CallContextCache`."""
         with self._conn() as conn:
             row = conn.execute(
-                "SELECT conversation_json FROM call_contexts WHERE call_sid = ?",
+                """
+                SELECT c.created_at,
+                       (SELECT COUNT(*) FROM conversation_turns AS t WHERE t.call_sid = c.call_sid) AS turns
+                FROM call_contexts AS c
+                WHERE c.call_sid = ?
+                """,
                 (call_sid,),
             ).fetchone()
-            if row is None:
-                return []
-            conversation = json.loads(str(row["conversation_json"]))
-            conversation.append({"role": role, "text": text})
+        if row is None:
+            return None
+        return datetime.fromtimestamp(int(row["created_at"]), tz=timezone.utc), int(row["turns"])
+
+    def append_conversation_turn(self, call_sid: str, role: str, text: str) -> bool:
+        """Appends one turn; returns False if the call has no context."""
+        with self._conn() as conn:
+            cursor = conn.execute(
+                """
+                INSERT INTO conversation_turns(call_sid, role, text)
+                SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM call_contexts WHERE call_sid = ?)
+                """,
+                (call_sid, role, text, call_sid),
+            )
+            return cursor.rowcount > 0
+
+    def cleanup_stale_call_contexts(self, *, ttl_minutes: int, batch_size: int = 500) -> int:
+        # Deletes in short batches so the write lock is never held for long,
+        # even after a backlog of expired calls has built up.
+        cutoff = _to_epoch(datetime.now(timezone.utc) - timedelta(minutes=ttl_minutes))
+        removed = 0
+        while True:
+            with self._conn() as conn:
+                stale = [
+                    (row["call_sid"],)
+                    for row in conn.execute(
+                        "SELECT call_sid FROM call_contexts WHERE created_at < ? ORDER BY created_at LIMIT ?",
+                        (cutoff, batch_size),
+                    )
+                ]
+                conn.executemany("DELETE FROM call_context_messages WHERE call_sid = ?", stale)
+                conn.executemany("DELETE FROM conversation_turns WHERE call_sid = ?", stale)
+                conn.executemany("DELETE FROM call_contexts WHERE call_sid = ?", stale)
+            removed += len(stale)
+            if len(stale) < batch_size:
+                break
+        # Replayable webhook responses and preparation claims live exactly as
+        # long as a call context.
+        with self._conn() as conn:
             conn.execute(
-                "UPDATE call_contexts SET conversation_json = ? WHERE call_sid = ?",
-                (json.dumps(conversation, ensure_ascii=True), call_sid),
+                "DELETE FROM leases WHERE name LIKE ? AND expires_at < ?",
+                (f"{CALL_PREPARATION_LEASE_PREFIX}%", cutoff),
             )
+        while True:
+            with self._conn() as conn:
+                cursor = conn.execute(
+                    """
+                    DELETE FROM webhook_responses WHERE rowid IN (
+                        SELECT rowid FROM webhook_responses WHERE created_at < ? LIMIT ?
+                    )
+                    """,
+                    (cutoff, batch_size),
+                )
+            if cursor.rowcount < batch_size:
+                return removed
 
-        return [
-            ConversationTurn(role=str(item["role"]), text=str(item["text"]))
-            for item in conversation
-        ]
+    def get_webhook_response(self, call_sid: str, endpoint: str, request_hash: str) -> str | None:
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT twiml FROM webhook_responses WHERE call_sid = ? AND endpoint = ? AND request_hash = ?",
+                (call_sid, endpoint, request_hash),
+            ).fetchone()
+        return None if row is None else str(row["twiml"])
 
-    def cleanup_stale_call_contexts(self, *, ttl_minutes: int) -> int:
-        cutoff = datetime.now(timezone.utc) - timedelta(minutes=ttl_minutes)
+    def save_webhook_response(self, call_sid: str, endpoint: str, request_hash: str, twiml: str) -> str:
+        """Stores the response unless one exists; returns the stored (first) response."""
         with self._conn() as conn:
-            cursor = conn.execute(
-                "DELETE FROM call_contexts WHERE created_at < ?",
-                (cutoff.isoformat(),),
+            conn.execute(
+                """
+                INSERT INTO webhook_responses(call_sid, endpoint, request_hash, twiml, created_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(call_sid, endpoint, request_hash) DO NOTHING
+                """,
+                (call_sid, endpoint, request_hash, twiml, int(time.time())),
             )
-            return cursor.rowcount
+            row = conn.execute(
+                "SELECT twiml FROM webhook_responses WHERE call_sid = ? AND endpoint = ? AND request_hash = ?",
+                (call_sid, endpoint, request_hash),
+            ).fetchone()
+        return str(row["twiml"])
+
+    def call_context_retention(self) -> tuple[int, datetime | None]:
+        """Returns the number of stored call contexts and the oldest created_at."""
+        with self._conn() as conn:
+            row = conn.execute("SELECT COUNT(*) AS total, MIN(created_at) AS oldest FROM call_contexts").fetchone()
+        oldest = datetime.fromtimestamp(int(row["oldest"]), tz=timezone.utc) if row["oldest"] is not None else None
+        return int(row["total"]), oldest
+
+
+class CallContextCache:
+    """In-process LRU of active call contexts keyed by CallSid.
+
+    Entries expire together with the stored context (`created_at` + TTL).
+    Cached objects are never mutated in place: appending a turn swaps in a new
+    CallContext, so callers may keep references they already hold. Other
+    workers may write the same database, so a hit is only served after its
+    version (`created_at`, number of turns) matches the stored one; a
+    mismatch is dropped with `reject`.
+    """
+
+    def __init__(self, *, max_entries: int, ttl_minutes: int) -> None:
+        self._max_entries = max_entries
+        self._ttl = timedelta(minutes=ttl_minutes)
+        self._entries: OrderedDict[str, CallContext] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._stale = 0
+
+    @staticmethod
+    def version(context: CallContext) -> tuple[datetime, int]:
+        return context.created_at, len(context.conversation)
+
+    def get(self, call_sid: str) -> CallContext | None:
+        context = self._entries.get(call_sid)
+        if context is not None and context.created_at + self._ttl > datetime.now(timezone.utc):
+            self._entries.move_to_end(call_sid)
+            self._hits += 1
+            return context
+        if context is not None:
+            del self._entries[call_sid]
+        self._misses += 1
+        return None
+
+    def put(self, context: CallContext) -> None:
+        self._entries[context.call_sid] = context
+        self._entries.move_to_end(context.call_sid)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def append_turn(self, call_sid: str, turn: ConversationTurn) -> None:
+        context = self._entries.get(call_sid)
+        if context is not None:
+            self._entries[call_sid] = replace(context, conversation=[*context.conversation, turn])
+
+    def invalidate(self, call_sid: str) -> None:
+        self._entries.pop(call_sid, None)
+
+    def reject(self, call_sid: str) -> None:
+        """Drops an entry `get` returned that turned out stale; counts it as a miss."""
+        if self._entries.pop(call_sid, None) is not None:
+            self._hits -= 1
+            self._misses += 1
+            self._stale += 1
+
+    def purge_expired(self) -> None:
+        cutoff = datetime.now(timezone.utc) - self._ttl
+        for call_sid in [key for key, context in self._entries.items() if context.created_at <= cutoff]:
+            del self._entries[call_sid]
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "stale": self._stale,
+        }
+
+
+class StateStore(Protocol):
+    """Async state-store interface used by the app and its services.
+
+    `AsyncSqliteStore` is the default implementation; `PostgresStore` in
+    `postgres_store.py` backs multi-replica deployments.
+    """
+
+    async def aclose(self) -> None: ...
+
+    async def ping(self) -> None: ...
+
+    async def get_telegram_offset(self) -> int: ...
+
+    async def set_telegram_offset(self, offset: int) -> None: ...
+
+    async def acquire_lease(self, name: str, holder: str, *, ttl_seconds: float) -> int | None: ...
+
+    async def release_lease(self, name: str, holder: str) -> None: ...
+
+    async def store_message(
+        self,
+        *,
+        telegram_update_id: int,
+        chat_id: int,
+        sender: str,
+        timestamp: datetime,
+        text: str,
+    ) -> bool: ...
+
+    async def store_messages(
+        self,
+        messages: list[InboundMessage],
+        *,
+        telegram_offset: int | None = None,
+        fencing_token: int | None = None,
+    ) -> int: ...
+
+    async def list_unread_messages(
+        self,
+        *,
+        limit: int,
+        allowed_chat_id: int | None = None,
+    ) -> list[TelegramMessage]: ...
+
+    async def mark_messages_read(self, ids: list[int]) -> None: ...
+
+    async def list_unread_chat_ids(self, *, allowed_chat_id: int | None = None) -> list[int]: ...
+
+    async def list_unread_chat_messages_after(
+        self,
+        chat_id: int,
+        *,
+        after_id: int,
+        limit: int,
+    ) -> list[TelegramMessage]: ...
+
+    async def mark_chat_messages_read(self, chat_id: int, *, up_to_id: int) -> None: ...
+
+    async def get_chat_summaries(self, chat_ids: list[int]) -> dict[int, ChatSummary]: ...
+
+    async def save_chat_summary(self, chat_summary: ChatSummary) -> None: ...
+
+    async def get_precomputed_summary(self, cache_key: str) -> str | None: ...
+
+    async def save_precomputed_summary(self, cache_key: str, summary: str) -> None: ...
+
+    async def get_llm_response(self, cache_key: str, *, now: float) -> tuple[str, float] | None: ...
+
+    async def save_llm_response(
+        self,
+        cache_key: str,
+        response: str,
+        *,
+        expires_at: float,
+        max_entries: int,
+    ) -> None: ...
+
+    async def save_call_context(
+        self,
+        call_sid: str,
+        summary: str,
+        messages: list[TelegramMessage],
+    ) -> CallContext: ...
+
+    async def get_call_context(self, call_sid: str) -> CallContext | None: ...
+
+    async def append_conversation_turn(self, call_sid: str, role: str, text: str) -> bool: ...
+
+    async def cleanup_stale_call_contexts(self, *, ttl_minutes: int, batch_size: int = 500) -> int: ...
+
+    async def call_context_retention(self) -> tuple[int, datetime | None]: ...
+
+    async def get_webhook_response(self, call_sid: str, endpoint: str, request_hash: str) -> str | None: ...
+
+    async def save_webhook_response(self, call_sid: str, endpoint: str, request_hash: str, twiml: str) -> str: ...
+
+
+class AsyncSqliteStore:
+    """Awaitable facade over SqliteStore.
+
+    Every call runs on a dedicated, bounded thread pool so disk I/O never blocks
+    the event loop. With a pooled SqliteStore each worker thread keeps its own
+    connection, so the pool size also bounds the number of open connections.
+    """
+
+    def __init__(
+        self,
+        store: SqliteStore,
+        *,
+        max_workers: int = 4,
+        call_context_cache: CallContextCache | None = None,
+    ) -> None:
+        self._store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sqlite-store")
+        self._call_context_cache = call_context_cache
+
+    @property
+    def call_context_cache(self) -> CallContextCache | None:
+        return self._call_context_cache
+
+    @property
+    def sync(self) -> SqliteStore:
+        return self._store
+
+    async def _run[T](self, func: Callable[..., T], /, *args: object, **kwargs: object) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: func(*args, **kwargs))
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self._store.close()
+
+    async def aclose(self) -> None:
+        self.close()
+
+    async def ping(self) -> None:
+        await self._run(self._store.ping)
+
+    async def get_telegram_offset(self) -> int:
+        return await self._run(self._store.get_telegram_offset)
+
+    async def set_telegram_offset(self, offset: int) -> None:
+        await self._run(self._store.set_telegram_offset, offset)
+
+    async def acquire_lease(self, name: str, holder: str, *, ttl_seconds: float) -> int | None:
+        return await self._run(self._store.acquire_lease, name, holder, ttl_seconds=ttl_seconds)
+
+    async def release_lease(self, name: str, holder: str) -> None:
+        await self._run(self._store.release_lease, name, holder)
+
+    async def store_message(
+        self,
+        *,
+        telegram_update_id: int,
+        chat_id: int,
+        sender: str,
+        timestamp: datetime,
+        text: str,
+    ) -> bool:
+        return await self._run(
+            self._store.store_message,
+            telegram_update_id=telegram_update_id,
+            chat_id=chat_id,
+            sender=sender,
+            timestamp=timestamp,
+            text=text,
+        )
+
+    async def store_messages(
+        self,
+        messages: list[InboundMessage],
+        *,
+        telegram_offset: int | None = None,
+        fencing_token: int | None = None,
+    ) -> int:
+        return await self._run(
+            self._store.store_messages,
+            messages,
+            telegram_offset=telegram_offset,
+            fencing_token=fencing_token,
+        )
+
+    async def list_unread_messages(
+        self,
+        *,
+        limit: int,
+        allowed_chat_id: int | None = None,
+    ) -> list[TelegramMessage]:
+        return await self._run(
+            self._store.list_unread_messages,
+            limit=limit,
+            allowed_chat_id=allowed_chat_id,
+        )
+
+    async def mark_messages_read(self, ids: list[int]) -> None:
+        await self._run(self._store.mark_messages_read, ids)
+
+    async def list_unread_chat_ids(self, *, allowed_chat_id: int | None = None) -> list[int]:
+        return await self._run(self._store.list_unread_chat_ids, allowed_chat_id=allowed_chat_id)
+
+    async def list_unread_chat_messages_after(
+        self,
+        chat_id: int,
+        *,
+        after_id: int,
+        limit: int,
+    ) -> list[TelegramMessage]:
+        return await self._run(
+            self._store.list_unread_chat_messages_after,
+            chat_id,
+            after_id=after_id,
+            limit=limit,
+        )
+
+    async def mark_chat_messages_read(self, chat_id: int, *, up_to_id: int) -> None:
+        await self._run(self._store.mark_chat_messages_read, chat_id, up_to_id=up_to_id)
+
+    async def get_chat_summaries(self, chat_ids: list[int]) -> dict[int, ChatSummary]:
+        return await self._run(self._store.get_chat_summaries, chat_ids)
+
+    async def save_chat_summary(self, chat_summary: ChatSummary) -> None:
+        await self._run(self._store.save_chat_summary, chat_summary)
+
+    async def get_precomputed_summary(self, cache_key: str) -> str | None:
+        return await self._run(self._store.get_precomputed_summary, cache_key)
+
+    async def save_precomputed_summary(self, cache_key: str, summary: str) -> None:
+        await self._run(self._store.save_precomputed_summary, cache_key, summary)
+
+    async def get_llm_response(self, cache_key: str, *, now: float) -> tuple[str, float] | None:
+        return await self._run(self._store.get_llm_response, cache_key, now=now)
+
+    async def save_llm_response(self, cache_key: str, response: str, *, expires_at: float, max_entries: int) -> None:
+        await self._run(
+            self._store.save_llm_response,
+            cache_key,
+            response,
+            expires_at=expires_at,
+            max_entries=max_entries,
+        )
+
+    async def save_call_context(
+        self,
+        call_sid: str,
+        summary: str,
+        messages: list[TelegramMessage],
+    ) -> CallContext:
+        context = await self._run(self._store.save_call_context, call_sid, summary, messages)
+        if self._call_context_cache is not None:
+            self._call_context_cache.put(context)
+        return context
+
+    async def get_call_context(self, call_sid: str) -> CallContext | None:
+        cache = self._call_context_cache
+        if cache is not None:
+            cached = cache.get(call_sid)
+            if cached is not None:
+                # Another worker on the same database may have appended turns.
+                if await self._run(self._store.call_context_version, call_sid) == cache.version(cached):
+                    return cached
+                cache.reject(call_sid)
+        context = await self._run(self._store.get_call_context, call_sid)
+        if cache is not None and context is not None:
+            cache.put(context)
+        return context
+
+    async def append_conversation_turn(self, call_sid: str, role: str, text: str) -> bool:
+        appended = await self._run(self._store.append_conversation_turn, call_sid, role, text)
+        if self._call_context_cache is not None:
+            if appended:
+                self._call_context_cache.append_turn(call_sid, ConversationTurn(role=role, text=text))
+            else:
+                self._call_context_cache.invalidate(call_sid)
+        return appended
+
+    async def cleanup_stale_call_contexts(self, *, ttl_minutes: int, batch_size: int = 500) -> int:
+        if self._call_context_cache is not None:
+            self._call_context_cache.purge_expired()
+        return await self._run(
+            self._store.cleanup_stale_call_contexts,
+            ttl_minutes=ttl_minutes,
+            batch_size=batch_size,
+        )
+
+    async def call_context_retention(self) -> tuple[int, datetime | None]:
+        return await self._run(self._store.call_context_retention)
+
+    async def get_webhook_response(self, call_sid: str, endpoint: str, request_hash: str) -> str | None:
+        return await self._run(self._store.get_webhook_response, call_sid, endpoint, request_hash)
+
+    async def save_webhook_response(self, call_sid: str, endpoint: str, request_hash: str, twiml: str) -> str:
+        return await self._run(self._store.save_webhook_response, call_sid, endpoint, request_hash, twiml)
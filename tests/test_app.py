@@ -1,11 +1,19 @@
+import asyncio
+import subprocess
+import sys
+import time
 from pathlib import Path
 from datetime import datetime, timezone
 
+import httpx
+import pytest
 from fastapi.testclient import TestClient
 
 from ai_messenger_voicemail.app import create_app
 from ai_messenger_voicemail.config import Settings
-from ai_messenger_voicemail.store import SqliteStore
+from ai_messenger_voicemail.services.llm_service import LLMService
+from ai_messenger_voicemail.services.summary_service import SummaryPrecomputer
+from ai_messenger_voicemail.store import SqliteStore, call_preparation_lease
 
 
 def test_health_and_readiness(client: TestClient) -> None:
@@ -18,6 +26,24 @@ def test_health_and_readiness(client: TestClient) -> None:
     assert ready.json() == {"status": "ready"}
 
 
+def test_importing_app_defers_sdks_and_resources(tmp_path: Path) -> None:
+    # Fresh interpreter: the test session itself has long imported every SDK.
+    script = (
+        "import sys, ai_messenger_voicemail.app\n"
+        "print(','.join(m for m in ('openai', 'twilio', 'httpx', 'asyncpg') if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=tmp_path,
+    )
+
+    assert result.stdout.strip() == ""
+    assert not (tmp_path / "data").exists()
+
+
 def test_incoming_without_messages_returns_twiML(client: TestClient) -> None:
     response = client.post("/twilio/voice/incoming", data={"CallSid": "call-1"})
 
@@ -84,6 +110,141 @@ def test_incoming_is_idempotent_for_same_call_sid(tmp_path: Path) -> None:
     assert "Bitte ruf mich spaeter an." in second.text
 
 
+def test_incoming_retry_after_failed_preparation_is_recomputed(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    db_path = tmp_path / "state.db"
+    SqliteStore(db_path).store_message(
+        telegram_update_id=110,
+        chat_id=555,
+        sender="alice",
+        timestamp=datetime.now(timezone.utc),
+        text="Bin gleich zurueck.",
+    )
+    original = SummaryPrecomputer.get_summary
+    attempts = 0
+
+    async def flaky_get_summary(self, messages):
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise RuntimeError("LLM kurz nicht erreichbar")
+        return await original(self, messages)
+
+    monkeypatch.setattr(SummaryPrecomputer, "get_summary", flaky_get_summary)
+    settings = Settings(
+        _env_file=None,
+        app_env="test",
+        base_url="http://testserver",
+        sqlite_path=db_path,
+        openai_api_key=None,
+        telegram_bot_token=None,
+        twilio_validate_signature=False,
+        summary_precompute_enabled=False,
+    )
+
+    with TestClient(create_app(settings)) as client:
+        failed = client.post("/twilio/voice/incoming", data={"CallSid": "call-flaky"})
+        retry = client.post("/twilio/voice/incoming", data={"CallSid": "call-flaky"})
+        stats = client.get("/stats").json()["webhook_idempotency"]
+
+    assert "nicht verfuegbar" in failed.text
+    assert "Bin gleich zurueck." in retry.text
+    assert attempts == 2
+    assert stats["uncached"] == 1 and stats["computed"] == 1
+
+
+def test_concurrent_incoming_in_one_process_prepares_once(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    db_path = tmp_path / "state.db"
+    SqliteStore(db_path).store_message(
+        telegram_update_id=120,
+        chat_id=555,
+        sender="alice",
+        timestamp=datetime.now(timezone.utc),
+        text="Komme spaeter.",
+    )
+    original = SummaryPrecomputer.get_summary
+    calls = 0
+
+    async def slow_get_summary(self, messages):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.2)
+        return await original(self, messages)
+
+    monkeypatch.setattr(SummaryPrecomputer, "get_summary", slow_get_summary)
+    settings = Settings(
+        _env_file=None,
+        app_env="test",
+        base_url="http://testserver",
+        sqlite_path=db_path,
+        openai_api_key=None,
+        telegram_bot_token=None,
+        twilio_validate_signature=False,
+        summary_precompute_enabled=False,
+        webhook_idempotency_enabled=False,
+    )
+    app = create_app(settings)
+
+    async def scenario() -> list[httpx.Response]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            return await asyncio.gather(
+                *(client.post("/twilio/voice/incoming", data={"CallSid": "call-twice"}) for _ in range(2))
+            )
+
+    responses = asyncio.run(scenario())
+
+    assert calls == 1
+    assert all("Komme spaeter." in response.text for response in responses)
+    context = SqliteStore(db_path).get_call_context("call-twice")
+    assert context is not None and [message.text for message in context.messages] == ["Komme spaeter."]
+
+
+def test_remaining_unread_set_is_precomputed_after_a_call(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    db_path = tmp_path / "state.db"
+    pre_store = SqliteStore(db_path)
+    for update_id in (130, 131, 132):
+        pre_store.store_message(
+            telegram_update_id=update_id,
+            chat_id=555,
+            sender="alice",
+            timestamp=datetime(2025, 2, 19, 10, update_id - 130, tzinfo=timezone.utc),
+            text=f"Nachricht {update_id}",
+        )
+
+    async def fake_summarize(self, messages, *, allow_fallback=True):
+        return "LLM: " + ", ".join(message.text for message in messages)
+
+    monkeypatch.setattr(LLMService, "summarize_messages", fake_summarize)
+    settings = Settings(
+        _env_file=None,
+        app_env="test",
+        base_url="http://testserver",
+        sqlite_path=db_path,
+        openai_api_key=None,
+        telegram_bot_token=None,
+        twilio_validate_signature=False,
+        max_messages_per_call=2,
+    )
+
+    def wait_for_refreshes(client: TestClient, count: int) -> None:
+        for _ in range(100):
+            if client.get("/stats").json()["summary_precompute"]["refreshes"] >= count:
+                return
+            time.sleep(0.01)
+
+    with TestClient(create_app(settings)) as client:
+        # Startup precomputes the newest two; the call then leaves one unread.
+        wait_for_refreshes(client, 1)
+        first = client.post("/twilio/voice/incoming", data={"CallSid": "call-first"})
+        wait_for_refreshes(client, 2)
+        second = client.post("/twilio/voice/incoming", data={"CallSid": "call-second"})
+        stats = client.get("/stats").json()["summary_precompute"]
+
+    assert "Nachricht 132" in first.text
+    assert "LLM: Nachricht 130" in second.text
+    assert stats == {"hits": 2, "misses": 0, "refreshes": 2}
+
+
 def test_followup_respects_turn_limit(tmp_path: Path) -> None:
     db_path = tmp_path / "state.db"
     pre_store = SqliteStore(db_path)
@@ -118,3 +279,226 @@ def test_followup_respects_turn_limit(tmp_path: Path) -> None:
 
     assert response.status_code == 200
     assert "maximale Anzahl an Rueckfragen" in response.text
+
+
+def test_telegram_webhook_requires_secret_and_stores_updates(tmp_path: Path) -> None:
+    db_path = tmp_path / "state.db"
+    settings = Settings(
+        _env_file=None,
+        app_env="test",
+        base_url="http://testserver",
+        sqlite_path=db_path,
+        openai_api_key=None,
+        telegram_bot_token="token",
+        telegram_ingestion_mode="webhook",
+        telegram_webhook_secret="hook-secret",
+        twilio_validate_signature=False,
+    )
+    client = TestClient(create_app(settings))
+    update = {
+        "update_id": 900,
+        "message": {
+            "date": 1739962800,
+            "text": "Per Webhook",
+            "chat": {"id": 555},
+            "from": {"username": "alice"},
+        },
+    }
+
+    rejected = client.post("/telegram/webhook", json=update, headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"})
+    accepted = client.post("/telegram/webhook", json=update, headers={"X-Telegram-Bot-Api-Secret-Token": "hook-secret"})
+    duplicate = client.post("/telegram/webhook", json=update, headers={"X-Telegram-Bot-Api-Secret-Token": "hook-secret"})
+
+    assert rejected.status_code == 403
+    assert accepted.status_code == 200
+    assert duplicate.status_code == 200
+    unread = SqliteStore(db_path).list_unread_messages(limit=10)
+    assert [msg.text for msg in unread] == ["Per Webhook"]
+
+
+def test_telegram_webhook_is_disabled_in_polling_mode(client: TestClient) -> None:
+    response = client.post("/telegram/webhook", json={"update_id": 1})
+
+    assert response.status_code == 404
+
+
+def test_progressive_incoming_redirects_until_summary_is_ready(tmp_path: Path) -> None:
+    db_path = tmp_path / "state.db"
+    SqliteStore(db_path).store_message(
+        telegram_update_id=300,
+        chat_id=555,
+        sender="carol",
+        timestamp=datetime.now(timezone.utc),
+        text="Paket ist angekommen.",
+    )
+    settings = Settings(
+        _env_file=None,
+        app_env="test",
+        base_url="http://testserver",
+        sqlite_path=db_path,
+        openai_api_key=None,
+        telegram_bot_token=None,
+        twilio_validate_signature=False,
+        twilio_progressive_response=True,
+        twilio_progressive_pause_seconds=1,
+    )
+
+    with TestClient(create_app(settings)) as client:
+        greeting = client.post("/twilio/voice/incoming", data={"CallSid": "call-progressive"})
+        summary = client.post("/twilio/voice/summary?attempt=1", data={"CallSid": "call-progressive"})
+
+    assert greeting.status_code == 200
+    assert "Einen Moment bitte" in greeting.text
+    assert "http://testserver/twilio/voice/summary?attempt=1</Redirect>" in greeting.text
+    assert "Paket ist angekommen." not in greeting.text
+    assert summary.status_code == 200
+    assert "Paket ist angekommen." in summary.text
+    assert "Willkommen" not in summary.text
+    assert "<Gather" in summary.text
+
+
+def test_summary_poll_waits_for_call_claimed_by_another_replica(tmp_path: Path) -> None:
+    db_path = tmp_path / "state.db"
+    pre_store = SqliteStore(db_path)
+    pre_store.store_message(
+        telegram_update_id=310,
+        chat_id=555,
+        sender="carol",
+        timestamp=datetime.now(timezone.utc),
+        text="Paket ist angekommen.",
+    )
+    # Another replica answered the incoming webhook and is still preparing the call.
+    assert pre_store.acquire_lease(call_preparation_lease("call-replica"), "replica-a", ttl_seconds=30) == 1
+    settings = Settings(
+        _env_file=None,
+        app_env="test",
+        base_url="http://testserver",
+        sqlite_path=db_path,
+        openai_api_key=None,
+        telegram_bot_token=None,
+        twilio_validate_signature=False,
+        twilio_progressive_response=True,
+        twilio_progressive_pause_seconds=1,
+        call_context_cache_enabled=False,
+    )
+
+    with TestClient(create_app(settings)) as client:
+        waiting = client.post("/twilio/voice/summary?attempt=1", data={"CallSid": "call-replica"})
+        assert pre_store.get_call_context("call-replica") is None
+        assert len(pre_store.list_unread_messages(limit=10)) == 1
+
+        # The other replica finishes and marks the messages read.
+        unread = pre_store.list_unread_messages(limit=10)
+        pre_store.save_call_context("call-replica", "Carol schreibt: Paket ist angekommen.", unread)
+        pre_store.mark_messages_read([message.id for message in unread])
+        summary = client.post("/twilio/voice/summary?attempt=2", data={"CallSid": "call-replica"})
+
+    assert "summary?attempt=2</Redirect>" in waiting.text
+    assert "Carol schreibt: Paket ist angekommen." in summary.text
+    assert "keine ungelesenen Nachrichten" not in summary.text
+    context = pre_store.get_call_context("call-replica")
+    assert context is not None
+    assert [message.text for message in context.messages] == ["Paket ist angekommen."]
+
+
+def test_simple_followups_are_answered_without_llm(tmp_path: Path) -> None:
+    db_path = tmp_path / "state.db"
+    pre_store = SqliteStore(db_path)
+    pre_store.store_message(
+        telegram_update_id=300,
+        chat_id=555,
+        sender="anna",
+        timestamp=datetime.now(timezone.utc),
+        text="Bin spaeter da",
+    )
+    pre_store.save_call_context("call-local", "summary", pre_store.list_unread_messages(limit=10))
+    settings = Settings(
+        _env_file=None,
+        app_env="test",
+        base_url="http://testserver",
+        sqlite_path=db_path,
+        openai_api_key="unused-key",
+        telegram_bot_token=None,
+        twilio_validate_signature=False,
+    )
+    client = TestClient(create_app(settings))
+
+    response = client.post(
+        "/twilio/voice/followup",
+        data={"CallSid": "call-local", "SpeechResult": "Was hat Anna geschrieben?"},
+    )
+
+    assert response.status_code == 200
+    assert "Nachricht 1 von anna" in response.text
+    intents = client.get("/stats").json()["followup_intents"]
+    assert intents == {"hits": {"sender": 1}, "escalated": 0, "hit_rate": 1.0}
+
+
+def test_retried_followup_replays_response_without_new_turns(tmp_path: Path) -> None:
+    db_path = tmp_path / "state.db"
+    pre_store = SqliteStore(db_path)
+    pre_store.store_message(
+        telegram_update_id=400,
+        chat_id=555,
+        sender="lena",
+        timestamp=datetime.now(timezone.utc),
+        text="Der Zug hat Verspaetung",
+    )
+    pre_store.save_call_context("call-retry", "summary", pre_store.list_unread_messages(limit=10))
+    settings = Settings(
+        _env_file=None,
+        app_env="test",
+        base_url="http://testserver",
+        sqlite_path=db_path,
+        openai_api_key=None,
+        telegram_bot_token=None,
+        twilio_validate_signature=False,
+    )
+    client = TestClient(create_app(settings))
+    form = {"CallSid": "call-retry", "SpeechResult": "Was ist mit dem Zug?"}
+
+    first = client.post("/twilio/voice/followup", data=form)
+    retry = client.post("/twilio/voice/followup", data=form)
+
+    assert first.status_code == 200
+    assert retry.content == first.content
+    context = pre_store.get_call_context("call-retry")
+    assert context is not None
+    assert [turn.role for turn in context.conversation] == ["caller", "assistant"]
+    assert client.get("/stats").json()["webhook_idempotency"]["replayed"] == 1
+
+
+def test_metrics_endpoint_exposes_stage_histograms_and_counters(tmp_path: Path) -> None:
+    db_path = tmp_path / "state.db"
+    pre_store = SqliteStore(db_path)
+    pre_store.store_message(
+        telegram_update_id=500,
+        chat_id=555,
+        sender="mia",
+        timestamp=datetime.now(timezone.utc),
+        text="Kommst du heute?",
+    )
+    settings = Settings(
+        _env_file=None,
+        app_env="test",
+        base_url="http://testserver",
+        sqlite_path=db_path,
+        openai_api_key=None,
+        telegram_bot_token=None,
+        twilio_validate_signature=False,
+    )
+    client = TestClient(create_app(settings))
+
+    client.post("/twilio/voice/incoming", data={"CallSid": "call-metrics"})
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert 'voicemail_webhook_duration_seconds_count{endpoint="incoming"} 1' in body
+    assert 'voicemail_webhooks_in_progress{endpoint="incoming"} 0.0' in body
+    assert 'voicemail_stage_duration_seconds_count{stage="summary"} 1' in body
+    assert 'voicemail_stage_duration_seconds_count{stage="twiml_render"} 1' in body
+    assert 'voicemail_store_operation_duration_seconds_count{operation="save_call_context"} 1' in body
+    assert 'voicemail_llm_fallbacks_total{kind="summary"} 1.0' in body
+    assert "voicemail_calls_in_preparation 0.0" in body
@@ -0,0 +1,104 @@
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from ai_messenger_voicemail.models import TelegramMessage
+from ai_messenger_voicemail.services.intent_router import IntentRouter, resolve_intent
+
+NOW = datetime(2025, 2, 19, 18, 0, tzinfo=timezone.utc)
+
+
+def _messages() -> list[TelegramMessage]:
+    return [
+        TelegramMessage(1, 1, 555, "Anna", datetime(2025, 2, 19, 15, 30, tzinfo=timezone.utc), "Bin spaeter da."),
+        TelegramMessage(2, 2, 555, "bob", datetime(2025, 2, 19, 9, 0, tzinfo=timezone.utc), "Meeting verschoben."),
+        TelegramMessage(3, 3, 777, "Anna", datetime(2025, 2, 18, 20, 0, tzinfo=timezone.utc), "Gute Nacht!"),
+    ]
+
+
+def test_message_number_and_repeat_intents() -> None:
+    messages = _messages()
+
+    second = resolve_intent("Lies mir die zweite Nachricht vor", messages, "S", now=NOW)
+    by_number = resolve_intent("Was stand in Nachricht 3?", messages, "S", now=NOW)
+    missing = resolve_intent("nachricht nummer 9", messages, "S", now=NOW)
+    repeat = resolve_intent("Kannst du das wiederholen?", messages, "S", now=NOW)
+
+    assert second is not None and second.answer.startswith("Nachricht 2 von bob")
+    assert by_number is not None and by_number.answer.endswith("Gute Nacht!")
+    assert missing is not None and "nur 3 Nachrichten" in missing.answer
+    assert repeat is not None and repeat.answer == "Ich wiederhole die Zusammenfassung: S"
+
+
+def test_sender_and_time_lookups() -> None:
+    messages = _messages()
+
+    sender = resolve_intent("Was hat Anna geschrieben?", messages, "S", now=NOW)
+    today = resolve_intent("Welche Nachrichten kamen heute ab 12 Uhr?", messages, "S", now=NOW)
+    yesterday = resolve_intent("Was wurde gestern geschrieben?", messages, "S", now=NOW)
+    newest = resolve_intent("Was ist die neueste Nachricht?", messages, "S", now=NOW)
+
+    assert sender is not None and sender.intent == "sender"
+    assert "Nachricht 1 von Anna" in sender.answer and "Nachricht 3 von Anna" in sender.answer
+    assert "bob" not in sender.answer
+    # 15:30 UTC is 16:30 in Berlin, the default local time.
+    assert today is not None and today.answer == "Nachricht 1 von Anna um 19.02.2025 16:30: Bin spaeter da."
+    assert yesterday is not None and yesterday.answer.startswith("Nachricht 3 von Anna")
+    assert newest is not None and newest.answer.startswith("Nachricht 1 von Anna")
+
+
+def test_open_questions_are_escalated_and_counted() -> None:
+    router = IntentRouter()
+    messages = _messages()
+
+    assert router.route("Soll ich Anna zurueckrufen?", messages, "S", now=NOW) is None
+    assert router.route("Nachricht 2", messages, "S", now=NOW) is not None
+    assert router.route("Was schreibt Bob?", messages, "S", now=NOW) is not None
+
+    assert router.stats() == {"hits": {"message_number": 1, "sender": 1}, "escalated": 1, "hit_rate": 2 / 3}
+
+
+def test_ambiguous_questions_are_not_answered_locally() -> None:
+    messages = [*_messages(), TelegramMessage(4, 4, 555, "bob", NOW, "Ruf mich an: 0171 2345678")]
+
+    again = resolve_intent("Was hat Anna nochmal geschrieben?", messages, "S", now=NOW)
+
+    # Sender before repeat: the question is about Anna, not the summary.
+    assert again is not None and again.intent == "sender"
+    assert "Nachricht 1 von Anna" in again.answer
+    for question in (
+        "Kannst du die Nachrichten von Bob zusammenfassen?",
+        "Lies mir die letzten drei Nachrichten vor",
+        "Welche Nummer 0171 hat Bob geschickt?",
+        "Was waren die letzten Nachrichten?",
+        "Warum hat Anna geschrieben?",
+    ):
+        assert resolve_intent(question, messages, "S", now=NOW) is None, question
+
+
+def test_repeat_needs_an_explicit_request() -> None:
+    messages = _messages()
+
+    assert resolve_intent("Noch mal bitte", messages, "S", now=NOW) is not None
+    assert resolve_intent("Die Zusammenfassung noch einmal", messages, "S", now=NOW) is not None
+    assert resolve_intent("Kannst du das nochmal genauer erklaeren?", messages, "S", now=NOW) is None
+    assert resolve_intent("Gab es um 9 Uhr Nachrichten?", messages, "S", now=NOW) is not None
+
+
+def test_days_and_hours_are_local_time() -> None:
+    messages = [
+        # 00:30 on the 19th in Berlin, but still the 18th in UTC.
+        TelegramMessage(1, 1, 555, "Anna", datetime(2025, 2, 18, 23, 30, tzinfo=timezone.utc), "Schon wach?"),
+        # 14:30 in Berlin.
+        TelegramMessage(2, 2, 555, "bob", datetime(2025, 2, 19, 13, 30, tzinfo=timezone.utc), "Bin da."),
+    ]
+
+    today = resolve_intent("Was kam heute?", messages, "S", now=NOW)
+    afternoon = resolve_intent("Welche Nachrichten kamen ab 14 Uhr?", messages, "S", now=NOW)
+    in_utc = resolve_intent("Was kam heute?", messages, "S", now=NOW, tz=timezone.utc)
+    router = IntentRouter(tz=ZoneInfo("America/New_York"))
+    new_york = router.route("Was kam gestern?", messages, "S", now=NOW)
+
+    assert today is not None and "19.02.2025 00:30: Schon wach?" in today.answer and "Bin da." in today.answer
+    assert afternoon is not None and afternoon.answer == "Nachricht 2 von bob um 19.02.2025 14:30: Bin da."
+    assert in_utc is not None and "Schon wach?" not in in_utc.answer
+    assert new_york is not None and new_york.answer == "Nachricht 1 von Anna um 18.02.2025 18:30: Schon wach?"
@@ -0,0 +1,227 @@
+import asyncio
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+from ai_messenger_voicemail.config import Settings
+from ai_messenger_voicemail.metrics import AppMetrics
+from ai_messenger_voicemail.models import TelegramMessage
+from ai_messenger_voicemail.services.llm_cache import LLMResponseCache
+from ai_messenger_voicemail.services.llm_service import LLMService
+from ai_messenger_voicemail.services.prompt_builder import count_message_tokens
+from ai_messenger_voicemail.store import AsyncSqliteStore, SqliteStore
+
+
+class _FakeResponses:
+    def __init__(self, delays: list[float] | None = None) -> None:
+        self.calls: list[dict] = []
+        self._delays = delays or []
+
+    async def create(self, **kwargs: object) -> SimpleNamespace:
+        self.calls.append(kwargs)
+        call_number = len(self.calls)
+        if self._delays:
+            await asyncio.sleep(self._delays.pop(0))
+        return SimpleNamespace(output_text=f"Antwort {call_number}")
+
+
+def _service(
+    cache: LLMResponseCache | None,
+    *,
+    delays: list[float] | None = None,
+    **overrides: object,
+) -> tuple[LLMService, _FakeResponses]:
+    settings = Settings(_env_file=None, openai_api_key="test-key", telegram_bot_token=None, **overrides)
+    service = LLMService(settings, cache=cache)
+    responses = _FakeResponses(delays)
+    service._client = SimpleNamespace(responses=responses)  # noqa: SLF001 - test double
+    return service, responses
+
+
+def _messages() -> list[TelegramMessage]:
+    return [
+        TelegramMessage(
+            id=1,
+            telegram_update_id=1,
+            chat_id=555,
+            sender="alice",
+            timestamp=datetime(2025, 2, 19, 11, 0, tzinfo=timezone.utc),
+            text="Treffen um drei?",
+        )
+    ]
+
+
+def test_identical_prompts_are_served_from_cache() -> None:
+    cache = LLMResponseCache(max_entries=8, ttl_seconds=60)
+    service, responses = _service(cache)
+
+    async def scenario() -> list[str]:
+        return [
+            await service.summarize_messages(_messages()),
+            await service.summarize_messages(_messages()),
+            await service.answer_followup("Wann?", _messages(), "summary", []),
+        ]
+
+    answers = asyncio.run(scenario())
+
+    assert answers == ["Antwort 1", "Antwort 1", "Antwort 2"]
+    assert len(responses.calls) == 2
+    assert cache.stats() == {"entries": 2, "memory_hits": 1, "store_hits": 0, "misses": 2}
+
+
+def test_cache_evicts_least_recently_used_and_expired_entries() -> None:
+    cache = LLMResponseCache(max_entries=2, ttl_seconds=60)
+
+    async def scenario() -> tuple[str | None, str | None, str | None]:
+        await cache.set("a", "A")
+        await cache.set("b", "B")
+        await cache.get("a")
+        await cache.set("c", "C")
+        return await cache.get("a"), await cache.get("b"), await cache.get("c")
+
+    assert asyncio.run(scenario()) == ("A", None, "C")
+
+    expired = LLMResponseCache(max_entries=2, ttl_seconds=-1)
+    asyncio.run(expired.set("a", "A"))
+    assert asyncio.run(expired.get("a")) is None
+
+
+def test_sqlite_tier_survives_a_new_process(tmp_path: Path) -> None:
+    store = AsyncSqliteStore(SqliteStore(tmp_path / "state.db"))
+    first, first_responses = _service(LLMResponseCache(max_entries=8, ttl_seconds=60, store=store))
+    asyncio.run(first.summarize_messages(_messages()))
+
+    second_cache = LLMResponseCache(max_entries=8, ttl_seconds=60, store=store)
+    second, second_responses = _service(second_cache)
+    answer = asyncio.run(second.summarize_messages(_messages()))
+
+    assert answer == "Antwort 1"
+    assert len(first_responses.calls) == 1
+    assert second_responses.calls == []
+    assert second_cache.stats()["store_hits"] == 1
+
+
+def test_budget_overrun_opens_breaker_and_routes_to_fallback() -> None:
+    service, responses = _service(
+        None,
+        delays=[5.0, 5.0],
+        llm_followup_budget_seconds=0.5,
+        llm_breaker_failure_threshold=2,
+    )
+
+    async def scenario() -> list[str]:
+        return [await service.answer_followup(f"Worum ging es {i}?", _messages(), "summary", []) for i in range(3)]
+
+    answers = asyncio.run(scenario())
+
+    assert all(answer.startswith("Ich kann dazu nur") for answer in answers)
+    assert len(responses.calls) == 2
+    stats = service.resilience_stats()
+    assert stats["timeouts"] == 2
+    assert stats["breaker"]["state"] == "open"
+    assert stats["breaker"]["rejected"] == 1
+
+
+def test_slow_request_is_hedged_after_percentile() -> None:
+    service, responses = _service(
+        None,
+        delays=[0.0, 0.0, 3.0, 0.0],
+        llm_hedge_enabled=True,
+        llm_hedge_min_samples=2,
+    )
+
+    async def scenario() -> str:
+        await service.summarize_messages(_messages())
+        await service.answer_followup("Wann?", _messages(), "summary", [])
+        return await service.answer_followup("Wo?", _messages(), "summary", [])
+
+    answer = asyncio.run(scenario())
+
+    assert answer == "Antwort 4"
+    assert len(responses.calls) == 4
+    assert service.resilience_stats()["hedged_requests"] == 1
+
+
+def test_prompt_respects_per_message_and_total_token_budgets() -> None:
+    service, responses = _service(None, prompt_max_tokens_per_message=16, prompt_max_total_tokens=256)
+    base = _messages()[0]
+    messages = [
+        TelegramMessage(
+            id=index,
+            telegram_update_id=index,
+            chat_id=base.chat_id,
+            sender=base.sender,
+            timestamp=base.timestamp,
+            text=f"Nachricht {index} " + "sehr langer Text " * 50,
+        )
+        for index in range(1, 41)
+    ]
+
+    asyncio.run(service.summarize_messages(messages))
+
+    prompt = responses.calls[0]["input"][1]["content"]
+    assert "1. alice" in prompt
+    assert "40. alice" not in prompt
+    assert "weitere Nachrichten aus Platzgruenden ausgelassen" in prompt
+    stats = service.token_stats()
+    assert stats["requests"] == 1
+    assert 0 < stats["estimated_prompt_tokens"] <= 256 + 200
+    assert stats["truncated_messages"] > 0
+    assert stats["omitted_messages"] > 0
+    assert stats["truncated_messages"] + stats["omitted_messages"] == 40
+
+
+def test_short_prompts_are_passed_through_unchanged() -> None:
+    service, responses = _service(None)
+
+    asyncio.run(service.summarize_messages(_messages()))
+
+    prompt = responses.calls[0]["input"][1]["content"]
+    assert prompt.endswith(_messages()[0].as_prompt_line(1))
+    assert service.token_stats()["truncated_messages"] == 0
+
+
+def test_cancelled_half_open_probe_does_not_wedge_the_breaker() -> None:
+    service, responses = _service(
+        None,
+        delays=[5.0, 5.0, 0.0],
+        llm_followup_budget_seconds=0.5,
+        llm_breaker_failure_threshold=1,
+    )
+    breaker = service._breaker  # noqa: SLF001 - inspecting breaker state
+
+    async def scenario() -> str:
+        await service.answer_followup("Erste?", _messages(), "summary", [])
+        breaker._opened_at -= 60  # noqa: SLF001 - skip the reset timeout
+        probe = asyncio.create_task(service.answer_followup("Zweite?", _messages(), "summary", []))
+        await asyncio.sleep(0.05)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+        return await service.answer_followup("Dritte?", _messages(), "summary", [])
+
+    answer = asyncio.run(scenario())
+
+    assert answer == "Antwort 3"
+    assert len(responses.calls) == 3
+    assert breaker.state == "closed"
+
+
+def test_only_message_token_counts_are_cached_and_each_request_is_reported() -> None:
+    metrics = AppMetrics()
+    service, _ = _service(None)
+    service._metrics = metrics  # noqa: SLF001 - test double
+    count_message_tokens.cache_clear()
+
+    async def scenario() -> None:
+        await service.summarize_messages(_messages())
+        for question in ("Wann genau?", "Wo treffen wir uns?", "Wer kommt noch?"):
+            await service.answer_followup(question, _messages(), "summary", [])
+
+    asyncio.run(scenario())
+
+    cache = count_message_tokens.cache_info()
+    # Message text and prompt line of the single message; the four unique
+    # prompts are counted without touching the cache.
+    assert cache.currsize == 2
+    assert cache.hits == 6
+    assert metrics.llm_prompt_tokens.count() == 4
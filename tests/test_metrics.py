@@ -0,0 +1,59 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from ai_messenger_voicemail.metrics import AppMetrics, Counter, Gauge, Histogram, MetricsRegistry, instrument_store
+from ai_messenger_voicemail.store import AsyncSqliteStore, SqliteStore
+
+
+def test_registry_renders_prometheus_text_format() -> None:
+    registry = MetricsRegistry()
+    counter = registry.register(Counter("demo_total", "Demo-Zaehler.", ("kind",)))
+    gauge = registry.register(Gauge("demo_in_progress", "Demo-Gauge."))
+    histogram = registry.register(Histogram("demo_seconds", "Demo-Histogramm.", ("stage",), buckets=(0.1, 1.0)))
+
+    counter.inc('a"b\\c')
+    counter.inc('a"b\\c', amount=2)
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "sync")
+
+    assert registry.render().splitlines() == [
+        "# HELP demo_total Demo-Zaehler.",
+        "# TYPE demo_total counter",
+        'demo_total{kind="a\\"b\\\\c"} 3.0',
+        "# HELP demo_in_progress Demo-Gauge.",
+        "# TYPE demo_in_progress gauge",
+        "demo_in_progress 1.0",
+        "# HELP demo_seconds Demo-Histogramm.",
+        "# TYPE demo_seconds histogram",
+        'demo_seconds_bucket{stage="sync",le="0.1"} 2',
+        'demo_seconds_bucket{stage="sync",le="1.0"} 3',
+        'demo_seconds_bucket{stage="sync",le="+Inf"} 4',
+        'demo_seconds_sum{stage="sync"} 3.65',
+        'demo_seconds_count{stage="sync"} 4',
+    ]
+
+
+def test_instrumented_store_records_durations_and_errors(tmp_path: Path) -> None:
+    metrics = AppMetrics()
+    inner = AsyncSqliteStore(SqliteStore(tmp_path / "state.db"))
+    store = instrument_store(inner, metrics)
+
+    async def scenario() -> None:
+        await store.get_telegram_offset()
+        await store.get_telegram_offset()
+        inner.close()
+        with pytest.raises(RuntimeError):
+            await store.get_call_context("call-1")
+
+    asyncio.run(scenario())
+
+    assert metrics.store_duration.count("get_telegram_offset") == 2
+    assert metrics.store_errors.value("get_call_context") == 1
+    assert metrics.store_errors.value("get_telegram_offset") == 0
+    # Synchronous attributes pass through unwrapped.
+    assert store.call_context_cache is None
@@ -0,0 +1,119 @@
+import asyncio
+import importlib
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from ai_messenger_voicemail.models import ChatSummary, InboundMessage
+from ai_messenger_voicemail.postgres_store import PostgresStore
+from ai_messenger_voicemail.store import TELEGRAM_POLLER_LEASE, LeaseLostError
+
+# CI sets POSTGRES_TESTS_REQUIRED so a missing driver or DSN fails the job
+# instead of silently skipping it.
+REQUIRED = os.environ.get("POSTGRES_TESTS_REQUIRED") == "1"
+asyncpg = importlib.import_module("asyncpg") if REQUIRED else pytest.importorskip("asyncpg")
+
+DSN = os.environ.get("TEST_DATABASE_URL")
+if REQUIRED and not DSN:
+    raise RuntimeError("POSTGRES_TESTS_REQUIRED=1, aber TEST_DATABASE_URL ist nicht gesetzt")
+pytestmark = pytest.mark.skipif(not DSN, reason="TEST_DATABASE_URL nicht gesetzt")
+
+
+async def _with_store(scenario) -> None:
+    # Each test runs in its own schema so it never touches existing tables.
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    admin = await asyncpg.connect(DSN)
+    await admin.execute(f"CREATE SCHEMA {schema}")
+    store = PostgresStore(DSN, max_pool_size=4, server_settings={"search_path": schema})
+    try:
+        await scenario(store)
+    finally:
+        await store.aclose()
+        await admin.execute(f"DROP SCHEMA {schema} CASCADE")
+        await admin.close()
+
+
+def _inbound(update_id: int, chat_id: int = 100) -> InboundMessage:
+    return InboundMessage(
+        telegram_update_id=update_id,
+        chat_id=chat_id,
+        sender="alice",
+        timestamp=datetime(2025, 2, 19, 11, 0, tzinfo=timezone.utc) + timedelta(minutes=update_id),
+        text=f"Nachricht {update_id}",
+    )
+
+
+def test_messages_offset_and_summaries_roundtrip() -> None:
+    async def scenario(store: PostgresStore) -> None:
+        assert await store.store_messages([_inbound(1), _inbound(2), _inbound(2)], telegram_offset=3) == 2
+        assert await store.store_messages([_inbound(2)], telegram_offset=1) == 0
+        assert await store.get_telegram_offset() == 3
+
+        unread = await store.list_unread_messages(limit=10)
+        assert [msg.telegram_update_id for msg in unread] == [2, 1]
+        assert await store.list_unread_chat_ids() == [100]
+
+        await store.save_chat_summary(ChatSummary(100, "neu", last_message_id=unread[0].id, message_count=2))
+        await store.save_chat_summary(ChatSummary(100, "alt", last_message_id=unread[1].id, message_count=1))
+        assert (await store.get_chat_summaries([100]))[100].summary == "neu"
+
+        await store.mark_chat_messages_read(100, up_to_id=unread[0].id)
+        assert await store.list_unread_messages(limit=10) == []
+        assert await store.get_chat_summaries([100]) == {}
+
+    asyncio.run(_with_store(scenario))
+
+
+def test_call_context_and_poller_lease() -> None:
+    async def scenario(store: PostgresStore) -> None:
+        await store.store_messages([_inbound(1)])
+        messages = await store.list_unread_messages(limit=10)
+        await store.save_call_context("call-pg", "summary", messages)
+        assert await store.append_conversation_turn("call-pg", "caller", "frage") is True
+        assert await store.append_conversation_turn("missing", "caller", "frage") is False
+
+        context = await store.get_call_context("call-pg")
+        assert context is not None
+        assert context.messages == messages
+        assert [turn.text for turn in context.conversation] == ["frage"]
+        assert await store.cleanup_stale_call_contexts(ttl_minutes=-1, batch_size=1) == 1
+        assert await store.call_context_retention() == (0, None)
+
+        assert await store.acquire_lease(TELEGRAM_POLLER_LEASE, "worker-a", ttl_seconds=30) == 1
+        assert await store.acquire_lease(TELEGRAM_POLLER_LEASE, "worker-a", ttl_seconds=30) == 1
+        assert await store.acquire_lease(TELEGRAM_POLLER_LEASE, "worker-b", ttl_seconds=30) is None
+        await store.release_lease(TELEGRAM_POLLER_LEASE, "worker-a")
+        assert await store.acquire_lease(TELEGRAM_POLLER_LEASE, "worker-b", ttl_seconds=30) == 2
+        with pytest.raises(LeaseLostError):
+            await store.store_messages([_inbound(5)], telegram_offset=5, fencing_token=1)
+        assert await store.store_messages([_inbound(5)], telegram_offset=5, fencing_token=2) == 1
+
+    asyncio.run(_with_store(scenario))
+
+
+def test_webhook_responses_keep_the_first_writer() -> None:
+    async def scenario(store: PostgresStore) -> None:
+        assert await store.get_webhook_response("call-1", "followup", "hash") is None
+        assert await store.save_webhook_response("call-1", "followup", "hash", "<a/>") == "<a/>"
+        assert await store.save_webhook_response("call-1", "followup", "hash", "<b/>") == "<a/>"
+        assert await store.get_webhook_response("call-1", "followup", "hash") == "<a/>"
+        assert await store.cleanup_stale_call_contexts(ttl_minutes=-1) == 0
+        assert await store.get_webhook_response("call-1", "followup", "hash") is None
+
+    asyncio.run(_with_store(scenario))
+
+
+def test_chat_unread_index_serves_newest_first_reads() -> None:
+    async def scenario(store: PostgresStore) -> None:
+        await store.store_messages([_inbound(1)], telegram_offset=2)
+        pool = await store._get_pool()  # noqa: SLF001
+        rows = await pool.fetch(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = 'messages'"
+        )
+        indexes = {row["indexname"]: row["indexdef"] for row in rows}
+        assert "idx_messages_unread_chat_ts" not in indexes
+        assert "(chat_id, ts DESC, id DESC) WHERE (NOT is_read)" in indexes["idx_messages_unread_chat_recent"]
+
+    asyncio.run(_with_store(scenario))
@@ -1,7 +1,22 @@
+import asyncio
+import json
+import sqlite3
+import threading
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
-from ai_messenger_voicemail.store import SqliteStore
+import pytest
+
+from ai_messenger_voicemail.models import CallContext, InboundMessage
+from ai_messenger_voicemail.services.call_context_sweeper import CallContextSweeper
+from ai_messenger_voicemail.store import (
+    TELEGRAM_POLLER_LEASE,
+    AsyncSqliteStore,
+    CallContextCache,
+    LeaseLostError,
+    SqliteStore,
+    call_preparation_lease,
+)
 
 
 def test_store_message_and_mark_read(tmp_path: Path) -> None:
@@ -55,8 +70,367 @@ def test_call_context_roundtrip_and_cleanup(tmp_path: Path) -> None:
 
     stale = now - timedelta(minutes=400)
     with store._conn() as conn:  # noqa: SLF001 - test-only direct update
-        conn.execute("UPDATE call_contexts SET created_at = ? WHERE call_sid = ?", (stale.isoformat(), "call-x"))
+        conn.execute("UPDATE call_contexts SET created_at = ? WHERE call_sid = ?", (int(stale.timestamp()), "call-x"))
 
     removed = store.cleanup_stale_call_contexts(ttl_minutes=120)
     assert removed == 1
     assert store.get_call_context("call-x") is None
+    with store._conn() as conn:  # noqa: SLF001 - child rows go with the context
+        assert conn.execute("SELECT COUNT(*) FROM conversation_turns").fetchone()[0] == 0
+
+
+def test_pooled_store_reuses_tuned_connection(tmp_path: Path) -> None:
+    store = SqliteStore(tmp_path / "state.db", pooled=True)
+
+    with store._conn() as first, store._conn() as second:  # noqa: SLF001 - test-only access
+        assert first is second
+        assert first.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert first.execute("PRAGMA synchronous").fetchone()[0] == 1
+
+    store.store_message(
+        telegram_update_id=7,
+        chat_id=100,
+        sender="carol",
+        timestamp=datetime.now(timezone.utc),
+        text="Pooled",
+    )
+    store.set_telegram_offset(7)
+
+    reader = SqliteStore(tmp_path / "state.db")
+    assert reader.get_telegram_offset() == 7
+    assert [msg.text for msg in reader.list_unread_messages(limit=10)] == ["Pooled"]
+
+    store.close()
+    assert store.get_telegram_offset() == 7
+    store.close()
+
+
+def test_async_store_runs_off_the_event_loop(tmp_path: Path) -> None:
+    store = SqliteStore(tmp_path / "state.db", pooled=True)
+    async_store = AsyncSqliteStore(store, max_workers=2)
+    loop_thread = threading.get_ident()
+    worker_threads: set[int] = set()
+
+    original_ping = store.ping
+
+    def recording_ping() -> None:
+        worker_threads.add(threading.get_ident())
+        original_ping()
+
+    store.ping = recording_ping  # type: ignore[method-assign]
+
+    async def scenario() -> list[bool]:
+        now = datetime.now(timezone.utc)
+        inserted = await asyncio.gather(
+            *(
+                async_store.store_message(
+                    telegram_update_id=update_id,
+                    chat_id=100,
+                    sender="dave",
+                    timestamp=now,
+                    text=f"Nachricht {update_id}",
+                )
+                for update_id in range(1, 11)
+            )
+        )
+        await async_store.ping()
+        return inserted
+
+    inserted = asyncio.run(scenario())
+    assert all(inserted)
+    assert worker_threads and loop_thread not in worker_threads
+
+    unread = asyncio.run(async_store.list_unread_messages(limit=20))
+    assert len(unread) == 10
+    async_store.close()
+
+
+def test_legacy_database_is_migrated_to_integer_timestamps(tmp_path: Path) -> None:
+    db_path = tmp_path / "state.db"
+    with sqlite3.connect(db_path) as legacy:
+        legacy.execute(
+            """
+            CREATE TABLE messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                telegram_update_id INTEGER NOT NULL UNIQUE,
+                chat_id INTEGER NOT NULL,
+                sender TEXT NOT NULL,
+                ts TEXT NOT NULL,
+                text TEXT NOT NULL,
+                is_read INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        legacy.executemany(
+            "INSERT INTO messages(telegram_update_id, chat_id, sender, ts, text, is_read) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (1, 100, "alice", "2025-02-19T11:00:00+00:00", "alt", 0),
+                (2, 100, "bob", "2025-02-19T12:30:00.123456+01:00", "neu", 0),
+                (3, 100, "carol", "2025-02-19T13:00:00+00:00", "gelesen", 1),
+            ],
+        )
+    legacy.close()
+
+    store = SqliteStore(db_path)
+    unread = store.list_unread_messages(limit=10)
+
+    assert [msg.text for msg in unread] == ["neu", "alt"]
+    assert unread[0].timestamp == datetime(2025, 2, 19, 11, 30, tzinfo=timezone.utc)
+    with store._conn() as conn:  # noqa: SLF001 - test-only schema inspection
+        assert conn.execute("PRAGMA user_version").fetchone()[0] >= 1
+        assert conn.execute("SELECT typeof(ts) FROM messages LIMIT 1").fetchone()[0] == "integer"
+
+    # Re-opening must not re-run the migration.
+    assert len(SqliteStore(db_path).list_unread_messages(limit=10)) == 2
+
+
+def test_unread_query_uses_partial_index_without_sort(tmp_path: Path) -> None:
+    store = SqliteStore(tmp_path / "state.db")
+    with store._conn() as conn:  # noqa: SLF001 - test-only query plan inspection
+        for chat_filter in (False, True):
+            query = "SELECT id FROM messages WHERE is_read = 0"
+            params: list[object] = []
+            if chat_filter:
+                query += " AND chat_id = ?"
+                params.append(100)
+            query += " ORDER BY ts DESC, id DESC LIMIT ?"
+            params.append(8)
+            plan = " ".join(str(row["detail"]) for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params))
+            assert "idx_messages_unread" in plan
+            assert "TEMP B-TREE" not in plan
+
+
+def test_store_messages_batches_inserts_with_offset(tmp_path: Path) -> None:
+    store = SqliteStore(tmp_path / "state.db")
+    now = datetime.now(timezone.utc)
+    batch = [
+        InboundMessage(telegram_update_id=update_id, chat_id=100, sender="erin", timestamp=now, text=f"m{update_id}")
+        for update_id in (1, 2, 3)
+    ]
+
+    assert store.store_messages(batch, telegram_offset=3) == 3
+    assert store.store_messages(batch[1:], telegram_offset=3) == 0
+    assert store.get_telegram_offset() == 3
+    assert len(store.list_unread_messages(limit=10)) == 3
+
+
+def test_telegram_offset_never_moves_backwards(tmp_path: Path) -> None:
+    store = SqliteStore(tmp_path / "state.db")
+
+    store.set_telegram_offset(50)
+    store.set_telegram_offset(40)
+    store.store_messages([], telegram_offset=45)
+
+    assert store.get_telegram_offset() == 50
+
+
+def test_call_context_links_messages_and_appends_turns(tmp_path: Path) -> None:
+    store = SqliteStore(tmp_path / "state.db")
+    for update_id in (1, 2):
+        store.store_message(
+            telegram_update_id=update_id,
+            chat_id=100,
+            sender="bob",
+            timestamp=datetime.now(timezone.utc) + timedelta(seconds=update_id),
+            text=f"Text {update_id}",
+        )
+    messages = store.list_unread_messages(limit=10)
+    store.save_call_context("call-n", "summary", messages)
+
+    assert store.append_conversation_turn("call-n", role="caller", text="frage") is True
+    assert store.append_conversation_turn("missing", role="caller", text="frage") is False
+
+    context = store.get_call_context("call-n")
+    assert context is not None
+    assert context.messages == messages
+    assert [turn.text for turn in context.conversation] == ["frage"]
+    with store._conn() as conn:  # noqa: SLF001 - schema inspection
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(call_contexts)")}
+    assert columns == {"call_sid", "summary", "created_at"}
+
+
+def test_legacy_call_context_blobs_are_normalized(tmp_path: Path) -> None:
+    db_path = tmp_path / "state.db"
+    now = datetime(2025, 2, 19, 11, 0, tzinfo=timezone.utc)
+    message = {
+        "id": 1,
+        "telegram_update_id": 10,
+        "chat_id": 100,
+        "sender": "alice",
+        "timestamp": now.isoformat(),
+        "text": "Hallo",
+    }
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "CREATE TABLE messages (id INTEGER PRIMARY KEY AUTOINCREMENT, telegram_update_id INTEGER NOT NULL UNIQUE,"
+            " chat_id INTEGER NOT NULL, sender TEXT NOT NULL, ts TEXT NOT NULL, text TEXT NOT NULL,"
+            " is_read INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("INSERT INTO messages VALUES (1, 10, 100, 'alice', ?, 'Hallo', 1)", (now.isoformat(),))
+        conn.execute(
+            "CREATE TABLE call_contexts (call_sid TEXT PRIMARY KEY, summary TEXT NOT NULL, messages_json TEXT NOT NULL,"
+            " conversation_json TEXT NOT NULL, created_at TEXT NOT NULL)"
+        )
+        conn.execute(
+            "INSERT INTO call_contexts VALUES ('call-old', 'alt', ?, ?, ?)",
+            (json.dumps([message]), json.dumps([{"role": "caller", "text": "wer?"}]), now.isoformat()),
+        )
+
+    context = SqliteStore(db_path).get_call_context("call-old")
+
+    assert context is not None
+    assert context.summary == "alt"
+    assert [(msg.id, msg.text, msg.timestamp) for msg in context.messages] == [(1, "Hallo", now)]
+    assert [(turn.role, turn.text) for turn in context.conversation] == [("caller", "wer?")]
+
+
+def test_call_context_cache_serves_followups_without_disk_reads(tmp_path: Path) -> None:
+    store = SqliteStore(tmp_path / "state.db")
+    store.store_message(
+        telegram_update_id=1,
+        chat_id=100,
+        sender="bob",
+        timestamp=datetime.now(timezone.utc),
+        text="Hallo",
+    )
+    messages = store.list_unread_messages(limit=10)
+    cache = CallContextCache(max_entries=1, ttl_minutes=60)
+    async_store = AsyncSqliteStore(store, call_context_cache=cache)
+    disk_reads: list[str] = []
+    original_get = store.get_call_context
+    store.get_call_context = lambda call_sid: disk_reads.append(call_sid) or original_get(call_sid)  # type: ignore[method-assign]
+
+    async def scenario() -> tuple:
+        await async_store.save_call_context("call-a", "summary", messages)
+        before = await async_store.get_call_context("call-a")
+        await async_store.append_conversation_turn("call-a", role="caller", text="frage")
+        after = await async_store.get_call_context("call-a")
+        await async_store.save_call_context("call-b", "andere", messages)
+        evicted = await async_store.get_call_context("call-a")
+        return before, after, evicted
+
+    before, after, evicted = asyncio.run(scenario())
+    async_store.close()
+
+    assert before is not None and before.conversation == []
+    assert after is not None and [turn.text for turn in after.conversation] == ["frage"]
+    assert evicted is not None and evicted.conversation == after.conversation
+    assert disk_reads == ["call-a"]
+    assert cache.stats() == {"entries": 1, "hits": 2, "misses": 1, "evictions": 2, "stale": 0}
+
+
+def test_call_context_cache_sees_turns_appended_by_another_worker(tmp_path: Path) -> None:
+    store = SqliteStore(tmp_path / "state.db")
+    store.store_message(
+        telegram_update_id=1,
+        chat_id=100,
+        sender="bob",
+        timestamp=datetime.now(timezone.utc),
+        text="Hallo",
+    )
+    messages = store.list_unread_messages(limit=10)
+    cache = CallContextCache(max_entries=4, ttl_minutes=60)
+    worker_a = AsyncSqliteStore(store, call_context_cache=cache)
+    # A second uvicorn worker: same database file, its own cache.
+    worker_b = AsyncSqliteStore(
+        SqliteStore(tmp_path / "state.db"),
+        call_context_cache=CallContextCache(max_entries=4, ttl_minutes=60),
+    )
+
+    async def scenario() -> tuple:
+        await worker_a.save_call_context("call-a", "summary", messages)
+        cached = await worker_a.get_call_context("call-a")
+        await worker_b.append_conversation_turn("call-a", role="caller", text="frage")
+        await worker_b.append_conversation_turn("call-a", role="assistant", text="antwort")
+        refreshed = await worker_a.get_call_context("call-a")
+        again = await worker_a.get_call_context("call-a")
+        return cached, refreshed, again
+
+    cached, refreshed, again = asyncio.run(scenario())
+    worker_a.close()
+    worker_b.close()
+
+    assert cached is not None and cached.conversation == []
+    assert refreshed is not None and [turn.text for turn in refreshed.conversation] == ["frage", "antwort"]
+    assert again is refreshed
+    assert cache.stats() == {"entries": 1, "hits": 2, "misses": 1, "evictions": 0, "stale": 1}
+
+
+def test_call_context_cache_honours_ttl() -> None:
+    cache = CallContextCache(max_entries=4, ttl_minutes=5)
+    stale = CallContext(
+        call_sid="call-old",
+        summary="s",
+        messages=[],
+        conversation=[],
+        created_at=datetime.now(timezone.utc) - timedelta(minutes=6),
+    )
+    cache.put(stale)
+
+    assert cache.get("call-old") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_stale_call_contexts_are_swept_in_batches(tmp_path: Path) -> None:
+    store = SqliteStore(tmp_path / "state.db")
+    for index in range(5):
+        store.save_call_context(f"call-{index}", "summary", [])
+    stale = int((datetime.now(timezone.utc) - timedelta(minutes=400)).timestamp())
+    with store._conn() as conn:  # noqa: SLF001 - test-only direct update
+        conn.execute("UPDATE call_contexts SET created_at = ? WHERE call_sid != 'call-4'", (stale,))
+        plan = " ".join(
+            row["detail"]
+            for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT call_sid FROM call_contexts WHERE created_at < ? ORDER BY created_at LIMIT 2",
+                (0,),
+            )
+        )
+    for index in range(3):
+        store.save_webhook_response(f"call-{index}", "followup", "hash", "<Response />")
+    with store._conn() as conn:  # noqa: SLF001 - test-only direct update
+        conn.execute("UPDATE webhook_responses SET created_at = ? WHERE call_sid != 'call-2'", (stale,))
+    async_store = AsyncSqliteStore(store)
+    sweeper = CallContextSweeper(async_store, ttl_minutes=120, interval_seconds=60, batch_size=2)
+
+    removed = asyncio.run(sweeper.sweep())
+    stats = asyncio.run(sweeper.stats())
+    async_store.close()
+
+    assert "idx_call_contexts_created_at" in plan
+    assert removed == 4
+    assert stats["removed_total"] == 4
+    assert stats["retained_contexts"] == 1
+    assert stats["oldest_context_age_seconds"] < 60
+    assert store.get_webhook_response("call-0", "followup", "hash") is None
+    assert store.get_webhook_response("call-2", "followup", "hash") == "<Response />"
+
+
+def test_poller_lease_fencing_tokens(tmp_path: Path) -> None:
+    store = SqliteStore(tmp_path / "state.db")
+
+    assert store.acquire_lease(TELEGRAM_POLLER_LEASE, "a", ttl_seconds=30) == 1
+    assert store.acquire_lease(TELEGRAM_POLLER_LEASE, "a", ttl_seconds=30) == 1
+    assert store.acquire_lease(TELEGRAM_POLLER_LEASE, "b", ttl_seconds=30) is None
+    assert store.acquire_lease(TELEGRAM_POLLER_LEASE, "a", ttl_seconds=-1) == 1
+    assert store.acquire_lease(TELEGRAM_POLLER_LEASE, "b", ttl_seconds=30) == 2
+
+    message = InboundMessage(7, 100, "alice", datetime.now(timezone.utc), "Hallo")
+    with pytest.raises(LeaseLostError):
+        store.store_messages([message], telegram_offset=7, fencing_token=1)
+    assert store.get_telegram_offset() == 0
+    assert store.store_messages([message], telegram_offset=7, fencing_token=2) == 1
+    assert store.get_telegram_offset() == 7
+
+
+def test_cleanup_drops_expired_call_preparation_claims_only(tmp_path: Path) -> None:
+    store = SqliteStore(tmp_path / "state.db")
+    assert store.acquire_lease(call_preparation_lease("old-call"), "a", ttl_seconds=-3 * 3600) == 1
+    assert store.acquire_lease(call_preparation_lease("live-call"), "a", ttl_seconds=30) == 1
+    assert store.acquire_lease(TELEGRAM_POLLER_LEASE, "a", ttl_seconds=-3 * 3600) == 1
+
+    store.cleanup_stale_call_contexts(ttl_minutes=60)
+
+    assert store.acquire_lease(call_preparation_lease("old-call"), "b", ttl_seconds=30) == 1
+    assert store.acquire_lease(call_preparation_lease("live-call"), "b", ttl_seconds=30) is None
+    # The poller lease keeps its row, so fencing tokens keep growing.
+    assert store.acquire_lease(TELEGRAM_POLLER_LEASE, "b", ttl_seconds=30) == 2
@@ -0,0 +1,145 @@
+import asyncio
+from datetime import datetime, timezone
+from pathlib import Path
+
+from ai_messenger_voicemail.config import Settings
+from ai_messenger_voicemail.metrics import AppMetrics
+from ai_messenger_voicemail.models import TelegramMessage
+from ai_messenger_voicemail.services.llm_service import LLMService, LLMUnavailableError
+from ai_messenger_voicemail.services.summary_service import IncrementalSummarizer, SummaryPrecomputer
+from ai_messenger_voicemail.store import AsyncSqliteStore, SqliteStore
+
+
+class _RecordingLLM(LLMService):
+    def __init__(self, settings: Settings, *, fail: bool = False) -> None:
+        super().__init__(settings)
+        self.calls: list[tuple[list[int], bool]] = []
+        self.merges: list[tuple[int, bool]] = []
+        self._fail = fail
+
+    async def summarize_messages(self, messages: list[TelegramMessage], *, allow_fallback: bool = True) -> str:
+        self.calls.append(([msg.id for msg in messages], allow_fallback))
+        if self._fail and not allow_fallback:
+            raise LLMUnavailableError("offline")
+        return f"Zusammenfassung von {len(messages)} Nachrichten"
+
+    async def summarize_chunk(self, messages: list[TelegramMessage]) -> str:
+        self.calls.append(([msg.id for msg in messages], False))
+        return f"[{messages[0].id}-{messages[-1].id}]"
+
+    async def merge_summaries(self, partials: list[str], *, final: bool = False) -> str:
+        self.merges.append((len(partials), final))
+        return "+".join(partials)
+
+
+def _settings(tmp_path: Path) -> Settings:
+    return Settings(
+        _env_file=None,
+        sqlite_path=tmp_path / "state.db",
+        openai_api_key=None,
+        telegram_bot_token=None,
+        twilio_validate_signature=False,
+    )
+
+
+def _store_message(store: SqliteStore, update_id: int, chat_id: int = 555) -> None:
+    store.store_message(
+        telegram_update_id=update_id,
+        chat_id=chat_id,
+        sender="alice",
+        timestamp=datetime.now(timezone.utc),
+        text=f"Nachricht {update_id}",
+    )
+
+
+async def _settle(precomputer: SummaryPrecomputer) -> None:
+    precomputer.schedule()
+    for _ in range(100):
+        if precomputer.stats()["refreshes"] or precomputer._task is None or precomputer._task.done():  # noqa: SLF001
+            break
+        await asyncio.sleep(0.01)
+    await precomputer.stop()
+
+
+def test_precomputed_summary_is_served_until_unread_set_changes(tmp_path: Path) -> None:
+    settings = _settings(tmp_path)
+    store = SqliteStore(settings.sqlite_path)
+    async_store = AsyncSqliteStore(store)
+    llm = _RecordingLLM(settings)
+    precomputer = SummaryPrecomputer(settings, async_store, llm)
+    _store_message(store, 1)
+    _store_message(store, 2)
+
+    async def scenario() -> tuple[str, str]:
+        await _settle(precomputer)
+        unread = await async_store.list_unread_messages(limit=settings.max_messages_per_call)
+        cached = await precomputer.get_summary(unread)
+        _store_message(store, 3)
+        changed = await async_store.list_unread_messages(limit=settings.max_messages_per_call)
+        fresh = await precomputer.get_summary(changed)
+        return cached, fresh
+
+    cached, fresh = asyncio.run(scenario())
+
+    assert cached == "Zusammenfassung von 2 Nachrichten"
+    assert fresh == "Zusammenfassung von 3 Nachrichten"
+    assert precomputer.stats() == {"hits": 1, "misses": 1, "refreshes": 1}
+    assert [allow_fallback for _, allow_fallback in llm.calls] == [False, True]
+
+
+def test_fallback_summaries_are_not_precomputed(tmp_path: Path) -> None:
+    settings = _settings(tmp_path)
+    store = SqliteStore(settings.sqlite_path)
+    async_store = AsyncSqliteStore(store)
+    precomputer = SummaryPrecomputer(settings, async_store, _RecordingLLM(settings, fail=True))
+    _store_message(store, 1)
+
+    asyncio.run(_settle(precomputer))
+
+    assert precomputer.stats()["refreshes"] == 0
+
+
+def test_no_api_key_precomputes_nothing_with_the_real_service(tmp_path: Path) -> None:
+    settings = _settings(tmp_path)
+    store = SqliteStore(settings.sqlite_path)
+    metrics = AppMetrics()
+    precomputer = SummaryPrecomputer(settings, AsyncSqliteStore(store), LLMService(settings, metrics=metrics))
+    _store_message(store, 1)
+
+    asyncio.run(_settle(precomputer))
+
+    assert precomputer.stats()["refreshes"] == 0
+    assert store.get_precomputed_summary(precomputer._cache_key(store.list_unread_messages(limit=8))) is None  # noqa: SLF001
+    assert metrics.llm_fallbacks.value("summary") == 0
+
+
+def test_incremental_summaries_stay_bounded_for_large_backlogs(tmp_path: Path) -> None:
+    settings = _settings(tmp_path).model_copy(
+        update={"summary_mode": "incremental", "summary_chunk_size": 10, "summary_merge_fan_in": 3}
+    )
+    store = SqliteStore(settings.sqlite_path)
+    async_store = AsyncSqliteStore(store)
+    llm = _RecordingLLM(settings)
+    summarizer = IncrementalSummarizer(settings, async_store, llm)
+    for update_id in range(1, 46):
+        _store_message(store, update_id)
+    _store_message(store, 100, chat_id=777)
+
+    first = asyncio.run(summarizer.summarize_for_call())
+
+    assert first.message_count == 46
+    assert first.covered == {555: 45, 777: 46}
+    assert max(len(ids) for ids, _ in llm.calls) == 10
+    assert max(size for size, _ in llm.merges) <= 3
+    assert first.summary.endswith("[46-46]")
+
+    llm.calls.clear()
+    _store_message(store, 101)
+    second = asyncio.run(summarizer.summarize_for_call())
+
+    assert [ids for ids, _ in llm.calls] == [[47]]
+    assert second.covered == {555: 47, 777: 46}
+
+    asyncio.run(summarizer.mark_covered_read(second))
+    assert store.list_unread_messages(limit=100) == []
+    assert store.get_chat_summaries([555, 777]) == {}
@@ -1,12 +1,15 @@
 import asyncio
+import json as jsonlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 
+import httpx
 import pytest
 
 from ai_messenger_voicemail.config import Settings
-from ai_messenger_voicemail.services import telegram_service as telegram_module
-from ai_messenger_voicemail.services.telegram_service import TelegramService
-from ai_messenger_voicemail.store import SqliteStore
+from ai_messenger_voicemail.services.telegram_service import TelegramIngestionWorker, TelegramService
+from ai_messenger_voicemail.store import TELEGRAM_POLLER_LEASE, AsyncSqliteStore, SqliteStore
 
 
 class _DummyResponse:
@@ -21,18 +24,17 @@ class _DummyResponse:
 
 
 class _DummyClient:
-    def __init__(self, responses: list[dict], **_: object) -> None:
+    def __init__(self, responses: list[dict], payloads: list[dict] | None = None, **_: object) -> None:
         self._responses = responses
+        self._payloads = payloads if payloads is not None else []
 
-    async def __aenter__(self):
-        return self
-
-    async def __aexit__(self, exc_type, exc, tb):  # noqa: ANN001
-        return False
+    async def aclose(self) -> None:
+        return None
 
-    async def post(self, url: str, json: dict):  # noqa: A002
+    async def post(self, url: str, json: dict, **_: object):  # noqa: A002
         assert url.endswith("/getUpdates")
         assert "offset" in json
+        self._payloads.append(json)
         if not self._responses:
             return _DummyResponse({"ok": True, "result": []})
         return _DummyResponse(self._responses.pop(0))
@@ -68,7 +70,7 @@ def test_sync_updates_stores_new_messages(monkeypatch: pytest.MonkeyPatch, tmp_p
     ]
 
     monkeypatch.setattr(
-        telegram_module.httpx,
+        httpx,
         "AsyncClient",
         lambda **kwargs: _DummyClient(responses, **kwargs),
     )
@@ -82,7 +84,7 @@ def test_sync_updates_stores_new_messages(monkeypatch: pytest.MonkeyPatch, tmp_p
         twilio_validate_signature=False,
     )
     store = SqliteStore(tmp_path / "state.db")
-    service = TelegramService(settings, store)
+    service = TelegramService(settings, AsyncSqliteStore(store))
 
     inserted = asyncio.run(service.sync_updates())
 
@@ -93,3 +95,437 @@ def test_sync_updates_stores_new_messages(monkeypatch: pytest.MonkeyPatch, tmp_p
     else:
         assert len(unread) == 1
     assert store.get_telegram_offset() == 11
+
+
+def test_sync_updates_commits_offset_per_page(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    responses = [
+        {
+            "ok": True,
+            "result": [
+                {
+                    "update_id": 20,
+                    "message": {
+                        "date": 1739962800,
+                        "text": "Seite eins",
+                        "chat": {"id": 555},
+                        "from": {"username": "alice"},
+                    },
+                },
+                {"update_id": 21, "edited_message": {"text": "ignoriert"}},
+            ],
+        },
+        {"ok": False, "description": "Bad Gateway"},
+    ]
+
+    monkeypatch.setattr(
+        httpx,
+        "AsyncClient",
+        lambda **kwargs: _DummyClient(responses, **kwargs),
+    )
+
+    settings = Settings(
+        _env_file=None,
+        sqlite_path=tmp_path / "state.db",
+        telegram_bot_token="token",
+        openai_api_key=None,
+        twilio_validate_signature=False,
+    )
+    store = SqliteStore(tmp_path / "state.db")
+    service = TelegramService(settings, AsyncSqliteStore(store))
+
+    with pytest.raises(RuntimeError, match="Bad Gateway"):
+        asyncio.run(service.sync_updates())
+
+    assert [msg.text for msg in store.list_unread_messages(limit=10)] == ["Seite eins"]
+    assert store.get_telegram_offset() == 21
+
+
+def test_ingestion_worker_long_polls_in_background(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    responses = [
+        {
+            "ok": True,
+            "result": [
+                {
+                    "update_id": 30,
+                    "message": {
+                        "date": 1739962800,
+                        "text": "Aus dem Hintergrund",
+                        "chat": {"id": 555},
+                        "from": {"username": "alice"},
+                    },
+                },
+            ],
+        },
+    ]
+    payloads: list[dict] = []
+    monkeypatch.setattr(
+        httpx,
+        "AsyncClient",
+        lambda **kwargs: _DummyClient(responses, payloads, **kwargs),
+    )
+
+    settings = Settings(
+        _env_file=None,
+        sqlite_path=tmp_path / "state.db",
+        telegram_bot_token="token",
+        openai_api_key=None,
+        twilio_validate_signature=False,
+    )
+    store = SqliteStore(tmp_path / "state.db")
+    worker = TelegramIngestionWorker(TelegramService(settings, AsyncSqliteStore(store)), poll_timeout_seconds=25)
+
+    async def scenario() -> tuple[bool, bool]:
+        fresh_before_start = worker.is_fresh(60)
+        worker.start()
+        for _ in range(200):
+            if worker.is_fresh(60):
+                break
+            await asyncio.sleep(0.01)
+        fresh_while_running = worker.is_fresh(60)
+        await worker.stop()
+        return fresh_before_start, fresh_while_running
+
+    fresh_before_start, fresh_while_running = asyncio.run(scenario())
+
+    assert fresh_before_start is False
+    assert fresh_while_running is True
+    assert worker.is_fresh(60) is False
+    assert payloads[0]["timeout"] == 25
+    assert [msg.text for msg in store.list_unread_messages(limit=10)] == ["Aus dem Hintergrund"]
+
+
+class _EmptyUpdatesHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:  # noqa: N802
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = jsonlib.dumps({"ok": True, "result": []}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        return None
+
+
+def test_sync_updates_reuses_shared_http_connection(tmp_path: Path) -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _EmptyUpdatesHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        settings = Settings(
+            _env_file=None,
+            sqlite_path=tmp_path / "state.db",
+            telegram_bot_token="token",
+            telegram_api_base_url=f"http://127.0.0.1:{server.server_port}",
+            openai_api_key=None,
+            twilio_validate_signature=False,
+        )
+        service = TelegramService(settings, AsyncSqliteStore(SqliteStore(tmp_path / "state.db")))
+
+        async def scenario() -> None:
+            for _ in range(3):
+                await service.sync_updates()
+            await service.aclose()
+
+        asyncio.run(scenario())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    stats = service.pool_stats()
+    assert stats["requests"] == 3
+    assert stats["connections_opened"] == 1
+    assert stats["reuse_ratio"] == round(2 / 3, 4)
+
+
+def test_concurrent_syncs_share_one_fetch(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    responses = [
+        {
+            "ok": True,
+            "result": [
+                {
+                    "update_id": 40,
+                    "message": {
+                        "date": 1739962800,
+                        "text": "Einmal abgeholt",
+                        "chat": {"id": 555},
+                        "from": {"username": "alice"},
+                    },
+                },
+            ],
+        },
+    ]
+    payloads: list[dict] = []
+    monkeypatch.setattr(
+        httpx,
+        "AsyncClient",
+        lambda **kwargs: _DummyClient(responses, payloads, **kwargs),
+    )
+    settings = Settings(
+        _env_file=None,
+        sqlite_path=tmp_path / "state.db",
+        telegram_bot_token="token",
+        openai_api_key=None,
+        twilio_validate_signature=False,
+    )
+    store = SqliteStore(tmp_path / "state.db")
+    service = TelegramService(settings, AsyncSqliteStore(store))
+
+    async def scenario() -> list[int]:
+        return await asyncio.gather(*(service.sync_updates() for _ in range(5)))
+
+    results = asyncio.run(scenario())
+
+    assert results == [1, 1, 1, 1, 1]
+    assert len(payloads) == 2
+    assert store.get_telegram_offset() == 40
+
+
+def test_sync_is_skipped_while_another_process_holds_the_lease(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    payloads: list[dict] = []
+    monkeypatch.setattr(
+        httpx,
+        "AsyncClient",
+        lambda **kwargs: _DummyClient([], payloads, **kwargs),
+    )
+    settings = Settings(
+        _env_file=None,
+        sqlite_path=tmp_path / "state.db",
+        telegram_bot_token="token",
+        openai_api_key=None,
+        twilio_validate_signature=False,
+    )
+    store = SqliteStore(tmp_path / "state.db")
+    assert store.acquire_lease(TELEGRAM_POLLER_LEASE, "other-worker", ttl_seconds=30) == 1
+    service = TelegramService(settings, AsyncSqliteStore(store))
+
+    assert asyncio.run(service.try_sync_updates()) is None
+    assert payloads == []
+
+    store.release_lease(TELEGRAM_POLLER_LEASE, "other-worker")
+    assert asyncio.run(service.try_sync_updates()) == 0
+    assert len(payloads) == 1
+    assert service.lease_stats() == {"is_leader": True, "fencing_token": 2}
+    # The leader keeps its lease between syncs; others stay out until it expires.
+    assert store.acquire_lease(TELEGRAM_POLLER_LEASE, "other-worker", ttl_seconds=30) is None
+
+
+def test_offset_write_is_fenced_after_lease_takeover(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    update = {
+        "update_id": 50,
+        "message": {"date": 1739962800, "text": "Hallo", "chat": {"id": 555}, "from": {"username": "alice"}},
+    }
+    monkeypatch.setattr(
+        httpx,
+        "AsyncClient",
+        lambda **kwargs: _DummyClient([{"ok": True, "result": [update]}], **kwargs),
+    )
+    settings = Settings(
+        _env_file=None,
+        sqlite_path=tmp_path / "state.db",
+        telegram_bot_token="token",
+        openai_api_key=None,
+        twilio_validate_signature=False,
+    )
+    store = SqliteStore(tmp_path / "state.db")
+
+    class _TakeoverStore(AsyncSqliteStore):
+        async def store_messages(self, messages, **kwargs):  # type: ignore[no-untyped-def]
+            # Simulates a stalled leader: its lease expires and another worker takes over
+            # before the page is written.
+            store.release_lease(TELEGRAM_POLLER_LEASE, service._holder_id)  # noqa: SLF001
+            assert store.acquire_lease(TELEGRAM_POLLER_LEASE, "other-worker", ttl_seconds=30) == 2
+            return await super().store_messages(messages, **kwargs)
+
+    service = TelegramService(settings, _TakeoverStore(store))
+
+    assert asyncio.run(service.try_sync_updates()) is None
+    assert store.get_telegram_offset() == 0
+    assert store.list_unread_messages(limit=10) == []
+    assert service.lease_stats()["is_leader"] is False
+
+
+class _EndlessClient:
+    """Returns a fresh page for every request, like a chat under steady inflow."""
+
+    def __init__(self, payloads: list[dict], gate: asyncio.Event | None = None, **_: object) -> None:
+        self._payloads = payloads
+        self._gate = gate
+
+    async def aclose(self) -> None:
+        return None
+
+    async def post(self, url: str, json: dict, **_: object):  # noqa: A002
+        self._payloads.append(json)
+        if self._gate is not None and len(self._payloads) > 1:
+            await self._gate.wait()
+        update_id = json["offset"]
+        return _DummyResponse(
+            {
+                "ok": True,
+                "result": [
+                    {
+                        "update_id": update_id,
+                        "message": {
+                            "date": 1739962800,
+                            "text": f"Nachricht {update_id}",
+                            "chat": {"id": 555},
+                            "from": {"username": "alice"},
+                        },
+                    }
+                ],
+            }
+        )
+
+
+def test_sync_stops_at_page_cap_under_steady_inflow(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    payloads: list[dict] = []
+    monkeypatch.setattr(httpx, "AsyncClient", lambda **kwargs: _EndlessClient(payloads, **kwargs))
+    settings = Settings(
+        _env_file=None,
+        sqlite_path=tmp_path / "state.db",
+        telegram_bot_token="token",
+        telegram_sync_max_pages=3,
+        openai_api_key=None,
+        twilio_validate_signature=False,
+    )
+    store = SqliteStore(tmp_path / "state.db")
+    service = TelegramService(settings, AsyncSqliteStore(store))
+
+    assert asyncio.run(service.sync_updates()) == 3
+    assert len(payloads) == 3
+    assert store.get_telegram_offset() == 3
+    assert service.last_page_at is not None
+
+
+def test_worker_is_fresh_while_a_sync_is_still_paging(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    payloads: list[dict] = []
+    settings = Settings(
+        _env_file=None,
+        sqlite_path=tmp_path / "state.db",
+        telegram_bot_token="token",
+        openai_api_key=None,
+        twilio_validate_signature=False,
+    )
+    store = SqliteStore(tmp_path / "state.db")
+    worker = TelegramIngestionWorker(TelegramService(settings, AsyncSqliteStore(store)), poll_timeout_seconds=25)
+
+    async def scenario() -> bool:
+        gate = asyncio.Event()
+        monkeypatch.setattr(httpx, "AsyncClient", lambda **kwargs: _EndlessClient(payloads, gate, **kwargs))
+        worker.start()
+        for _ in range(200):
+            if len(payloads) > 1:
+                break
+            await asyncio.sleep(0.01)
+        # The first page is stored, the second request is still pending.
+        fresh = worker.is_fresh(60)
+        gate.set()
+        await worker.stop()
+        return fresh
+
+    assert asyncio.run(scenario()) is True
+    assert len(payloads) >= 2
+
+
+class _ConcurrencyTrackingClient:
+    def __init__(self, responses: list[dict], payloads: list[dict], **_: object) -> None:
+        self._responses = responses
+        self._payloads = payloads
+        self.active = 0
+        self.max_active = 0
+
+    async def aclose(self) -> None:
+        return None
+
+    async def post(self, url: str, json: dict, **_: object):  # noqa: A002
+        self._payloads.append(json)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(0.05)
+        finally:
+            self.active -= 1
+        return _DummyResponse(self._responses.pop(0) if self._responses else {"ok": True, "result": []})
+
+
+def _concurrency_scenario(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, responses: list[dict]
+) -> tuple[TelegramService, _ConcurrencyTrackingClient, list[dict]]:
+    payloads: list[dict] = []
+    client = _ConcurrencyTrackingClient(responses, payloads)
+    monkeypatch.setattr(httpx, "AsyncClient", lambda **_: client)
+    settings = Settings(
+        _env_file=None,
+        sqlite_path=tmp_path / "state.db",
+        telegram_bot_token="token",
+        openai_api_key=None,
+        twilio_validate_signature=False,
+    )
+    service = TelegramService(settings, AsyncSqliteStore(SqliteStore(tmp_path / "state.db")))
+    return service, client, payloads
+
+
+def test_inline_sync_does_not_run_next_to_a_waiting_long_poll(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    service, client, payloads = _concurrency_scenario(monkeypatch, tmp_path, [])
+
+    async def scenario() -> list[int | None]:
+        long_poll = asyncio.create_task(service.try_sync_updates(poll_timeout=25))
+        await asyncio.sleep(0.01)
+        inline = await service.sync_updates()
+        return [inline, await long_poll]
+
+    # Telegram answers a waiting long poll as soon as an update arrives, so
+    # the inline caller has nothing to fetch.
+    assert asyncio.run(scenario()) == [0, 0]
+    assert client.max_active == 1
+    assert [payload["timeout"] for payload in payloads] == [25]
+
+
+def test_long_poll_joins_a_running_inline_sync(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    update = {
+        "update_id": 60,
+        "message": {"date": 1739962800, "text": "Hallo", "chat": {"id": 555}, "from": {"username": "alice"}},
+    }
+    service, client, payloads = _concurrency_scenario(monkeypatch, tmp_path, [{"ok": True, "result": [update]}])
+
+    async def scenario() -> list[int | None]:
+        inline = asyncio.create_task(service.sync_updates())
+        await asyncio.sleep(0.01)
+        long_poll = await service.try_sync_updates(poll_timeout=25)
+        return [await inline, long_poll]
+
+    assert asyncio.run(scenario()) == [1, 1]
+    assert client.max_active == 1
+    assert [payload["timeout"] for payload in payloads] == [0, 0]
+
+
+def test_worker_pauses_between_empty_short_polls() -> None:
+    class _EmptyService:
+        last_page_at = None
+
+        def __init__(self) -> None:
+            self.calls = 0
+
+        async def try_sync_updates(self, *, poll_timeout: int) -> int:
+            self.calls += 1
+            return 0
+
+    service = _EmptyService()
+    worker = TelegramIngestionWorker(service, poll_timeout_seconds=0, idle_poll_seconds=0.05)
+
+    async def scenario() -> None:
+        worker.start()
+        await asyncio.sleep(0.2)
+        await worker.stop()
+
+    asyncio.run(scenario())
+
+    assert 1 <= service.calls <= 6
@@ -0,0 +1,134 @@
+import pytest
+from twilio.twiml.voice_response import Gather, VoiceResponse
+
+from ai_messenger_voicemail.config import Settings
+from ai_messenger_voicemail.services.voice_service import VoiceService
+
+
+class _SdkVoiceService:
+    """The VoiceService rendering before templates, kept as reference output."""
+
+    def __init__(self, settings: Settings) -> None:
+        self._settings = settings
+
+    def _say(self, node: VoiceResponse | Gather, text: str) -> None:
+        node.say(text, language=self._settings.twilio_language, voice=self._settings.twilio_voice)
+
+    def _gather(self, action_url: str) -> Gather:
+        return Gather(
+            input="speech",
+            action=action_url,
+            method="POST",
+            language=self._settings.twilio_language,
+            speech_timeout="auto",
+            timeout=5,
+        )
+
+    def incoming_response(self, *, summary: str, has_messages: bool, action_url: str, greet: bool = True) -> str:
+        response = VoiceResponse()
+        if has_messages:
+            if greet:
+                self._say(
+                    response,
+                    "Willkommen. Du hast ungelesene Nachrichten. Ich lese dir jetzt eine Zusammenfassung vor.",
+                )
+                response.pause(length=1)
+            self._say(response, summary)
+            gather = self._gather(action_url)
+            self._say(gather, "Du kannst jetzt Rueckfragen stellen, zum Beispiel: Erzaehl mir mehr ueber Nachricht 2.")
+            response.append(gather)
+            self._say(response, "Ich habe keine Rueckfrage gehoert. Auf Wiederhoeren.")
+            response.hangup()
+            return str(response)
+        self._say(response, summary)
+        self._say(response, "Auf Wiederhoeren.")
+        response.hangup()
+        return str(response)
+
+    def progressive_greeting_response(self, *, redirect_url: str, pause_seconds: int) -> str:
+        response = VoiceResponse()
+        self._say(response, "Willkommen. Ich rufe deine Nachrichten ab. Einen Moment bitte.")
+        response.pause(length=pause_seconds)
+        response.redirect(redirect_url, method="POST")
+        return str(response)
+
+    def wait_response(self, *, redirect_url: str, pause_seconds: int) -> str:
+        response = VoiceResponse()
+        response.pause(length=pause_seconds)
+        response.redirect(redirect_url, method="POST")
+        return str(response)
+
+    def followup_response(self, *, answer: str, action_url: str) -> str:
+        response = VoiceResponse()
+        self._say(response, answer)
+        gather = self._gather(action_url)
+        self._say(
+            gather,
+            "Wenn du noch etwas wissen willst, stelle jetzt eine weitere Frage. Sage Ende, um aufzulegen.",
+        )
+        response.append(gather)
+        self._say(response, "Keine weitere Eingabe erkannt. Auf Wiederhoeren.")
+        response.hangup()
+        return str(response)
+
+    def goodbye_response(self, text: str = "Alles klar. Auf Wiederhoeren.") -> str:
+        response = VoiceResponse()
+        self._say(response, text)
+        response.hangup()
+        return str(response)
+
+
+TEXTS = [
+    "Du hast 2 Nachrichten von Anna.",
+    "",
+    'Tom & Jerry schreiben: <b>"Gruesse"</b> > alles \'gut\'',
+    "Zeile eins\nZeile zwei\r\n\tEingerueckt",
+    "Übermorgen um 9 Uhr – Café ☕ 👍",
+]
+URLS = [
+    "https://example.org/twilio/voice/followup",
+    'https://example.org/f?a=1&b="2"&c=<3>',
+    "https://example.org/f?x=a\tb\nc\rd",
+    "",
+]
+
+
+@pytest.fixture(
+    params=[
+        {},
+        {"twilio_language": "en-US", "twilio_voice": "alice"},
+        {"twilio_language": 'de"DE', "twilio_voice": "Polly & <Vicki>"},
+        {"twilio_voice": ""},
+    ]
+)
+def services(request: pytest.FixtureRequest) -> tuple[VoiceService, _SdkVoiceService]:
+    settings = Settings(_env_file=None, **request.param)
+    return VoiceService(settings), _SdkVoiceService(settings)
+
+
+@pytest.mark.parametrize("text", TEXTS)
+@pytest.mark.parametrize("url", URLS)
+def test_templates_match_sdk_output_byte_for_byte(
+    services: tuple[VoiceService, _SdkVoiceService],
+    text: str,
+    url: str,
+) -> None:
+    templated, reference = services
+
+    for has_messages in (True, False):
+        for greet in (True, False):
+            kwargs = {"summary": text, "has_messages": has_messages, "action_url": url, "greet": greet}
+            assert templated.incoming_response(**kwargs).encode() == reference.incoming_response(**kwargs).encode()
+    assert (
+        templated.followup_response(answer=text, action_url=url).encode()
+        == reference.followup_response(answer=text, action_url=url).encode()
+    )
+    assert templated.goodbye_response(text).encode() == reference.goodbye_response(text).encode()
+    assert templated.goodbye_response().encode() == reference.goodbye_response().encode()
+    for pause_seconds in (1, 10):
+        assert templated.wait_response(redirect_url=url, pause_seconds=pause_seconds) == reference.wait_response(
+            redirect_url=url, pause_seconds=pause_seconds
+        )
+        assert templated.progressive_greeting_response(
+            redirect_url=url, pause_seconds=pause_seconds
+        ) == reference.progressive_greeting_response(redirect_url=url, pause_seconds=pause_seconds)
@@ -0,0 +1,110 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from ai_messenger_voicemail.services.webhook_idempotency import UncachedResponse, WebhookIdempotency
+from ai_messenger_voicemail.store import AsyncSqliteStore, SqliteStore
+
+
+@pytest.fixture
+def async_store(tmp_path: Path):
+    store = AsyncSqliteStore(SqliteStore(tmp_path / "state.db"))
+    yield store
+    store.close()
+
+
+def test_concurrent_duplicates_share_one_computation(async_store: AsyncSqliteStore) -> None:
+    calls = 0
+
+    async def render() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return f"<Response>{calls}</Response>"
+
+    async def scenario() -> list[str]:
+        idempotency = WebhookIdempotency(async_store)
+        form = [("CallSid", "call-1"), ("SpeechResult", "Nachricht 2")]
+        results = await asyncio.gather(*(idempotency.run("call-1", "followup", form, render) for _ in range(5)))
+        stats = idempotency.stats()
+        assert stats["computed"] == 1
+        assert stats["joined"] + stats["replayed"] == 4
+        assert stats["inflight"] == 0
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert calls == 1
+    assert results == ["<Response>1</Response>"] * 5
+
+
+def test_stored_response_is_replayed_and_keyed_by_form(async_store: AsyncSqliteStore) -> None:
+    calls = 0
+
+    async def render() -> str:
+        nonlocal calls
+        calls += 1
+        return f"<Response>{calls}</Response>"
+
+    async def scenario() -> tuple[str, str, str]:
+        form = [("CallSid", "call-1"), ("SpeechResult", "Nachricht 2")]
+        first = await WebhookIdempotency(async_store).run("call-1", "followup", form, render)
+        # A fresh instance stands in for a restarted process or another worker.
+        replay = await WebhookIdempotency(async_store).run("call-1", "followup", list(reversed(form)), render)
+        other = await WebhookIdempotency(async_store).run(
+            "call-1",
+            "followup",
+            [("CallSid", "call-1"), ("SpeechResult", "Nachricht 3")],
+            render,
+        )
+        return first, replay, other
+
+    first, replay, other = asyncio.run(scenario())
+
+    assert first == replay == "<Response>1</Response>"
+    assert other == "<Response>2</Response>"
+    assert calls == 2
+
+
+def test_failed_computation_is_not_stored(async_store: AsyncSqliteStore) -> None:
+    attempts = 0
+
+    async def render() -> str:
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise RuntimeError("boom")
+        return "<Response />"
+
+    async def scenario() -> str:
+        idempotency = WebhookIdempotency(async_store)
+        with pytest.raises(RuntimeError):
+            await idempotency.run("call-1", "incoming", [("CallSid", "call-1")], render)
+        return await idempotency.run("call-1", "incoming", [("CallSid", "call-1")], render)
+
+    assert asyncio.run(scenario()) == "<Response />"
+    assert attempts == 2
+
+
+def test_uncached_response_is_returned_but_not_replayed(async_store: AsyncSqliteStore) -> None:
+    attempts = 0
+
+    async def render() -> str:
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise UncachedResponse("<Response>spaeter</Response>")
+        return "<Response>ok</Response>"
+
+    async def scenario() -> tuple[str, str, dict[str, int]]:
+        idempotency = WebhookIdempotency(async_store)
+        first = await idempotency.run("call-1", "incoming", [("CallSid", "call-1")], render)
+        retry = await idempotency.run("call-1", "incoming", [("CallSid", "call-1")], render)
+        return first, retry, idempotency.stats()
+
+    first, retry, stats = asyncio.run(scenario())
+
+    assert first == "<Response>spaeter</Response>"
+    assert retry == "<Response>ok</Response>"
+    assert stats["uncached"] == 1 and stats["computed"] == 1